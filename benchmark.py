@@ -0,0 +1,265 @@
+# Benchmarks for the sort, status and metadata paths on a generated archive.
+#
+#   python benchmark.py [--years N] [--subdirs N] [--files N] [--depth N] [--min-size B] [--max-size B]
+#                       [--backend json|sqlite] [--repeat N] [--no-gui] [--output results.json] [--keep]
+#
+# The archive is built in a temporary folder with its own constants module, the real PUBLIC_ROOT and
+# metadata are never touched. Results are written as JSON so runs of different versions can be compared.
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import logging
+
+BENCHMARK_VERSION = 3
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time sorting, directory status and metadata operations on a synthetic archive.")
+    parser.add_argument('--years', type=int, default=5, help="year folders under the public root (default 5)")
+    parser.add_argument('--subdirs', type=int, default=10, help="subfolders per year (default 10)")
+    parser.add_argument('--files', type=int, default=100, help="files per subfolder (default 100)")
+    parser.add_argument('--depth', type=int, default=1, help="nesting depth of the subfolders (default 1)")
+    parser.add_argument('--min-size', type=int, default=1024, help="smallest file size in bytes (default 1024)")
+    parser.add_argument('--max-size', type=int, default=64 * 1024, help="largest file size in bytes (default 65536)")
+    parser.add_argument('--first-year', type=int, default=2000, help="name of the first year folder (default 2000)")
+    parser.add_argument('--sort-files', type=int, default=20, help="single files sorted by the sort_file benchmark (default 20)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs of each repeatable benchmark (default 3)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for file sizes (default 0)")
+    parser.add_argument('--workers', type=int, default=None, help="BATCH_SORT_WORKERS for the run")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json', help="METADATA_BACKEND for the run (default json)")
+    parser.add_argument('--no-gui', action='store_true', help="skip the directory tree benchmark")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--keep', action='store_true', help="keep the generated archive and print its location")
+    return parser.parse_args(argv)
+
+def write_constants(base_dir, args):
+    # Imported by every sift module as `constants`, so it has to be first on sys.path before they load
+    lines = [
+        f"PUBLIC_ROOT = {os.path.join(base_dir, 'public')!r}",
+        f"PRIVATE_ROOT = {os.path.join(base_dir, 'private')!r}",
+        f"SAFE_DELETE_ROOT = {os.path.join(base_dir, 'safe_delete')!r}",
+        f"METADATA_FOLDER = {os.path.join(base_dir, 'metadata')!r}",
+        f"METADATA_BACKEND = {args.backend!r}",
+    ]
+    if args.workers:
+        lines.append(f"BATCH_SORT_WORKERS = {args.workers}")
+    module_dir = os.path.join(base_dir, 'config')
+    os.makedirs(module_dir)
+    with open(os.path.join(module_dir, 'constants.py'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    sys.path.insert(0, module_dir)
+    for root in ('public', 'private', 'safe_delete', 'metadata'):
+        os.makedirs(os.path.join(base_dir, root))
+
+def generate_archive(public_root, args):
+    # PUBLIC_ROOT/<year>/dNN[/dNN...]/fNNNN.jpg, returns the year folders and the leaf folders
+    rng = random.Random(args.seed)
+    payload = os.urandom(args.max_size)
+    year_dirs = []
+    leaf_dirs = []
+    total_bytes = 0
+    for year in range(args.first_year, args.first_year + args.years):
+        year_dir = os.path.join(public_root, str(year))
+        year_dirs.append(year_dir)
+        for subdir in range(args.subdirs):
+            leaf_dir = os.path.join(year_dir, *[f"d{subdir:02d}"] * args.depth)
+            os.makedirs(leaf_dir)
+            leaf_dirs.append(leaf_dir)
+            for index in range(args.files):
+                size = rng.randint(args.min_size, args.max_size)
+                with open(os.path.join(leaf_dir, f"f{index:04d}.jpg"), 'wb') as f:
+                    f.write(payload[:size])
+                total_bytes += size
+    return year_dirs, leaf_dirs, total_bytes
+
+def summarize(timings, **fields):
+    return {
+        'runs': len(timings),
+        'min': round(min(timings), 6),
+        'median': round(statistics.median(timings), 6),
+        'max': round(max(timings), 6),
+        **fields,
+    }
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+def repeat(count, function, *args):
+    return [timed(function, *args) for _ in range(count)]
+
+def repeat_after(count, prepare, function, *args):
+    # prepare() runs untimed before each call, for operations that do nothing when run twice in a row
+    timings = []
+    for _ in range(count):
+        prepare()
+        timings.append(timed(function, *args))
+    return timings
+
+def count_files(path):
+    return sum(len(files) for _, _, files in os.walk(path))
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_io(args, year_dirs, leaf_dirs, public_root):
+    from sift_io_utils import SiftIOUtils
+
+    results = {}
+    sift_io = SiftIOUtils()
+    try:
+        # Already in the public root, so only metadata is written
+        target = year_dirs[0]
+        results['sort_directory_in_place'] = summarize([timed(sift_io.sort, target, True)], files=count_files(target))
+
+        # Moved to the private root, copy or rename depending on MOVE_MODE
+        target = leaf_dirs[-1]
+        files = count_files(target)
+        results['sort_directory_move'] = summarize([timed(sift_io.sort, target, False)], files=files)
+
+        sort_sources = []
+        for leaf_dir in leaf_dirs[len(leaf_dirs) // 2:-1]:
+            sort_sources.extend(os.path.join(leaf_dir, name) for name in sorted(os.listdir(leaf_dir)))
+            if len(sort_sources) >= args.sort_files:
+                break
+        timings = [timed(sift_io.sort, file_path, False) for file_path in sort_sources[:args.sort_files]]
+        if timings:
+            results['sort_file'] = summarize(timings)
+
+        status_targets = {
+            'root': public_root,
+            'year': year_dirs[-1],
+            'leaf': leaf_dirs[0],
+        }
+        for name, path in status_targets.items():
+            results[f'get_directory_status_{name}'] = summarize(repeat(args.repeat, sift_io.get_directory_status, path), path=os.path.relpath(path, public_root))
+        # Counters thrown away, the next query walks and counts again
+        results['get_directory_status_cold'] = summarize([timed(sift_io.rebuild_directory_stats, year_dirs[-1]) + timed(sift_io.get_directory_status, year_dirs[-1])])
+
+        results['refresh_directory_stats'] = summarize(repeat(args.repeat, sift_io.refresh_directory_stats, leaf_dirs[0]))
+
+        # Marked public in place by the first sort above, so it is still there and reviewed
+        reviewed_file = next(os.path.join(root, files[0]) for root, _, files in os.walk(year_dirs[0]) if files)
+        results.update(benchmark_index(args, sift_io.metadata_utils, reviewed_file))
+    finally:
+        sift_io.close()
+    return results
+
+def benchmark_index(args, metadata_utils, file_path):
+    # Only public calls, so the same numbers can be taken on older revisions. Everything the sorts
+    # above changed is written first, reloading the index drops unsaved records.
+    metadata_utils.save_all_metadata()
+    metadata_utils.save_index()
+
+    def change_record():
+        # Writes one reviewed record back unchanged, the saves below then have a year to write
+        metadata_utils.update_file_path(file_path, file_path)
+
+    return {
+        'load_index': summarize(repeat(args.repeat, metadata_utils.load_index)),
+        'save_index': summarize(repeat_after(args.repeat, change_record, metadata_utils.save_index)),
+        'save_all_metadata': summarize(repeat_after(args.repeat, change_record, metadata_utils.save_all_metadata)),
+    }
+
+def benchmark_tree(args, public_root):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt6.QtWidgets import QApplication
+    except ImportError as e:
+        return {'directory_tree': {'skipped': f"PyQt6 not available: {str(e)}"}}
+    from gui_directory_tree import DirectoryTree
+    from sift_io_utils import SiftIOUtils
+
+    app = QApplication.instance() or QApplication([])
+    results = {}
+
+    sift_io = SiftIOUtils()
+    started = time.perf_counter()
+    tree = DirectoryTree(public_root, sift_io)
+    results['directory_tree_create'] = summarize([time.perf_counter() - started])
+
+    results['directory_tree_populate'] = summarize(repeat(args.repeat, tree.populate_tree))
+
+    # Lists the year folders, then every folder under the last year
+    root_index = tree.model.index(0, 0)
+    results['directory_tree_expand_root'] = summarize([timed(tree.expand, root_index)])
+    deepest = None
+    for dirpath, dirnames, _ in os.walk(os.path.join(public_root, str(args.first_year + args.years - 1))):
+        if not dirnames:
+            deepest = dirpath
+            break
+    if deepest is not None:
+        results['directory_tree_select_deep'] = summarize([timed(tree.select_path, deepest)])
+
+    tree.stop_progress_worker()
+    sift_io.close()
+    tree.deleteLater()
+    app.processEvents()
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    base_dir = tempfile.mkdtemp(prefix='sift-benchmark-')
+    try:
+        write_constants(base_dir, args)
+        public_root = os.path.join(base_dir, 'public')
+
+        started = time.perf_counter()
+        year_dirs, leaf_dirs, total_bytes = generate_archive(public_root, args)
+        generate_seconds = time.perf_counter() - started
+
+        results = benchmark_io(args, year_dirs, leaf_dirs, public_root)
+        if not args.no_gui:
+            results.update(benchmark_tree(args, public_root))
+
+        report = {
+            'benchmark_version': BENCHMARK_VERSION,
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'shape': {
+                'years': args.years,
+                'subdirs_per_year': args.subdirs,
+                'files_per_subdir': args.files,
+                'depth': args.depth,
+                'min_size': args.min_size,
+                'max_size': args.max_size,
+                'total_files': len(leaf_dirs) * args.files,
+                'total_bytes': total_bytes,
+                'backend': args.backend,
+                'seed': args.seed,
+            },
+            'generate_seconds': round(generate_seconds, 3),
+            'results': results,
+        }
+    finally:
+        if args.keep:
+            print(f"Archive kept in {base_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,6 @@ from PyQt6.QtCore import pyqtSlot, pyqtSignal, QThread, Qt
 from PyQt6.QtGui import QColor, QPalette
 import os
 import logging
-from sift_io_utils import SiftIOUtils
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -21,7 +20,7 @@ class SortWorker(QThread):
 
     def run(self):
         try:
-            self.io_utils.sort(self.path, self.is_public)
+            self.io_utils.sort(self.path, self.is_public, self.progress.emit)
             if self.is_running:
                 self.finished.emit()
         except Exception as e:
@@ -34,7 +33,7 @@ class SortWorker(QThread):
 class DirectoryDetailsPane(QWidget):
     directory_sorted = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, io_utils):
         super().__init__()
         layout = QVBoxLayout()
         self.setLayout(layout)
@@ -61,8 +60,8 @@ class DirectoryDetailsPane(QWidget):
         self.public_button.clicked.connect(self.sort_public)
         self.private_button.clicked.connect(self.sort_private)
 
-        # Initialize SiftIOUtils
-        self.io_utils = SiftIOUtils()
+        # Shared with the other panes
+        self.io_utils = io_utils
 
         self.current_path = None
         self.sort_worker = None
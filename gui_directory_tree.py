@@ -1,14 +1,23 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTabWidget, QTreeView, QStyledItemDelegate, QPushButton
 from PyQt6.QtGui import QStandardItemModel, QStandardItem, QBrush, QColor, QPainter, QIcon
-from PyQt6.QtCore import pyqtSignal, Qt, QRect, QSize, QModelIndex, QEvent
+from PyQt6.QtCore import pyqtSignal, Qt, QRect, QSize, QModelIndex, QPersistentModelIndex, QEvent, QThread, QCoreApplication
 import os
-from sift_io_utils import SiftIOUtils
+import queue
+import threading
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PATH_ROLE = Qt.ItemDataRole.UserRole
+PROGRESS_ROLE = Qt.ItemDataRole.UserRole + 1
+FETCHED_ROLE = Qt.ItemDataRole.UserRole + 2
+HAS_CHILDREN_ROLE = Qt.ItemDataRole.UserRole + 3
 
 class DirectoryTreePane(QWidget):
     directory_selected = pyqtSignal(str)
     directory_refreshed = pyqtSignal(str)
 
-    def __init__(self, public_root, private_root):
+    def __init__(self, public_root, private_root, io_utils):
         super().__init__()
         layout = QVBoxLayout()
         self.setLayout(layout)
@@ -16,8 +25,8 @@ class DirectoryTreePane(QWidget):
         self.tab_widget = QTabWidget()
         layout.addWidget(self.tab_widget)
 
-        self.public_tree = DirectoryTree(public_root)
-        self.private_tree = DirectoryTree(private_root)
+        self.public_tree = DirectoryTree(public_root, io_utils)
+        self.private_tree = DirectoryTree(private_root, io_utils)
 
         self.tab_widget.addTab(self.public_tree, "Public")
         self.tab_widget.addTab(self.private_tree, "Private")
@@ -27,6 +36,11 @@ class DirectoryTreePane(QWidget):
         self.public_tree.directory_refreshed.connect(self.directory_refreshed)
         self.private_tree.directory_refreshed.connect(self.directory_refreshed)
 
+    def populate(self):
+        # Called once the main window is on screen, the trees start out empty
+        self.public_tree.populate_tree()
+        self.private_tree.populate_tree()
+
     def update_directory(self, path):
         self.public_tree.update_directory(path)
         self.private_tree.update_directory(path)
@@ -45,7 +59,7 @@ class ProgressBarDelegate(QStyledItemDelegate):
     def paint(self, painter, option, index):
         super().paint(painter, option, index)
 
-        progress = index.data(Qt.ItemDataRole.UserRole + 1)
+        progress = index.data(PROGRESS_ROLE)
         if progress is not None:
             rect = option.rect
             bar_width = 30
@@ -100,53 +114,156 @@ class ProgressBarDelegate(QStyledItemDelegate):
                 return True
         return super().editorEvent(event, model, option, index)
 
+class DirectoryTreeModel(QStandardItemModel):
+    # Subdirectories are listed the first time a node is expanded, not when the tree is built
+    directories_added = pyqtSignal(list)
+
+    def __init__(self, scan_cache, parent=None):
+        super().__init__(parent)
+        self.scan_cache = scan_cache
+
+        # Persistent indexes follow their rows through inserts and removals elsewhere in the model
+        self.path_indexes = {}
+        self.rowsInserted.connect(self.register_rows)
+        self.rowsAboutToBeRemoved.connect(self.unregister_rows)
+        self.modelReset.connect(self.path_indexes.clear)
+
+    def register_rows(self, parent, first, last):
+        for row in range(first, last + 1):
+            index = self.index(row, 0, parent)
+            path = index.data(PATH_ROLE)
+            if path is not None:
+                self.path_indexes[path] = QPersistentModelIndex(index)
+
+    def unregister_rows(self, parent, first, last):
+        for row in range(first, last + 1):
+            stack = [self.index(row, 0, parent)]
+            while stack:
+                index = stack.pop()
+                self.path_indexes.pop(index.data(PATH_ROLE), None)
+                stack.extend(self.index(child_row, 0, index) for child_row in range(self.rowCount(index)))
+
+    def item_for_path(self, path):
+        persistent_index = self.path_indexes.get(path)
+        if persistent_index is None or not persistent_index.isValid():
+            return None
+        return self.itemFromIndex(QModelIndex(persistent_index))
+
+    def list_subdirectories(self, path):
+        try:
+            return [os.path.join(path, name) for name, is_dir, _, _ in sorted(self.scan_cache.scan(path)) if is_dir]
+        except OSError:
+            return []
+
+    def create_item(self, path):
+        dir_item = QStandardItem(os.path.basename(path))
+        dir_item.setData(path, PATH_ROLE)
+        dir_item.setData(False, FETCHED_ROLE)
+        # Only decides whether an expand arrow is drawn, the children themselves are listed in fetchMore
+        dir_item.setData(bool(self.list_subdirectories(path)), HAS_CHILDREN_ROLE)
+        return dir_item
+
+    def hasChildren(self, parent=QModelIndex()):
+        item = self.itemFromIndex(parent)
+        if item is None or item.data(FETCHED_ROLE):
+            return super().hasChildren(parent)
+        return bool(item.data(HAS_CHILDREN_ROLE))
+
+    def canFetchMore(self, parent):
+        item = self.itemFromIndex(parent)
+        return item is not None and not item.data(FETCHED_ROLE)
+
+    def fetchMore(self, parent):
+        item = self.itemFromIndex(parent)
+        if item is None or item.data(FETCHED_ROLE):
+            return
+        item.setData(True, FETCHED_ROLE)
+        paths = self.list_subdirectories(item.data(PATH_ROLE))
+        if paths:
+            item.appendRows([self.create_item(path) for path in paths])
+            self.directories_added.emit(paths)
+
+class ProgressWorker(QThread):
+    progress_calculated = pyqtSignal(str, float)
+
+    def __init__(self, io_utils):
+        super().__init__()
+        self.io_utils = io_utils
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.is_running = True
+
+    def request(self, paths):
+        with self.lock:
+            for path in paths:
+                if path not in self.pending:
+                    self.pending.add(path)
+                    self.queue.put(path)
+
+    def run(self):
+        while self.is_running:
+            path = self.queue.get()
+            if path is None:
+                break
+            with self.lock:
+                self.pending.discard(path)
+            try:
+                status = self.io_utils.get_directory_status(path)
+            except Exception as e:
+                logging.error(f"Error calculating progress for {path}: {str(e)}")
+                continue
+            progress = status['reviewed'] / status['total'] if status['total'] else 0
+            self.progress_calculated.emit(path, progress)
+
+    def stop(self):
+        self.is_running = False
+        self.queue.put(None)
+
 class DirectoryTree(QTreeView):
     directory_selected = pyqtSignal(str)
     directory_refreshed = pyqtSignal(str)
 
-    def __init__(self, root_path):
+    def __init__(self, root_path, sift_io_utils):
         super().__init__()
         self.root_path = root_path
-        self.model = QStandardItemModel()
+        self.sift_io_utils = sift_io_utils
+        self.model = DirectoryTreeModel(self.sift_io_utils.scan_cache)
         self.setModel(self.model)
         self.setHeaderHidden(True)
         self.clicked.connect(self.item_clicked)
         self.delegate = ProgressBarDelegate()
         self.delegate.refresh_clicked.connect(self.refresh_directory)
         self.setItemDelegate(self.delegate)
-        self.sift_io_utils = SiftIOUtils()  # Assume same root for public and private
-        self.populate_tree()
+
+        # Progress bars are filled in from a background thread as rows are listed
+        self.progress_worker = ProgressWorker(self.sift_io_utils)
+        self.progress_worker.progress_calculated.connect(self.on_progress_calculated)
+        self.model.directories_added.connect(self.progress_worker.request)
+        self.progress_worker.start(QThread.Priority.LowPriority)
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.stop_progress_worker)
 
     def populate_tree(self):
         self.model.clear()
-        root_item = self.model.invisibleRootItem()
-        self.add_directory(root_item, self.root_path)
+        if not os.path.isdir(self.root_path):
+            return
+        self.model.invisibleRootItem().appendRow(self.model.create_item(self.root_path))
+        self.progress_worker.request([self.root_path])
 
-    def add_directory(self, parent_item, path):
-        dir_item = QStandardItem(os.path.basename(path))
-        dir_item.setData(path, Qt.ItemDataRole.UserRole)
-        progress = self.calculate_progress(path)
-        dir_item.setData(progress, Qt.ItemDataRole.UserRole + 1)
-        parent_item.appendRow(dir_item)
-        
-        try:
-            for item in sorted(os.listdir(path)):
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    self.add_directory(dir_item, item_path)
-        except FileNotFoundError:
-            parent_item.removeRow(dir_item.row())
-
-    def calculate_progress(self, path):
-        status = self.sift_io_utils.get_directory_status(path)
-        if status['total'] == 0:
-            return 0
-        return status['reviewed'] / status['total']
+    def stop_progress_worker(self):
+        self.progress_worker.stop()
+        self.progress_worker.wait()
+
+    def on_progress_calculated(self, path, progress):
+        item = self.find_item_by_path(path)
+        if item:
+            item.setData(progress, PROGRESS_ROLE)
 
     def item_clicked(self, index):
         item = self.model.itemFromIndex(index)
         if item is not None:
-            path = item.data(Qt.ItemDataRole.UserRole)
+            path = item.data(PATH_ROLE)
             if path is not None:
                 self.directory_selected.emit(path)
 
@@ -167,69 +284,81 @@ class DirectoryTree(QTreeView):
 
     def refresh_directory_structure(self):
         current_index = self.currentIndex()
-        current_path = current_index.data(Qt.ItemDataRole.UserRole) if current_index.isValid() else self.root_path
+        current_path = current_index.data(PATH_ROLE) if current_index.isValid() else self.root_path
         self.populate_tree()
         self.select_path(current_path)
 
     def select_path(self, path):
         if not os.path.exists(path):
             path = os.path.dirname(path)
-        item = self.find_item_by_path(path)
+        item = self.find_item_by_path(path, fetch=True)
         if item:
+            parent = item.parent()
+            while parent is not None:
+                self.expand(parent.index())
+                parent = parent.parent()
             self.setCurrentIndex(item.index())
         else:
             self.setCurrentIndex(self.model.index(0, 0))
 
-    def find_item_by_path(self, path):
-        for row in range(self.model.rowCount()):
-            item = self.model.item(row)
-            found_item = self.find_item_recursive(item, path)
-            if found_item:
-                return found_item
-        return None
-
-    def find_item_recursive(self, item, path):
-        if item.data(Qt.ItemDataRole.UserRole) == path:
+    def find_item_by_path(self, path, fetch=False):
+        item = self.model.item_for_path(path)
+        if item is not None or not fetch:
             return item
-        for row in range(item.rowCount()):
-            child = item.child(row)
-            found_item = self.find_item_recursive(child, path)
-            if found_item:
-                return found_item
-        return None
 
-    def refresh_stats(self, path):
-        item = self.find_item_by_path(path)
-        if item:
-            progress = self.calculate_progress(path)
-            item.setData(progress, Qt.ItemDataRole.UserRole + 1)
-            self.model.dataChanged.emit(item.index(), item.index())
+        # Not listed yet: list the closest loaded ancestor's children, then each level below it
+        missing_paths = []
+        while item is None:
+            if path == self.root_path or not path.startswith(self.root_path):
+                return None
+            missing_paths.append(path)
+            path = os.path.dirname(path)
+            item = self.model.item_for_path(path)
+        for missing_path in reversed(missing_paths):
+            self.model.fetchMore(item.index())
+            item = self.model.item_for_path(missing_path)
+            if item is None:
+                return None
+        return item
+
+    def ancestor_paths(self, path):
+        paths = []
+        while path != self.root_path and path.startswith(self.root_path):
+            path = os.path.dirname(path)
+            paths.append(path)
+        return paths
 
-        # Refresh parent directories
-        parent_path = os.path.dirname(path)
-        if parent_path != path and parent_path.startswith(self.root_path):
-            self.refresh_stats(parent_path)
+    def refresh_stats(self, path):
+        # Recalculate this directory and its ancestors, results arrive through on_progress_calculated
+        self.progress_worker.request([path] + self.ancestor_paths(path))
 
     def refresh_directory(self, index):
         item = self.model.itemFromIndex(index)
         if item is not None:
-            path = item.data(Qt.ItemDataRole.UserRole)
+            path = item.data(PATH_ROLE)
             if path is not None:
                 self.refresh_directory_recursive(path)
                 self.directory_refreshed.emit(path)
 
     def refresh_directory_recursive(self, path):
+        # Recount the subtree from disk in case files changed outside the app
+        self.sift_io_utils.rebuild_directory_stats(path)
+
         # Refresh the directory structure
         self.refresh_directory_structure()
-        
-        # Refresh the status of the current directory
-        self.refresh_stats(path)
-
-        # Refresh subdirectories
-        for root, dirs, files in os.walk(path):
-            for dir_name in dirs:
-                subdir_path = os.path.join(root, dir_name)
-                self.refresh_stats(subdir_path)
+
+        # Every listed directory in the subtree once, children before parents, then the ancestors
+        item = self.find_item_by_path(path)
+        if item is not None:
+            stack = [item]
+            subtree_paths = []
+            while stack:
+                current = stack.pop()
+                subtree_paths.append(current.data(PATH_ROLE))
+                stack.extend(current.child(row) for row in range(current.rowCount()))
+            self.progress_worker.request(list(reversed(subtree_paths)) + self.ancestor_paths(path))
+        else:
+            self.refresh_stats(path)
 
         # Update the view
         self.viewport().update()
\ No newline at end of file
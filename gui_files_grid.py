@@ -1,35 +1,60 @@
 import os
-from PyQt6.QtWidgets import QScrollArea, QWidget, QGridLayout, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QStackedWidget
-from PyQt6.QtCore import Qt, pyqtSlot, pyqtSignal, QSize
-from PyQt6.QtGui import QPixmap
-from gui_file_grid_item import FileGridItem
-from sift_io_utils import SiftIOUtils
-from gui_video_widgets import VideoPlayerWidget
-
-class FilesGridPane(QScrollArea):
+from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QStackedWidget, QListView, QAbstractItemView
+from PyQt6.QtCore import Qt, pyqtSlot, pyqtSignal, QSize, QEvent
+from PyQt6.QtGui import QPixmap, QKeySequence, QShortcut
+from constants import PUBLIC_ROOT, PRIVATE_ROOT
+from gui_thumbnail_cache import ThumbnailCache
+from gui_files_grid_model import FilesGridModel, FileGridDelegate, FILE_PATH_ROLE, IS_VIDEO_ROLE
+from gui_media_player_pool import MediaPlayerPool
+from gui_read_ahead import ReadAheadCache, READ_AHEAD_NEXT, READ_AHEAD_PREVIOUS
+
+GRID_COLUMNS = 4
+GRID_SPACING = 5
+
+class FilesGridPane(QWidget):
     file_selected = pyqtSignal(str)
     stats_updated = pyqtSignal(str)
     directory_removed = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, sift_io):
         super().__init__()
-        self.setWidgetResizable(True)
-        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-
-        self.main_widget = QWidget()
-        self.setWidget(self.main_widget)
-        self.main_layout = QVBoxLayout(self.main_widget)
+        self.main_layout = QVBoxLayout(self)
         self.main_layout.setContentsMargins(0, 0, 0, 0)
         self.main_layout.setSpacing(0)
 
         self.stacked_widget = QStackedWidget()
         self.main_layout.addWidget(self.stacked_widget)
 
-        self.grid_widget = QWidget()
-        self.grid_layout = QGridLayout(self.grid_widget)
-        self.grid_layout.setSpacing(5)
-        self.grid_layout.setContentsMargins(5, 5, 5, 5)
+        # Shared with the other panes
+        self.sift_io = sift_io
+
+        # Only the visible cells are painted, so folder size doesn't matter for widgets or memory
+        self.grid_model = FilesGridModel(self.sift_io, self)
+        self.grid_delegate = FileGridDelegate(self)
+        self.grid_delegate.sort_requested.connect(self.on_sort_requested)
+        self.grid_delegate.file_clicked.connect(self.show_zoomed)
+
+        self.grid_view = QListView()
+        self.grid_view.setViewMode(QListView.ViewMode.IconMode)
+        self.grid_view.setMovement(QListView.Movement.Static)
+        self.grid_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.grid_view.setUniformItemSizes(True)
+        self.grid_view.setSpacing(GRID_SPACING)
+        self.grid_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.grid_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.grid_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.grid_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.grid_view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self.grid_view.setMouseTracking(True)
+        self.grid_view.viewport().setAttribute(Qt.WidgetAttribute.WA_Hover)
+        self.grid_view.setModel(self.grid_model)
+        self.grid_view.setItemDelegate(self.grid_delegate)
+
+        # Video cells play a muted preview on hover from the shared player pool
+        self.preview_path = None
+        self.video_player = None
+        self.grid_view.viewport().installEventFilter(self)
+        self.grid_view.verticalScrollBar().valueChanged.connect(self.stop_preview)
 
         self.zoomed_widget = QWidget()
         self.zoomed_layout = QVBoxLayout(self.zoomed_widget)
@@ -45,165 +70,254 @@ class FilesGridPane(QScrollArea):
         self.button_widget = QWidget()
         self.button_layout = QHBoxLayout(self.button_widget)
         self.button_layout.setContentsMargins(0, 0, 0, 0)
+        self.previous_button = QPushButton("Previous")
         self.public_button = QPushButton("Public")
         self.private_button = QPushButton("Private")
+        self.next_button = QPushButton("Next")
         self.close_button = QPushButton("Close")
 
         self.public_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
         self.private_button.setStyleSheet("background-color: #F44336; color: white; font-weight: bold;")
 
+        self.button_layout.addWidget(self.previous_button)
         self.button_layout.addWidget(self.public_button)
         self.button_layout.addWidget(self.private_button)
+        self.button_layout.addWidget(self.next_button)
         self.button_layout.addWidget(self.close_button)
 
         self.zoomed_layout.addWidget(self.button_widget)
 
-        self.stacked_widget.addWidget(self.grid_widget)
+        self.stacked_widget.addWidget(self.grid_view)
         self.stacked_widget.addWidget(self.zoomed_widget)
 
         self.current_path = ""
         self.current_file = ""
-        self.items = []
-
 
-        # Initialize SiftIOUtils
-        self.sift_io = SiftIOUtils()
+        # Neighbouring images are decoded in the background at the zoomed size while one is reviewed
+        self.read_ahead = ReadAheadCache(self)
 
         # Connect button signals
         self.public_button.clicked.connect(self.sort_public_current)
         self.private_button.clicked.connect(self.sort_private_current)
         self.close_button.clicked.connect(self.close_zoomed)
+        self.previous_button.clicked.connect(self.show_previous)
+        self.next_button.clicked.connect(self.show_next)
+
+        for key, slot in ((Qt.Key.Key_Left, self.show_previous), (Qt.Key.Key_Right, self.show_next), (Qt.Key.Key_Escape, self.close_zoomed)):
+            shortcut = QShortcut(QKeySequence(key), self.zoomed_widget)
+            shortcut.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(slot)
 
     @pyqtSlot(str)
     def update_directory(self, path):
         if path != self.current_path:
             self.close_zoomed()
+            self.read_ahead.clear()
             self.current_path = path
             self.refresh_grid()
+            self.prewarm_year_thumbnails(path)
+
+    def prewarm_year_thumbnails(self, path):
+        # Generate thumbnails for the rest of the year in the background while this folder is reviewed
+        for root in (PUBLIC_ROOT, PRIVATE_ROOT):
+            if path.startswith(root):
+                relative_parts = os.path.relpath(path, root).split(os.sep)
+                if relative_parts[0] != '.':
+                    ThumbnailCache().prewarm(os.path.join(root, relative_parts[0]), self.grid_model.thumbnail_size)
+                return
 
     def refresh_grid(self):
-        self.clear_grid()
         if os.path.exists(self.current_path) and os.path.isdir(self.current_path):
             self.populate_grid()
         else:
+            self.grid_model.clear()
             self.handle_directory_removal(self.current_path)
 
     def handle_directory_removal(self, removed_path):
         parent_dir = os.path.dirname(removed_path)
         if parent_dir == removed_path:  # We're at the root
-            if removed_path.startswith(self.public_root):
-                self.current_path = self.public_root
+            if removed_path.startswith(PUBLIC_ROOT):
+                self.current_path = PUBLIC_ROOT
             else:
-                self.current_path = self.private_root
+                self.current_path = PRIVATE_ROOT
         else:
             self.current_path = parent_dir
         
         self.directory_removed.emit(self.current_path)
         self.refresh_grid()
 
-    def clear_grid(self):
-        for i in reversed(range(self.grid_layout.count())): 
-            widget = self.grid_layout.itemAt(i).widget()
-            if widget:
-                if isinstance(widget, FileGridItem):
-                    widget.cleanup()
-                widget.setParent(None)
-                widget.deleteLater()
-        self.items = []
+    def eventFilter(self, obj, event):
+        if obj is self.grid_view.viewport():
+            if event.type() == QEvent.Type.MouseMove:
+                self.update_preview(self.grid_view.indexAt(event.position().toPoint()))
+            elif event.type() == QEvent.Type.Leave:
+                self.stop_preview()
+        return super().eventFilter(obj, event)
+
+    def update_preview(self, index):
+        file_path = index.data(FILE_PATH_ROLE) if index.isValid() and index.data(IS_VIDEO_ROLE) else None
+        if file_path == self.preview_path:
+            return
+        self.stop_preview()
+        if file_path is not None:
+            self.preview_path = file_path
+            preview_rect = self.grid_delegate.preview_rect(self.grid_view.visualRect(index))
+            MediaPlayerPool().acquire(self, file_path, self.grid_view.viewport(), preview_rect)
+
+    def stop_preview(self):
+        if self.preview_path is not None:
+            MediaPlayerPool().release(self)
+            self.preview_path = None
 
     def populate_grid(self):
-        files = sorted([f for f in os.listdir(self.current_path) if os.path.isfile(os.path.join(self.current_path, f))])
-        row, col = 0, 0
-        for file in files:
-            file_path = os.path.join(self.current_path, file)
-            item = FileGridItem(file_path, self)
-            item.file_clicked.connect(self.show_zoomed)
-            self.items.append(item)
-            self.grid_layout.addWidget(item, row, col)
-            col += 1
-            if col == 4:
-                col = 0
-                row += 1
-        self.adjust_grid()
+        self.stop_preview()
+        entries = self.sift_io.scan_cache.scan(self.current_path)
+        file_names = sorted(name for name, is_dir, _, _ in entries if not is_dir)
+        self.grid_model.set_directory(self.current_path, file_names)
+        self.grid_view.scrollToTop()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.adjust_grid()
-        if self.stacked_widget.currentWidget() == self.zoomed_widget:
+        if self.stacked_widget.currentWidget() == self.zoomed_widget and not self.grid_model.is_video(self.current_file):
             self.show_zoomed(self.current_file)
 
+    def grid_item_width(self):
+        viewport_width = self.grid_view.viewport().width()
+        return max(100, (viewport_width // GRID_COLUMNS) - 2 * GRID_SPACING)
+
     def adjust_grid(self):
-        width = self.grid_widget.width()
-        item_width = max(100, (width // 4) - self.grid_layout.spacing())
-        for item in self.items:
-            item.setFixedSize(item_width, item_width)
-            item.adjust_content()
-        self.grid_layout.update()
+        self.stop_preview()
+        item_width = self.grid_item_width()
+        self.grid_delegate.cell_size = QSize(item_width, item_width)
+        self.grid_model.set_thumbnail_size(int(item_width * self.devicePixelRatioF()))
+        # Uniform item sizes are cached by the view, a re-layout makes it ask again
+        self.grid_view.doItemsLayout()
 
     def show_zoomed(self, file_path):
+        self.stop_preview()
         self.file_selected.emit(file_path)
         self.current_file = file_path
 
         # Clear previous zoomed content
         self.zoomed_content.clear()
+        self.remove_video_player()
 
         # Create zoomed view
-        _, file_extension = os.path.splitext(file_path)
-        if file_extension.lower() in ['.mp4', '.avi', '.mov', '.wmv', '.mpg', '.mpeg']:
-            video_player = VideoPlayerWidget(file_path)
-            video_player.closed.connect(self.close_zoomed)
-            video_player.sort_public.connect(self.sort_public_current)
-            video_player.sort_private.connect(self.sort_private_current)
-            self.zoomed_layout.insertWidget(0, video_player)
+        if self.grid_model.is_video(file_path):
+            # QtMultimedia is only loaded once the first video is opened
+            from gui_video_widgets import VideoPlayerWidget
+            self.video_player = VideoPlayerWidget(file_path)
+            self.video_player.closed.connect(self.close_zoomed)
+            self.video_player.sort_public.connect(self.sort_public_current)
+            self.video_player.sort_private.connect(self.sort_private_current)
+            self.zoomed_layout.insertWidget(0, self.video_player)
             self.public_button.hide()
             self.private_button.hide()
         else:
-            pixmap = QPixmap(file_path)
-            if not pixmap.isNull():
-                scaled_pixmap = pixmap.scaled(
-                    self.viewport().width() - 20,
-                    self.viewport().height() - 100,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                self.zoomed_content.setPixmap(scaled_pixmap)
+            self.read_ahead.set_target_size(QSize(self.stacked_widget.width() - 20, self.stacked_widget.height() - 100))
+            image = self.read_ahead.get(file_path)
+            if image is not None:
+                self.zoomed_content.setPixmap(QPixmap.fromImage(image))
             else:
                 self.zoomed_content.setText(f"Unable to display: {os.path.basename(file_path)}")
             self.public_button.show()
             self.private_button.show()
 
         self.close_button.show()
+        self.previous_button.setEnabled(self.neighbour_path(-1) is not None)
+        self.next_button.setEnabled(self.neighbour_path(1) is not None)
         self.stacked_widget.setCurrentWidget(self.zoomed_widget)
+        self.zoomed_widget.setFocus()
+        self.prefetch_neighbours()
+
+    def neighbour_path(self, offset):
+        row = self.grid_model.rows.get(self.current_file)
+        if row is None or not 0 <= row + offset < len(self.grid_model.file_paths):
+            return None
+        return self.grid_model.file_paths[row + offset]
+
+    def prefetch_neighbours(self):
+        # Next files first since reviewing moves forward, videos are played rather than decoded
+        offsets = list(range(1, READ_AHEAD_NEXT + 1)) + [-offset for offset in range(1, READ_AHEAD_PREVIOUS + 1)]
+        file_paths = [self.neighbour_path(offset) for offset in offsets]
+        self.read_ahead.prefetch([file_path for file_path in file_paths if file_path is not None and not self.grid_model.is_video(file_path)])
+
+    def show_previous(self):
+        file_path = self.neighbour_path(-1)
+        if file_path is not None:
+            self.show_zoomed(file_path)
+
+    def show_next(self):
+        file_path = self.neighbour_path(1)
+        if file_path is not None:
+            self.show_zoomed(file_path)
+
+    def remove_video_player(self):
+        if self.video_player is not None:
+            self.video_player.cleanup()
+            self.video_player.setParent(None)
+            self.video_player.deleteLater()
+            self.video_player = None
 
     def close_zoomed(self):
-        self.stacked_widget.setCurrentWidget(self.grid_widget)
+        self.stacked_widget.setCurrentWidget(self.grid_view)
         # Remove any video player widget if it exists
-        for i in reversed(range(self.zoomed_layout.count())):
-            widget = self.zoomed_layout.itemAt(i).widget()
-            if isinstance(widget, VideoPlayerWidget):
-                widget.setParent(None)
-                widget.deleteLater()
+        self.remove_video_player()
 
     def sort_public_current(self):
-        self.sort_public(self.current_file)
+        self.sort_current(True)
 
     def sort_private_current(self):
-        self.sort_private(self.current_file)
+        self.sort_current(False)
+
+    def sort_current(self, is_public):
+        # Sorting from the zoomed view moves straight on to the next file, which is usually decoded already
+        file_path = self.current_file
+        next_path = self.neighbour_path(1) or self.neighbour_path(-1)
+        self.sort_file(file_path, is_public)
+        if next_path is not None and next_path in self.grid_model.rows:
+            self.show_zoomed(next_path)
+        else:
+            self.close_zoomed()
 
     def sort_public(self, file_path):
-        self.sift_io.sort_file(file_path, True)
         self.close_zoomed()
-        self.refresh_grid()
-        self.stats_updated.emit(os.path.dirname(file_path))
+        self.sort_file(file_path, True)
 
     def sort_private(self, file_path):
-        self.sift_io.sort_file(file_path, False)
         self.close_zoomed()
-        self.refresh_grid()
+        self.sort_file(file_path, False)
+
+    def sort_file(self, file_path, is_public):
+        new_path = self.sift_io.sort(file_path, is_public)
+        # Only the sorted file's cell changes, the rest of the grid and the scroll position stay as they are
+        if not os.path.isdir(self.current_path):
+            self.refresh_grid()
+        elif new_path == file_path:
+            self.grid_model.refresh_status(file_path)
+        else:
+            self.grid_model.remove_file(file_path)
         self.stats_updated.emit(os.path.dirname(file_path))
 
+    def on_sort_requested(self, file_path, is_public):
+        if is_public:
+            self.sort_public(file_path)
+        else:
+            self.sort_private(file_path)
+
     def refresh_metadata(self, path):
-        if path == self.current_path:
-            for item in self.items:
-                item.update_border()
-        self.adjust_grid()
\ No newline at end of file
+        # After a directory sort: statuses are re-read lazily for visible cells, the listing only if files moved
+        if path != self.current_path:
+            return
+        if not os.path.isdir(self.current_path):
+            self.refresh_grid()
+            return
+        entries = self.sift_io.scan_cache.scan(self.current_path)
+        file_names = sorted(name for name, is_dir, _, _ in entries if not is_dir)
+        if [os.path.join(self.current_path, name) for name in file_names] == self.grid_model.file_paths:
+            self.grid_model.refresh_statuses()
+        else:
+            scroll_position = self.grid_view.verticalScrollBar().value()
+            self.grid_model.set_directory(self.current_path, file_names)
+            self.grid_view.verticalScrollBar().setValue(scroll_position)
@@ -0,0 +1,286 @@
+import os
+from collections import OrderedDict
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt6.QtGui import QPixmap, QColor, QPainter, QPen, QFont
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QPoint, QRect, QSize, QEvent, QTimer, pyqtSignal
+from gui_thumbnail_cache import ThumbnailCache, THUMBNAIL_SIZES, VIDEO_EXTENSIONS
+from gui_thumbnail_loader import ThumbnailLoader
+from sift_video_thumbnails import SiftVideoThumbnails
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FILE_PATH_ROLE = Qt.ItemDataRole.UserRole
+FILE_STATUS_ROLE = Qt.ItemDataRole.UserRole + 1
+IS_VIDEO_ROLE = Qt.ItemDataRole.UserRole + 2
+DURATION_ROLE = Qt.ItemDataRole.UserRole + 3
+
+# Decoded pixmaps kept in memory, enough for a few screens of cells regardless of folder size
+PIXMAP_CACHE_SIZE = 300
+
+BORDER_WIDTH = 5
+BUTTON_HEIGHT = 30
+PUBLIC_COLOR = QColor('#4CAF50')
+PRIVATE_COLOR = QColor('#F44336')
+UNREVIEWED_COLOR = QColor('gray')
+ERROR_COLOR = QColor('yellow')
+
+class FilesGridModel(QAbstractListModel):
+    def __init__(self, sift_io, parent=None):
+        super().__init__(parent)
+        self.sift_io = sift_io
+        self.file_paths = []
+        self.rows = {}
+        self.statuses = {}
+        self.durations = {}
+        self.pixmaps = OrderedDict()
+        self.requested = set()
+        self.pending_requests = []
+        self.thumbnail_size = THUMBNAIL_SIZES[-1]
+
+        # Thumbnails are decoded on a thread pool only when a cell asks for one
+        self.thumbnail_loader = ThumbnailLoader(self)
+        self.thumbnail_loader.thumbnails_loaded.connect(self.on_thumbnails_loaded)
+
+    def set_directory(self, directory, file_names):
+        self.beginResetModel()
+        self.thumbnail_loader.cancel()
+        self.file_paths = [os.path.join(directory, file_name) for file_name in file_names]
+        self.rows = {file_path: row for row, file_path in enumerate(self.file_paths)}
+        self.statuses = {}
+        self.durations = {}
+        self.pixmaps = OrderedDict()
+        self.requested = set()
+        self.pending_requests = []
+        self.endResetModel()
+
+    def clear(self):
+        self.set_directory('', [])
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.file_paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.file_paths):
+            return None
+        file_path = self.file_paths[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(file_path)
+        if role == FILE_PATH_ROLE:
+            return file_path
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.get_pixmap(file_path)
+        if role == FILE_STATUS_ROLE:
+            return self.get_status(file_path)
+        if role == IS_VIDEO_ROLE:
+            return self.is_video(file_path)
+        if role == DURATION_ROLE:
+            return self.get_duration(file_path)
+        return None
+
+    def is_video(self, file_path):
+        return os.path.splitext(file_path)[1].lower() in VIDEO_EXTENSIONS
+
+    def get_duration(self, file_path):
+        # Recorded when the video thumbnail is extracted, None until then
+        if not self.is_video(file_path):
+            return None
+        if file_path not in self.durations:
+            info = SiftVideoThumbnails().get_info(file_path)
+            self.durations[file_path] = info.get('duration') if info else None
+        return self.durations[file_path]
+
+    def get_status(self, file_path):
+        if file_path not in self.statuses:
+            try:
+                self.statuses[file_path] = self.sift_io.get_file_status(file_path)
+            except Exception as e:
+                logging.error(f"Error getting status for {file_path}: {str(e)}")
+                self.statuses[file_path] = None
+        return self.statuses[file_path]
+
+    def get_pixmap(self, file_path):
+        if file_path in self.pixmaps:
+            self.pixmaps.move_to_end(file_path)
+            return self.pixmaps[file_path]
+        if file_path not in self.requested:
+            self.requested.add(file_path)
+            if not self.pending_requests:
+                # Cells painted in the same pass are requested together
+                QTimer.singleShot(0, self.flush_requests)
+            self.pending_requests.append(file_path)
+        return None
+
+    def flush_requests(self):
+        file_paths = self.pending_requests
+        self.pending_requests = []
+        if file_paths:
+            self.thumbnail_loader.request(file_paths, self.thumbnail_size)
+
+    def set_thumbnail_size(self, size):
+        # Cells only load the smallest cached rendition that covers them
+        rendition = ThumbnailCache().rendition_for(size)
+        if rendition == self.thumbnail_size:
+            return
+        self.thumbnail_size = rendition
+        self.thumbnail_loader.cancel()
+        self.pixmaps = OrderedDict()
+        self.requested = set()
+        self.pending_requests = []
+        if self.file_paths:
+            self.dataChanged.emit(self.index(0), self.index(len(self.file_paths) - 1), [Qt.ItemDataRole.DecorationRole])
+
+    def on_thumbnails_loaded(self, generation, results):
+        if generation != self.thumbnail_loader.generation:
+            return
+        for file_path, image in results:
+            row = self.rows.get(file_path)
+            if row is None:
+                continue
+            # A null pixmap marks files that could not be decoded so they are not requested again
+            self.pixmaps[file_path] = QPixmap.fromImage(image) if image is not None else QPixmap()
+            self.durations.pop(file_path, None)
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole, DURATION_ROLE])
+
+        while len(self.pixmaps) > PIXMAP_CACHE_SIZE:
+            evicted_path, _ = self.pixmaps.popitem(last=False)
+            self.requested.discard(evicted_path)
+
+    def remove_file(self, file_path):
+        # Drops one row, every other row keeps its status and pixmap
+        row = self.rows.pop(file_path, None)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.file_paths[row]
+        for later_row in range(row, len(self.file_paths)):
+            self.rows[self.file_paths[later_row]] = later_row
+        self.statuses.pop(file_path, None)
+        self.durations.pop(file_path, None)
+        self.pixmaps.pop(file_path, None)
+        self.requested.discard(file_path)
+        self.endRemoveRows()
+
+    def refresh_status(self, file_path):
+        row = self.rows.get(file_path)
+        if row is None:
+            return
+        self.statuses.pop(file_path, None)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [FILE_STATUS_ROLE])
+
+    def refresh_statuses(self):
+        self.statuses = {}
+        if self.file_paths:
+            self.dataChanged.emit(self.index(0), self.index(len(self.file_paths) - 1), [FILE_STATUS_ROLE])
+
+class FileGridDelegate(QStyledItemDelegate):
+    sort_requested = pyqtSignal(str, bool)
+    file_clicked = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cell_size = QSize(200, 200)
+        self.play_icon = None
+
+    def sizeHint(self, option, index):
+        return self.cell_size
+
+    def cell_rect(self, option):
+        return option.rect.adjusted(2, 2, -2, -2)
+
+    def preview_rect(self, cell_rect):
+        # Area a hover preview covers, leaving the Public/Private buttons visible below it
+        rect = cell_rect.adjusted(2 + BORDER_WIDTH, 2 + BORDER_WIDTH, -2 - BORDER_WIDTH, -2 - BORDER_WIDTH)
+        rect.setBottom(rect.bottom() - BUTTON_HEIGHT)
+        return rect
+
+    def button_rects(self, option):
+        rect = self.cell_rect(option).adjusted(BORDER_WIDTH, BORDER_WIDTH, -BORDER_WIDTH, -BORDER_WIDTH)
+        half_width = rect.width() // 2
+        top = rect.bottom() - BUTTON_HEIGHT + 1
+        public_rect = QRect(rect.left(), top, half_width, BUTTON_HEIGHT)
+        private_rect = QRect(rect.left() + half_width, top, rect.width() - half_width, BUTTON_HEIGHT)
+        return public_rect, private_rect
+
+    def border_color(self, file_status):
+        if file_status is None:
+            return ERROR_COLOR
+        status, is_reviewed = file_status
+        status = status or 'public'
+        if not is_reviewed:
+            return UNREVIEWED_COLOR
+        if status == 'private':
+            return PRIVATE_COLOR
+        return PUBLIC_COLOR
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        rect = self.cell_rect(option)
+
+        # Status border
+        pen = QPen(self.border_color(index.data(FILE_STATUS_ROLE)))
+        pen.setWidth(BORDER_WIDTH)
+        painter.setPen(pen)
+        painter.drawRect(rect.adjusted(BORDER_WIDTH // 2, BORDER_WIDTH // 2, -(BORDER_WIDTH // 2), -(BORDER_WIDTH // 2)))
+        content_rect = rect.adjusted(BORDER_WIDTH, BORDER_WIDTH, -BORDER_WIDTH, -BORDER_WIDTH)
+
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            target_size = pixmap.size().scaled(content_rect.size(), Qt.AspectRatioMode.KeepAspectRatio)
+            target_rect = QRect(0, 0, target_size.width(), target_size.height())
+            target_rect.moveCenter(content_rect.center())
+            painter.drawPixmap(target_rect, pixmap)
+        else:
+            painter.setPen(option.palette.text().color())
+            painter.drawText(content_rect, Qt.AlignmentFlag.AlignCenter | Qt.TextFlag.TextWordWrap, index.data(Qt.ItemDataRole.DisplayRole))
+
+        if index.data(IS_VIDEO_ROLE):
+            if self.play_icon is None:
+                self.play_icon = option.widget.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
+            icon_rect = QRect(0, 0, 32, 32)
+            icon_rect.moveCenter(content_rect.center())
+            painter.fillRect(icon_rect, QColor(0, 0, 0, 128))
+            self.play_icon.paint(painter, icon_rect)
+
+            duration = index.data(DURATION_ROLE)
+            if duration:
+                minutes, seconds = divmod(int(duration), 60)
+                duration_text = f"{minutes}:{seconds:02d}"
+                text_rect = painter.fontMetrics().boundingRect(duration_text).adjusted(-4, -2, 4, 2)
+                text_rect.moveBottomRight(content_rect.bottomRight() - QPoint(4, 4))
+                painter.fillRect(text_rect, QColor(0, 0, 0, 160))
+                painter.setPen(QColor('white'))
+                painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, duration_text)
+
+        # Public/Private actions on hover
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            public_rect, private_rect = self.button_rects(option)
+            font = QFont(painter.font())
+            font.setBold(True)
+            painter.setFont(font)
+            painter.fillRect(public_rect, PUBLIC_COLOR)
+            painter.fillRect(private_rect, PRIVATE_COLOR)
+            painter.setPen(QColor('white'))
+            painter.drawText(public_rect, Qt.AlignmentFlag.AlignCenter, "Public")
+            painter.drawText(private_rect, Qt.AlignmentFlag.AlignCenter, "Private")
+
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            public_rect, private_rect = self.button_rects(option)
+            position = event.position().toPoint()
+            if public_rect.contains(position):
+                self.sort_requested.emit(index.data(FILE_PATH_ROLE), True)
+                return True
+            if private_rect.contains(position):
+                self.sort_requested.emit(index.data(FILE_PATH_ROLE), False)
+                return True
+            self.file_clicked.emit(index.data(FILE_PATH_ROLE))
+            return True
+        return super().editorEvent(event, model, option, index)
@@ -0,0 +1,151 @@
+# Reduced-size image decoding shared by the grid thumbnails and the zoomed view. Images are decoded
+# straight to the size they are shown at (JPEGs downscale during decode), and for grid thumbnails the
+# preview embedded in the EXIF data is used when it is big enough, so the full image is never decoded.
+
+import struct
+from PyQt6.QtGui import QImage, QImageReader, QTransform
+from PyQt6.QtCore import Qt, QSize
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# The EXIF segment is limited to 64 KB and sits at the start of the file
+EXIF_READ_BYTES = 128 * 1024
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_THUMBNAIL_OFFSET_TAG = 0x0201
+EXIF_THUMBNAIL_LENGTH_TAG = 0x0202
+# Embedded previews with a different aspect ratio are letterboxed and not used
+ASPECT_RATIO_TOLERANCE = 0.02
+
+def read_image(file_path, target_size):
+    # QImage fitted inside target_size (a QSize), EXIF orientation applied, None if it can't be decoded
+    reader = QImageReader(file_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid():
+        # The reader reports the stored size, swap it if auto-transform will rotate the image a quarter turn
+        rotated = bool(reader.transformation().value & 4)
+        if rotated:
+            size.transpose()
+        if size.width() > target_size.width() or size.height() > target_size.height():
+            scaled = size.scaled(target_size, Qt.AspectRatioMode.KeepAspectRatio)
+            if rotated:
+                scaled.transpose()
+            reader.setScaledSize(scaled)
+    image = reader.read()
+    if image.isNull():
+        return None
+    if image.width() > target_size.width() or image.height() > target_size.height():
+        image = image.scaled(target_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    return image
+
+def read_thumbnail(file_path, max_size):
+    # Longest edge at most max_size, from the embedded EXIF preview when one is large enough
+    image = read_exif_thumbnail(file_path, max_size)
+    if image is not None:
+        return image
+    return read_image(file_path, QSize(max_size, max_size))
+
+def read_exif_thumbnail(file_path, max_size):
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(EXIF_READ_BYTES)
+        exif = parse_exif(find_exif_segment(header))
+    except (OSError, struct.error, IndexError) as e:
+        logging.debug(f"No usable EXIF data in {file_path}: {str(e)}")
+        return None
+    if exif is None or exif[1] is None:
+        return None
+    orientation, thumbnail_data = exif
+
+    thumbnail = QImage.fromData(thumbnail_data, 'JPG')
+    if thumbnail.isNull() or max(thumbnail.width(), thumbnail.height()) < max_size:
+        return None
+    stored_size = QImageReader(file_path).size()
+    if not stored_size.isValid():
+        return None
+    if abs(thumbnail.width() / thumbnail.height() - stored_size.width() / stored_size.height()) > ASPECT_RATIO_TOLERANCE:
+        return None
+
+    thumbnail = apply_orientation(thumbnail, orientation)
+    if max(thumbnail.width(), thumbnail.height()) > max_size:
+        thumbnail = thumbnail.scaled(max_size, max_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    return thumbnail
+
+def find_exif_segment(data):
+    # TIFF-structured payload of the JPEG APP1 Exif segment, or None
+    if data[:2] != b'\xff\xd8':
+        return None
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            pos += 1
+            continue
+        if marker == 0xDA:
+            # Start of scan, there are no more metadata segments
+            return None
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b'Exif\x00\x00':
+            return data[pos + 10:pos + 2 + length]
+        pos += 2 + length
+    return None
+
+def parse_exif(tiff):
+    # (orientation, embedded JPEG thumbnail bytes or None), or None if tiff isn't valid EXIF
+    if tiff is None or len(tiff) < 8:
+        return None
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+    ifd0_entries, ifd1_offset = read_ifd(tiff, struct.unpack(endian + 'I', tiff[4:8])[0], endian)
+    orientation = ifd0_entries.get(EXIF_ORIENTATION_TAG, 1)
+
+    thumbnail = None
+    if ifd1_offset:
+        ifd1_entries, _ = read_ifd(tiff, ifd1_offset, endian)
+        offset = ifd1_entries.get(EXIF_THUMBNAIL_OFFSET_TAG)
+        length = ifd1_entries.get(EXIF_THUMBNAIL_LENGTH_TAG)
+        if offset and length and offset + length <= len(tiff):
+            thumbnail = tiff[offset:offset + length]
+    return orientation, thumbnail
+
+def read_ifd(tiff, offset, endian):
+    # Single-valued SHORT and LONG entries of one IFD, and the offset of the next IFD
+    count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+    entries = {}
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        tag, value_type, value_count = struct.unpack(endian + 'HHI', tiff[entry:entry + 8])
+        if value_count != 1:
+            continue
+        if value_type == 3:
+            entries[tag] = struct.unpack(endian + 'H', tiff[entry + 8:entry + 10])[0]
+        elif value_type == 4:
+            entries[tag] = struct.unpack(endian + 'I', tiff[entry + 8:entry + 12])[0]
+    next_offset_position = offset + 2 + count * 12
+    next_offset = struct.unpack(endian + 'I', tiff[next_offset_position:next_offset_position + 4])[0]
+    return entries, next_offset
+
+def apply_orientation(image, orientation):
+    # EXIF orientation values 2-8, embedded previews are stored unrotated like the main image
+    if orientation in (2, 4):
+        return image.mirrored(orientation == 2, orientation == 4)
+    if orientation == 3:
+        return image.transformed(QTransform().rotate(180))
+    if orientation in (5, 6, 7):
+        image = image.transformed(QTransform().rotate(90))
+        if orientation == 5:
+            return image.mirrored(True, False)
+        if orientation == 7:
+            return image.mirrored(False, True)
+        return image
+    if orientation == 8:
+        return image.transformed(QTransform().rotate(270))
+    return image
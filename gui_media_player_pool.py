@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from PyQt6.QtCore import Qt, QUrl
+import constants
+
+# Hover previews share these players instead of each thumbnail owning a decoder pipeline
+MEDIA_PLAYER_POOL_SIZE = getattr(constants, 'MEDIA_PLAYER_POOL_SIZE', 2)
+
+class PooledPlayer:
+    def __init__(self):
+        # Imported here so QtMultimedia is only loaded when the first video preview plays
+        from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+        from PyQt6.QtMultimediaWidgets import QVideoWidget
+        self.video_widget = QVideoWidget()
+        self.video_widget.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.video_widget.hide()
+        self.media_player = QMediaPlayer()
+        self.audio_output = QAudioOutput()
+        self.audio_output.setMuted(True)
+        self.media_player.setAudioOutput(self.audio_output)
+        self.media_player.setVideoOutput(self.video_widget)
+        self.media_player.setLoops(QMediaPlayer.Loops.Infinite)
+        self.file_path = None
+        self.owner = None
+
+class MediaPlayerPool:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MediaPlayerPool, cls).__new__(cls)
+            cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        # Least recently used first, players are created on first use
+        self.players = OrderedDict()
+        self.next_id = 0
+
+    def acquire(self, owner, file_path, parent, geometry):
+        # Shows file_path playing inside parent at geometry, bound to owner until release(owner)
+        player = self.find_player(file_path)
+        if player is None:
+            player = self.take_player()
+            player.file_path = file_path
+            player.media_player.setSource(QUrl.fromLocalFile(file_path))
+        player.owner = owner
+        player.video_widget.setParent(parent)
+        player.video_widget.setGeometry(geometry)
+        player.video_widget.show()
+        player.video_widget.raise_()
+        player.media_player.play()
+        return player.video_widget
+
+    def release(self, owner):
+        for player in self.players.values():
+            if player.owner is owner:
+                # The source stays loaded so hovering the same file again starts instantly
+                player.media_player.pause()
+                player.media_player.setPosition(0)
+                player.video_widget.hide()
+                # Detached so the widget doesn't die with a view that is torn down later
+                player.video_widget.setParent(None)
+                player.owner = None
+
+    def find_player(self, file_path):
+        for player_id, player in self.players.items():
+            if player.file_path == file_path:
+                self.players.move_to_end(player_id)
+                return player
+        return None
+
+    def take_player(self):
+        if len(self.players) < MEDIA_PLAYER_POOL_SIZE:
+            player_id = self.next_id
+            self.next_id += 1
+            self.players[player_id] = PooledPlayer()
+            return self.players[player_id]
+
+        # Reuse an idle player if there is one, otherwise the least recently used
+        for player_id, player in self.players.items():
+            if player.owner is None:
+                break
+        else:
+            player_id, player = next(iter(self.players.items()))
+        if player.owner is not None:
+            self.release(player.owner)
+        self.players.move_to_end(player_id)
+        return player
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QSize
+from gui_image_loader import read_image
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Files decoded ahead of and behind the one being reviewed
+READ_AHEAD_NEXT = 3
+READ_AHEAD_PREVIOUS = 1
+# Decoded images kept, a little more than the read-ahead window so stepping back and forth stays warm
+READ_AHEAD_CACHE_SIZE = READ_AHEAD_NEXT + READ_AHEAD_PREVIOUS + 3
+
+class ReadAheadTask(QRunnable):
+    def __init__(self, cache, generation, file_path, target_size):
+        super().__init__()
+        self.cache = cache
+        self.generation = generation
+        self.file_path = file_path
+        self.target_size = target_size
+
+    def run(self):
+        if self.generation != self.cache.generation:
+            return
+        try:
+            image = read_image(self.file_path, self.target_size)
+        except Exception as e:
+            logging.error(f"Error decoding {self.file_path}: {str(e)}")
+            image = None
+        self.cache.add_image(self.generation, self.file_path, image)
+
+class ReadAheadCache(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(2)
+        self.target_size = QSize()
+        self.generation = 0
+        self.images = OrderedDict()
+        # File path -> event set once its background decode has been added (or given up on by clear())
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def set_target_size(self, target_size):
+        # Images are decoded for one display size, a new size invalidates everything decoded so far
+        if target_size == self.target_size:
+            return
+        self.clear()
+        self.target_size = QSize(target_size)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.images = OrderedDict()
+            in_flight = self.in_flight
+            self.in_flight = {}
+        self.thread_pool.clear()
+        # Anyone waiting in get() decodes the file itself
+        for decoded in in_flight.values():
+            decoded.set()
+
+    def get(self, file_path):
+        # Decoded image if it is ready, waits for it if it is being read ahead, otherwise decodes it
+        # on the calling thread
+        with self.lock:
+            if file_path in self.images:
+                self.images.move_to_end(file_path)
+                return self.images[file_path]
+            decoded = self.in_flight.get(file_path)
+        if decoded is not None:
+            decoded.wait()
+            with self.lock:
+                if file_path in self.images:
+                    self.images.move_to_end(file_path)
+                    return self.images[file_path]
+        image = read_image(file_path, self.target_size)
+        self.add_image(self.generation, file_path, image)
+        return image
+
+    def prefetch(self, file_paths):
+        # Nearest files first, the pool works through them in order
+        with self.lock:
+            generation = self.generation
+            wanted = [file_path for file_path in file_paths if file_path not in self.images and file_path not in self.in_flight]
+            for file_path in wanted:
+                self.in_flight[file_path] = threading.Event()
+        for file_path in wanted:
+            self.thread_pool.start(ReadAheadTask(self, generation, file_path, self.target_size))
+
+    def add_image(self, generation, file_path, image):
+        with self.lock:
+            if generation != self.generation:
+                return
+            decoded = self.in_flight.pop(file_path, None)
+            self.images[file_path] = image
+            self.images.move_to_end(file_path)
+            while len(self.images) > READ_AHEAD_CACHE_SIZE:
+                self.images.popitem(last=False)
+        if decoded is not None:
+            decoded.set()
@@ -1,12 +1,43 @@
 import sys
+import time
+
+# Taken before the Qt imports so the startup breakdown covers them too
+STARTUP_STARTED = time.perf_counter()
+
 from PyQt6.QtWidgets import QApplication, QMainWindow, QHBoxLayout, QVBoxLayout, QWidget
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from gui_directory_tree import DirectoryTreePane
 from gui_directory_details import DirectoryDetailsPane
 from gui_files_grid import FilesGridPane
+from sift_io_utils import SiftIOUtils
+from sift_instrumentation import SiftInstrumentation
+from constants import PUBLIC_ROOT, PRIVATE_ROOT
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class StartupTimer:
+    # Seconds spent in each startup phase, logged once the directory tree is filled in
+    def __init__(self, started):
+        self.last = started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.phases)
+        breakdown = ', '.join(f"{phase} {seconds:.3f}s" for phase, seconds in self.phases)
+        logging.info(f"Startup took {total:.3f}s: {breakdown}")
+        instrumentation = SiftInstrumentation()
+        if instrumentation.enabled:
+            for phase, seconds in self.phases:
+                instrumentation.record(f"startup_{phase}", seconds)
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, io_utils):
         super().__init__()
         self.setWindowTitle("SIFT Image Sorter")
         self.setWindowState(Qt.WindowState.WindowMaximized)
@@ -22,10 +53,10 @@ class MainWindow(QMainWindow):
         left_layout = QVBoxLayout()
         left_widget.setLayout(left_layout)
 
-        # Create panes
-        self.directory_details = DirectoryDetailsPane()
-        self.directory_tree = DirectoryTreePane()
-        self.files_grid = FilesGridPane()
+        # Create panes, all sharing one SiftIOUtils so the index is only loaded once
+        self.directory_details = DirectoryDetailsPane(io_utils)
+        self.directory_tree = DirectoryTreePane(PUBLIC_ROOT, PRIVATE_ROOT, io_utils)
+        self.files_grid = FilesGridPane(io_utils)
 
         # Add directory details and directory tree to left layout
         left_layout.addWidget(self.directory_details, 25)
@@ -59,8 +90,28 @@ class MainWindow(QMainWindow):
         self.directory_tree.refresh_stats(path)
         self.files_grid.refresh_metadata(path)
 
+def populate_tree(window, timer):
+    window.directory_tree.populate()
+    timer.mark('tree')
+    timer.report()
+
 if __name__ == "__main__":
+    timer = StartupTimer(STARTUP_STARTED)
+    timer.mark('imports')
     app = QApplication(sys.argv)
-    window = MainWindow()
+    instrumentation = SiftInstrumentation()
+    if instrumentation.enabled:
+        # kill -USR1 <pid> writes the hot-path timings to stderr
+        instrumentation.install_dump_signal()
+    timer.mark('application')
+    io_utils = SiftIOUtils()
+    timer.mark('metadata')
+    window = MainWindow(io_utils)
+    # Connected after the panes so the tree's progress workers are stopped before the metadata is closed
+    app.aboutToQuit.connect(io_utils.close)
+    timer.mark('panes')
     window.show()
+    timer.mark('window')
+    # The tree is filled in on the first pass of the event loop, after the window is on screen
+    QTimer.singleShot(0, lambda: populate_tree(window, timer))
     sys.exit(app.exec())
\ No newline at end of file
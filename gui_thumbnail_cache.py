@@ -0,0 +1,214 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from PyQt6.QtGui import QImage, QImageReader
+from PyQt6.QtCore import Qt, QThread
+from constants import METADATA_FOLDER
+from sift_video_thumbnails import SiftVideoThumbnails
+from gui_image_loader import read_thumbnail
+import constants
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.wmv', '.mpg', '.mpeg']
+# Longest edge of each cached rendition, requests are served from the smallest one that is big enough
+THUMBNAIL_SIZES = (128, 256, 512)
+THUMBNAIL_CACHE_MAX_BYTES = getattr(constants, 'THUMBNAIL_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+THUMBNAIL_QUALITY = 85
+
+class ThumbnailCache:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ThumbnailCache, cls).__new__(cls)
+            cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.cache_dir = os.path.join(METADATA_FOLDER, 'thumbnails')
+        self.max_bytes = THUMBNAIL_CACHE_MAX_BYTES
+        self.lock = threading.Lock()
+        self.prewarmer = None
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+        # Listing a large cache takes seconds, so it is done in the background. Until it is done,
+        # get() looks for the file on disk instead of trusting entries.
+        self.loaded = threading.Event()
+        threading.Thread(target=self.load_entries, name='sift-thumbnail-cache-scan', daemon=True).start()
+
+    def load_entries(self):
+        # LRU order survives restarts through the file mtimes, which are touched on every hit
+        cached_files = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for file in files:
+                    if file.endswith('.jpg'):
+                        try:
+                            stat = os.stat(os.path.join(root, file))
+                        except OSError:
+                            continue
+                        cached_files.append((stat.st_mtime, file[:-4], stat.st_size))
+        cached_files.sort()
+
+        with self.lock:
+            # Entries used or written during the scan are the most recent ones
+            recent = self.entries
+            self.entries = OrderedDict((key, size) for _, key, size in cached_files if key not in recent)
+            self.entries.update(recent)
+            self.total_bytes = sum(self.entries.values())
+            self.loaded.set()
+            evicted = self.evict()
+        self.remove_files(evicted)
+        logging.debug(f"Thumbnail cache has {len(self.entries)} entries ({self.total_bytes} bytes)")
+
+    def rendition_for(self, size):
+        for rendition in THUMBNAIL_SIZES:
+            if rendition >= size:
+                return rendition
+        return THUMBNAIL_SIZES[-1]
+
+    def cache_key(self, file_path, rendition):
+        stat = os.stat(file_path)
+        key_source = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{rendition}"
+        return hashlib.sha1(key_source.encode('utf-8')).hexdigest()
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def get(self, file_path, size):
+        try:
+            key = self.cache_key(file_path, self.rendition_for(size))
+        except OSError:
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            elif self.loaded.is_set():
+                return None
+        cache_path = self.cache_path(key)
+        image = QImage(cache_path)
+        if image.isNull():
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+        try:
+            os.utime(cache_path)
+            size = os.path.getsize(cache_path)
+        except OSError:
+            return image
+        with self.lock:
+            if key not in self.entries:
+                # Found on disk before the background scan got to it
+                self.entries[key] = size
+                self.total_bytes += size
+        return image
+
+    def put(self, file_path, size, image):
+        try:
+            key = self.cache_key(file_path, self.rendition_for(size))
+        except OSError:
+            return
+        cache_path = self.cache_path(key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        if not image.save(temp_path, 'JPG', THUMBNAIL_QUALITY):
+            logging.error(f"Could not write thumbnail for {file_path}")
+            return
+        os.replace(temp_path, cache_path)
+        with self.lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+            self.entries[key] = os.path.getsize(cache_path)
+            self.total_bytes += self.entries[key]
+            evicted = self.evict()
+        self.remove_files(evicted)
+
+    def remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self.cache_path(key))
+            except OSError:
+                pass
+
+    def evict(self):
+        # Must be called with self.lock held, returns the keys whose files should be deleted.
+        # Nothing is evicted before the background scan is done, the oldest entries aren't known yet.
+        evicted = []
+        if not self.loaded.is_set():
+            return evicted
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            evicted.append(key)
+        if evicted:
+            logging.debug(f"Evicted {len(evicted)} thumbnails, cache is now {self.total_bytes} bytes")
+        return evicted
+
+    def load_thumbnail(self, file_path, size):
+        image = self.get(file_path, size)
+        if image is not None:
+            return image
+
+        _, file_extension = os.path.splitext(file_path)
+        if file_extension.lower() in VIDEO_EXTENSIONS:
+            return self.load_video_thumbnail(file_path, size)
+
+        image = read_thumbnail(file_path, self.rendition_for(size))
+        if image is not None:
+            self.put(file_path, size, image)
+        return image
+
+    def load_video_thumbnail(self, file_path, size):
+        # Videos are decoded once at the largest rendition and every smaller one is cached from that
+        jpeg_data = SiftVideoThumbnails().extract(file_path, THUMBNAIL_SIZES[-1])
+        if jpeg_data is None:
+            return None
+        image = QImage.fromData(jpeg_data, 'JPG')
+        if image.isNull():
+            return None
+        for rendition in reversed(THUMBNAIL_SIZES):
+            if max(image.width(), image.height()) > rendition:
+                image = image.scaled(rendition, rendition, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            self.put(file_path, rendition, image)
+        return self.get(file_path, size)
+
+    def prewarm(self, directory, size=THUMBNAIL_SIZES[-1]):
+        if self.prewarmer is not None:
+            if self.prewarmer.directory == directory and self.prewarmer.isRunning():
+                return
+            self.prewarmer.stop()
+            self.prewarmer.wait()
+        self.prewarmer = ThumbnailPrewarmer(self, directory, size)
+        self.prewarmer.start(QThread.Priority.LowestPriority)
+
+class ThumbnailPrewarmer(QThread):
+    def __init__(self, cache, directory, size):
+        super().__init__()
+        self.cache = cache
+        self.directory = directory
+        self.size = size
+        self.is_running = True
+        self.image_extensions = {f".{fmt.data().decode().lower()}" for fmt in QImageReader.supportedImageFormats()}
+
+    def run(self):
+        generated = 0
+        for root, _, files in os.walk(self.directory):
+            for file in sorted(files):
+                if not self.is_running:
+                    return
+                _, file_extension = os.path.splitext(file)
+                if file_extension.lower() not in self.image_extensions and file_extension.lower() not in VIDEO_EXTENSIONS:
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    if self.cache.get(file_path, self.size) is None and self.cache.load_thumbnail(file_path, self.size) is not None:
+                        generated += 1
+                except Exception as e:
+                    logging.error(f"Error generating thumbnail for {file_path}: {str(e)}")
+        logging.debug(f"Pre-warmed {generated} thumbnails under {self.directory}")
+
+    def stop(self):
+        self.is_running = False
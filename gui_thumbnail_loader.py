@@ -0,0 +1,74 @@
+import threading
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from gui_thumbnail_cache import ThumbnailCache
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# How often finished thumbnails are handed to the GUI thread, in milliseconds
+DELIVERY_INTERVAL = 50
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader, generation, file_path, size):
+        super().__init__()
+        self.loader = loader
+        self.generation = generation
+        self.file_path = file_path
+        self.size = size
+
+    def run(self):
+        # Skip the decode entirely if the folder was left while this task was queued
+        if self.generation != self.loader.generation:
+            return
+        try:
+            image = ThumbnailCache().load_thumbnail(self.file_path, self.size)
+        except Exception as e:
+            logging.error(f"Error loading thumbnail for {self.file_path}: {str(e)}")
+            image = None
+        self.loader.add_result(self.generation, self.file_path, image)
+
+class ThumbnailLoader(QObject):
+    # (generation, [(file_path, QImage or None), ...]) delivered on the GUI thread
+    thumbnails_loaded = pyqtSignal(int, list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool()
+        self.generation = 0
+        self.results = []
+        self.lock = threading.Lock()
+        self.delivery_timer = QTimer(self)
+        self.delivery_timer.setInterval(DELIVERY_INTERVAL)
+        self.delivery_timer.timeout.connect(self.deliver_results)
+
+    def request(self, file_paths, size):
+        for file_path in file_paths:
+            self.thread_pool.start(ThumbnailTask(self, self.generation, file_path, size))
+        if not self.delivery_timer.isActive():
+            self.delivery_timer.start()
+        return self.generation
+
+    def cancel(self):
+        # Drops queued tasks, tasks already running finish but their results are ignored
+        self.generation += 1
+        self.thread_pool.clear()
+        with self.lock:
+            self.results = []
+
+    def add_result(self, generation, file_path, image):
+        with self.lock:
+            if generation == self.generation:
+                self.results.append((file_path, image))
+
+    def deliver_results(self):
+        with self.lock:
+            results = self.results
+            self.results = []
+        if results:
+            self.thumbnails_loaded.emit(self.generation, results)
+        elif self.thread_pool.activeThreadCount() == 0:
+            self.delivery_timer.stop()
+
+    def shutdown(self):
+        self.cancel()
+        self.thread_pool.waitForDone()
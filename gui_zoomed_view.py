@@ -109,16 +109,16 @@ class ZoomedView(QWidget):
 
     def sort_public(self):
         if self.current_file_path:
-            self.sift_io.sort_file(self.current_file_path, True)
-            self.sift_metadata.update_manual_review_status(self.current_file_path, 'public')
+            # sort() records the review status itself
+            self.sift_io.sort(self.current_file_path, True)
             logging.debug(f"Sorted {self.current_file_path} as public")
             self.stats_updated.emit(os.path.dirname(self.current_file_path))
         self.close_zoomed()
 
     def sort_private(self):
         if self.current_file_path:
-            self.sift_io.sort_file(self.current_file_path, False)
-            self.sift_metadata.update_manual_review_status(self.current_file_path, 'private')
+            # sort() records the review status itself
+            self.sift_io.sort(self.current_file_path, False)
             logging.debug(f"Sorted {self.current_file_path} as private")
             self.stats_updated.emit(os.path.dirname(self.current_file_path))
         self.close_zoomed()
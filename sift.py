@@ -0,0 +1,161 @@
+# Headless batch sorter, for running large sorts on the storage host without the GUI.
+#
+#   python -m sift sort PATH [PATH ...] (--public | --private) [--dry-run] [--workers N]
+#   python -m sift resume [--workers N]
+#
+# Both take --stats FILE to write operation timings and byte counts as JSON when the run ends
+# (kill -USR1 writes them mid-run) and --profile FILE to run the first folder sort under cProfile.
+#
+# Folder sorts keep a checkpoint under METADATA_FOLDER, a sort that was killed is picked up where it
+# stopped by running it again or by `resume`, which finishes every interrupted sort.
+#
+# Progress is written to stdout as one JSON object per line, logging goes to stderr.
+
+import os
+import sys
+import json
+import time
+import argparse
+from constants import PUBLIC_ROOT, PRIVATE_ROOT
+from sift_io_utils import SiftIOUtils, BATCH_SORT_WORKERS
+from sift_metadata_journal import JournalLockedError
+from sift_instrumentation import SiftInstrumentation
+
+def emit(event, **fields):
+    print(json.dumps({'event': event, **fields}), flush=True)
+
+def normalize_path(path):
+    # Paths are handed to SiftIOUtils in the same form as the roots in constants.py
+    absolute_path = os.path.abspath(path)
+    for root in (PUBLIC_ROOT, PRIVATE_ROOT):
+        absolute_root = os.path.abspath(root)
+        if absolute_path == absolute_root or absolute_path.startswith(absolute_root + os.sep):
+            relative_path = os.path.relpath(absolute_path, absolute_root)
+            return root if relative_path == '.' else os.path.join(root, relative_path)
+    return None
+
+def collect_paths(paths):
+    # Drops paths outside the roots and paths already covered by another directory on the command line
+    normalized = []
+    rejected = 0
+    for path in paths:
+        normalized_path = normalize_path(path)
+        if normalized_path is None:
+            rejected += 1
+            emit('error', path=path, message=f"not under {PUBLIC_ROOT} or {PRIVATE_ROOT}")
+        elif not os.path.exists(normalized_path):
+            rejected += 1
+            emit('error', path=path, message="does not exist")
+        elif normalized_path not in normalized:
+            normalized.append(normalized_path)
+    paths = [path for path in normalized
+             if not any(other != path and path.startswith(other + os.sep) for other in normalized)]
+    return paths, rejected
+
+def open_io_utils():
+    # None if the GUI or another sort holds the metadata
+    try:
+        return SiftIOUtils()
+    except JournalLockedError as e:
+        emit('error', message=str(e))
+        return None
+
+def dry_run(io_utils, paths, is_public):
+    moves = 0
+    marks = 0
+    for path in paths:
+        for source, destination in io_utils.plan_sort(path, is_public):
+            if destination is None:
+                marks += 1
+                emit('plan', path=source, action='mark')
+            else:
+                moves += 1
+                emit('plan', path=source, action='move', destination=destination)
+    emit('summary', dry_run=True, moved=moves, marked=marks)
+    return 0
+
+def sort_paths(io_utils, paths, is_public, workers):
+    failed = 0
+    started = time.monotonic()
+    for path in paths:
+        emit('start', path=path)
+        path_started = time.monotonic()
+        try:
+            new_path = io_utils.sort(path, is_public, lambda percent, path=path: emit('progress', path=path, percent=percent), workers)
+        except Exception as e:
+            failed += 1
+            emit('error', path=path, message=str(e))
+            continue
+        fields = {'destination': new_path} if new_path else {}
+        emit('done', path=path, seconds=round(time.monotonic() - path_started, 3), **fields)
+    emit('summary', dry_run=False, sorted=len(paths) - failed, failed=failed, seconds=round(time.monotonic() - started, 3))
+    return 1 if failed else 0
+
+def resume_sorts(io_utils, workers):
+    failed = 0
+    resumed = 0
+    for dir_path, is_public in io_utils.list_interrupted_sorts():
+        emit('start', path=dir_path, resumed=True, public=is_public)
+        try:
+            io_utils.batch_sort_directory(dir_path, is_public, lambda percent, path=dir_path: emit('progress', path=path, percent=percent), workers)
+        except Exception as e:
+            failed += 1
+            emit('error', path=dir_path, message=str(e))
+            continue
+        resumed += 1
+        emit('done', path=dir_path)
+    emit('summary', dry_run=False, resumed=resumed, failed=failed)
+    return 1 if failed else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sift', description="Sort files and folders between the public and private roots.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    instrumentation_options = argparse.ArgumentParser(add_help=False)
+    instrumentation_options.add_argument('--stats', metavar='FILE', help="write operation timings and byte counts as JSON to FILE, also on SIGUSR1")
+    instrumentation_options.add_argument('--profile', metavar='FILE', help="write cProfile stats of the first folder sort to FILE")
+    sort_parser = subparsers.add_parser('sort', parents=[instrumentation_options], help="sort files or folders as public or private")
+    sort_parser.add_argument('paths', nargs='+', help="files or folders under PUBLIC_ROOT or PRIVATE_ROOT")
+    target = sort_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--public', action='store_true', help="sort into PUBLIC_ROOT")
+    target.add_argument('--private', action='store_true', help="sort into PRIVATE_ROOT")
+    sort_parser.add_argument('--dry-run', action='store_true', help="print what would be moved without changing anything")
+    sort_parser.add_argument('--workers', type=int, default=BATCH_SORT_WORKERS, help=f"copy/verify threads per folder (default {BATCH_SORT_WORKERS})")
+    resume_parser = subparsers.add_parser('resume', parents=[instrumentation_options], help="finish folder sorts that were interrupted")
+    resume_parser.add_argument('--workers', type=int, default=BATCH_SORT_WORKERS, help=f"copy/verify threads per folder (default {BATCH_SORT_WORKERS})")
+    args = parser.parse_args(argv)
+
+    instrumentation = SiftInstrumentation()
+    if args.stats:
+        instrumentation.enable()
+        instrumentation.install_dump_signal(args.stats)
+    if args.profile:
+        instrumentation.profile_next_batch(args.profile)
+
+    try:
+        if args.command == 'resume':
+            io_utils = open_io_utils()
+            if io_utils is None:
+                return 1
+            try:
+                return resume_sorts(io_utils, max(1, args.workers))
+            finally:
+                io_utils.close()
+
+        paths, rejected = collect_paths(args.paths)
+        io_utils = open_io_utils()
+        if io_utils is None:
+            return 1
+        try:
+            if args.dry_run:
+                status = dry_run(io_utils, paths, args.public)
+            else:
+                status = sort_paths(io_utils, paths, args.public, max(1, args.workers))
+        finally:
+            io_utils.close()
+        return 1 if rejected else status
+    finally:
+        if args.stats:
+            instrumentation.dump()
+
+if __name__ == "__main__":
+    sys.exit(main())
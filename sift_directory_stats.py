@@ -0,0 +1,248 @@
+# IMPORTANT: This module should only be used by sift_io_utils.py
+# Keeps review counts (total, reviewed, public, private) for every directory under the two roots,
+# aggregated over the whole subtree. Counts are built once per root and then adjusted along the
+# ancestor chain on every sort, move and directory removal.
+
+import os
+import json
+import threading
+from constants import PUBLIC_ROOT, PRIVATE_ROOT, METADATA_FOLDER
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TOTAL, REVIEWED, PUBLIC, PRIVATE = range(4)
+# Walks of a subtree that raced a sort in the same root before the last walk's counts are kept as they are
+RECOUNT_ATTEMPTS = 3
+
+class SiftDirectoryStats:
+    def __init__(self, file_status_callback, walk=os.walk):
+        # file_status_callback(file_path) -> (status, is_reviewed), the same lookup get_directory_status uses
+        self.file_status_callback = file_status_callback
+        self.walk = walk
+        self.stats_file = os.path.join(METADATA_FOLDER, 'index', 'directory_stats.json')
+        self.dirty_marker = f"{self.stats_file}.dirty"
+        self.roots = {'public': os.path.normpath(PUBLIC_ROOT), 'private': os.path.normpath(PRIVATE_ROOT)}
+        self.counts = {}
+        self.built_roots = set()
+        self.marked_dirty = False
+        # Bumped on every change, so a save can tell whether counts changed while it was writing
+        self.version = 0
+        # Sorts and removals per root, so a walk done without the lock can tell it raced one
+        self.root_changes = {root: 0 for root in self.roots.values()}
+        # The lock is never held while calling file_status_callback or writing the stats file. The
+        # metadata lock is taken before this one (sorts update counts inside a metadata batch, and
+        # compaction saves the stats), so taking them the other way round would deadlock.
+        self.lock = threading.RLock()
+        self.save_lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        # A leftover dirty marker means counts changed after the last save, so they can't be trusted
+        if os.path.exists(self.dirty_marker):
+            logging.info("Directory stats were not saved cleanly, they will be rebuilt on demand")
+            return
+        if not os.path.exists(self.stats_file):
+            return
+        try:
+            with open(self.stats_file, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logging.error(f"Error reading directory stats {self.stats_file}: {str(e)}")
+            return
+        for root_name, directories in data.get('roots', {}).items():
+            root = self.roots.get(root_name)
+            if root is None:
+                continue
+            for relative_dir, counts in directories.items():
+                self.counts[os.path.normpath(os.path.join(root, relative_dir))] = counts
+            self.built_roots.add(root)
+        logging.debug(f"Loaded directory stats for {len(self.counts)} directories")
+
+    def save(self):
+        # Snapshot under the lock, write outside it
+        with self.save_lock:
+            with self.lock:
+                version = self.version
+                data = {'roots': {}}
+                for root_name, root in self.roots.items():
+                    if root not in self.built_roots:
+                        continue
+                    directories = {}
+                    for dir_path, counts in self.counts.items():
+                        if dir_path == root or dir_path.startswith(root + os.sep):
+                            directories[os.path.relpath(dir_path, root)] = list(counts)
+                    data['roots'][root_name] = directories
+
+            os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+            temp_path = f"{self.stats_file}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.stats_file)
+
+            with self.lock:
+                # Counts changed while writing are not in the file, the marker stays until the next save
+                if self.version == version:
+                    if os.path.exists(self.dirty_marker):
+                        os.remove(self.dirty_marker)
+                    self.marked_dirty = False
+        logging.debug(f"Directory stats saved to {self.stats_file}")
+
+    def mark_dirty(self):
+        # Must be called with self.lock held
+        self.version += 1
+        if not self.marked_dirty:
+            os.makedirs(os.path.dirname(self.dirty_marker), exist_ok=True)
+            with open(self.dirty_marker, 'w'):
+                pass
+            self.marked_dirty = True
+
+    def get_root(self, path):
+        path = os.path.normpath(path)
+        for root in self.roots.values():
+            if path == root or path.startswith(root + os.sep):
+                return root
+        return None
+
+    def count_file(self, file_path):
+        if os.path.basename(file_path).startswith('.'):
+            return None
+        return self.status_counts(self.file_status_callback(file_path))
+
+    def count_subtree(self, dir_path):
+        # Single bottom-up walk: each directory's counts are its own files plus its children's totals.
+        # Looks up every file's status, so it must be called without self.lock held.
+        subtree = {}
+        for root, dirs, files in self.walk(dir_path, topdown=False):
+            counts = [0, 0, 0, 0]
+            for file in files:
+                file_counts = self.count_file(os.path.join(root, file))
+                if file_counts:
+                    for i in range(4):
+                        counts[i] += file_counts[i]
+            for dir_name in dirs:
+                child_counts = subtree.get(os.path.normpath(os.path.join(root, dir_name)))
+                if child_counts:
+                    for i in range(4):
+                        counts[i] += child_counts[i]
+            subtree[os.path.normpath(root)] = counts
+        return subtree
+
+    def ensure_root(self, root):
+        for attempt in range(RECOUNT_ATTEMPTS):
+            with self.lock:
+                if root in self.built_roots:
+                    return
+                changes = self.root_changes[root]
+            logging.debug(f"Building directory stats for {root}")
+            subtree = self.count_subtree(root)
+            with self.lock:
+                if root in self.built_roots:
+                    return
+                # A file sorted during the walk may have been counted before its change, count again
+                if self.root_changes[root] != changes and attempt < RECOUNT_ATTEMPTS - 1:
+                    continue
+                self.mark_dirty()
+                self.counts.update(subtree)
+                self.built_roots.add(root)
+                return
+
+    def get_directory_status(self, dir_path):
+        root = self.get_root(dir_path)
+        if root is None:
+            return None
+        self.ensure_root(root)
+        with self.lock:
+            counts = self.counts.get(os.path.normpath(dir_path), [0, 0, 0, 0])
+            return {
+                'public': counts[PUBLIC],
+                'private': counts[PRIVATE],
+                'reviewed': counts[REVIEWED],
+                'unreviewed': counts[TOTAL] - counts[REVIEWED],
+                'total': counts[TOTAL]
+            }
+
+    def apply_delta(self, file_path, delta, sign):
+        # Must be called with self.lock held
+        root = self.get_root(file_path)
+        if root is None:
+            return
+        self.root_changes[root] += 1
+        if root not in self.built_roots:
+            # Unbuilt roots are counted from disk when first needed
+            return
+        self.mark_dirty()
+        dir_path = os.path.normpath(os.path.dirname(file_path))
+        while True:
+            counts = self.counts.setdefault(dir_path, [0, 0, 0, 0])
+            for i in range(4):
+                counts[i] += sign * delta[i]
+            if dir_path == root:
+                break
+            dir_path = os.path.dirname(dir_path)
+
+    def status_counts(self, file_status):
+        status, is_reviewed = file_status
+        return [1, 1 if is_reviewed else 0, 1 if status == 'public' else 0, 1 if status == 'private' else 0]
+
+    def update_file(self, file_path, old_status, new_status):
+        if os.path.basename(file_path).startswith('.'):
+            return
+        with self.lock:
+            self.apply_delta(file_path, self.status_counts(old_status), -1)
+            self.apply_delta(file_path, self.status_counts(new_status), 1)
+
+    def move_file(self, old_path, old_status, new_path, new_status):
+        if os.path.basename(old_path).startswith('.'):
+            return
+        with self.lock:
+            self.apply_delta(old_path, self.status_counts(old_status), -1)
+            self.apply_delta(new_path, self.status_counts(new_status), 1)
+
+    def remove_directory(self, dir_path):
+        dir_path = os.path.normpath(dir_path)
+        root = self.get_root(dir_path)
+        with self.lock:
+            if root is None:
+                return
+            self.root_changes[root] += 1
+            if root not in self.built_roots:
+                return
+            self.mark_dirty()
+            for path in [path for path in self.counts if path == dir_path or path.startswith(dir_path + os.sep)]:
+                del self.counts[path]
+
+    def rebuild_directory(self, dir_path):
+        # Recount one subtree from disk (e.g. after changes made outside the app) and carry the difference up
+        dir_path = os.path.normpath(dir_path)
+        root = self.get_root(dir_path)
+        if root is None:
+            return
+        for attempt in range(RECOUNT_ATTEMPTS):
+            with self.lock:
+                built = root in self.built_roots
+                changes = self.root_changes[root]
+            if not built:
+                self.ensure_root(root)
+                return
+            subtree = self.count_subtree(dir_path)
+            with self.lock:
+                if self.root_changes[root] != changes and attempt < RECOUNT_ATTEMPTS - 1:
+                    continue
+                self.mark_dirty()
+                old_counts = self.counts.get(dir_path, [0, 0, 0, 0])
+                new_counts = subtree.get(dir_path, [0, 0, 0, 0])
+                for path in [path for path in self.counts if path == dir_path or path.startswith(dir_path + os.sep)]:
+                    del self.counts[path]
+                self.counts.update(subtree)
+
+                delta = [new_counts[i] - old_counts[i] for i in range(4)]
+                parent_path = dir_path
+                while parent_path != root:
+                    parent_path = os.path.dirname(parent_path)
+                    counts = self.counts.setdefault(parent_path, [0, 0, 0, 0])
+                    for i in range(4):
+                        counts[i] += delta[i]
+                return
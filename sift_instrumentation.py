@@ -0,0 +1,231 @@
+# Timing and byte counters for the sort and metadata hot paths, off unless INSTRUMENTATION is set in
+# constants.py, SIFT_INSTRUMENTATION is set in the environment, or a caller enables it (sift.py --stats).
+# While it is off a span costs one flag check, so the decorators can stay on the hot paths.
+#
+# Latencies go into power-of-two microsecond buckets per operation. dump() writes everything as JSON,
+# on demand via SIGUSR1 once install_dump_signal() has been called.
+
+import os
+import sys
+import json
+import time
+import signal
+import cProfile
+import functools
+import threading
+import constants
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+INSTRUMENTATION = getattr(constants, 'INSTRUMENTATION', False) or bool(os.environ.get('SIFT_INSTRUMENTATION'))
+# Bucket i holds durations below 2**i microseconds, the last bucket everything above ~1 minute
+HISTOGRAM_BUCKETS = 27
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.bytes = 0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1000000).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket the percentile falls in, in seconds
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min((2 ** index) / 1000000, self.max)
+        return self.max
+
+    def to_dict(self):
+        result = {
+            'count': self.count,
+            'total_seconds': round(self.total, 6),
+            'mean_seconds': round(self.total / self.count, 6) if self.count else None,
+            'min_seconds': round(self.min, 6) if self.min is not None else None,
+            'max_seconds': round(self.max, 6) if self.max is not None else None,
+            'p50_seconds': round(self.percentile(0.5), 6) if self.count else None,
+            'p90_seconds': round(self.percentile(0.9), 6) if self.count else None,
+            'p99_seconds': round(self.percentile(0.99), 6) if self.count else None,
+            # Upper bound in microseconds -> count, empty buckets left out
+            'histogram_us': {str(2 ** index): count for index, count in enumerate(self.buckets) if count},
+        }
+        if self.bytes:
+            result['bytes'] = self.bytes
+            if self.total:
+                result['megabytes_per_second'] = round(self.bytes / self.total / (1024 * 1024), 2)
+        return result
+
+class Span:
+    __slots__ = ('instrumentation', 'name', 'started')
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instrumentation.record(self.name, time.perf_counter() - self.started)
+        return False
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class SiftInstrumentation:
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(SiftInstrumentation, cls).__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.enabled = INSTRUMENTATION
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.started = time.time()
+        self.dump_path = None
+        self.dump_lock = threading.Lock()
+        self.profile_path = None
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.started = time.time()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.histogram(name).add(seconds)
+
+    def add_bytes(self, name, byte_count):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.histogram(name).bytes += byte_count
+
+    def snapshot(self):
+        with self.lock:
+            operations = {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+        return {
+            'pid': os.getpid(),
+            'started': self.started,
+            'elapsed_seconds': round(time.time() - self.started, 3),
+            'operations': operations,
+        }
+
+    def dump(self, path=None):
+        # Writes the counters to path (or the path given to install_dump_signal), stderr if neither is set
+        data = json.dumps(self.snapshot(), indent=2)
+        path = path or self.dump_path
+        if path is None:
+            print(data, file=sys.stderr, flush=True)
+            return
+        # A signal dump and the dump at the end of a run share the temp file
+        with self.dump_lock:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(data + '\n')
+            os.replace(temp_path, path)
+        logging.info(f"Instrumentation written to {path}")
+
+    def install_dump_signal(self, path=None):
+        # SIGUSR1 dumps the counters of a running process, only possible from the main thread
+        self.dump_path = path
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self.handle_dump_signal)
+
+    def handle_dump_signal(self, signum, frame):
+        # The handler runs on the main thread between bytecodes, possibly while that thread holds
+        # self.lock in record(), so the dump is left to a thread of its own
+        threading.Thread(target=self.dump, name='sift-instrumentation-dump', daemon=True).start()
+
+    def profile_next_batch(self, path):
+        # The next profiled() block (one batch sort) is run under cProfile and its stats written to path
+        self.profile_path = path
+
+    def profiled(self):
+        if self.profile_path is None:
+            return NULL_SPAN
+        path = self.profile_path
+        self.profile_path = None
+        return ProfiledBlock(path)
+
+class ProfiledBlock:
+    # cProfile only sees the thread that enters the block, transfers on worker threads show up
+    # as time spent waiting on their futures, the spans above cover what they do
+    def __init__(self, path):
+        self.path = path
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.disable()
+        self.profiler.dump_stats(self.path)
+        logging.info(f"Profile written to {self.path}")
+        return False
+
+def span(name):
+    instrumentation = SiftInstrumentation()
+    if not instrumentation.enabled:
+        return NULL_SPAN
+    return Span(instrumentation, name)
+
+def add_bytes(name, byte_count):
+    SiftInstrumentation().add_bytes(name, byte_count)
+
+def timed(name):
+    # Decorator form of span(), the flag is checked on every call so it can be switched on at runtime
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            instrumentation = SiftInstrumentation._instance
+            if instrumentation is None or not instrumentation.enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                instrumentation.record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+SiftInstrumentation()
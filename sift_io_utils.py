@@ -2,43 +2,90 @@ import os
 import shutil
 import hashlib
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from sift_metadata_utils import SiftMetadataUtils
-from constants import PUBLIC_ROOT, PRIVATE_ROOT, METADATA_FOLDER, SAFE_DELETE_ROOT
-import pdb  # Add this import at the top of the file
+from sift_metadata_utils import create_metadata_utils
+from sift_directory_stats import SiftDirectoryStats
+from sift_scan_cache import SiftScanCache
+from sift_sort_checkpoint import SiftSortCheckpoint
+from sift_instrumentation import SiftInstrumentation, timed, add_bytes, span
+from constants import PUBLIC_ROOT, PRIVATE_ROOT, SAFE_DELETE_ROOT
+import constants
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Any hashlib algorithm name works; "md5" matches existing checksums, "blake2b" is faster
+HASH_ALGORITHM = getattr(constants, 'HASH_ALGORITHM', 'md5')
+COPY_CHUNK_SIZE = getattr(constants, 'COPY_CHUNK_SIZE', 1024 * 1024)
+# "auto" renames when source, destination and SAFE_DELETE_ROOT share a device, "copy" always does a verified copy
+MOVE_MODE = getattr(constants, 'MOVE_MODE', 'auto')
+# Copy/hash/verify threads used by batch sorts, keep this low for spinning disks
+BATCH_SORT_WORKERS = getattr(constants, 'BATCH_SORT_WORKERS', 2)
+BATCH_COMMIT_SIZE = getattr(constants, 'BATCH_COMMIT_SIZE', 100)
+
 class SiftIOUtils:
+    # Every instance in a process shares one metadata store. It owns the metadata journal, and two of
+    # them would compact and truncate it under each other.
+    _metadata_utils = None
+    _metadata_users = 0
+    _metadata_lock = threading.Lock()
+
     def __init__(self, gui_refresh_callback=None):
-        self.metadata_utils = SiftMetadataUtils()
+        self.metadata_utils = self.open_metadata_utils()
+        self.closed = False
+        self.scan_cache = SiftScanCache()
+        self.directory_stats = SiftDirectoryStats(self.metadata_utils.get_file_status, self.scan_cache.walk)
+        self.metadata_utils.checkpoint_listeners.append(self.directory_stats.save)
         self.gui_refresh_callback = gui_refresh_callback
+        self.reserved_paths = set()
+        self.reserved_paths_lock = threading.Lock()
+
+    @classmethod
+    def open_metadata_utils(cls):
+        with cls._metadata_lock:
+            if cls._metadata_utils is None:
+                cls._metadata_utils = create_metadata_utils()
+            cls._metadata_users += 1
+            return cls._metadata_utils
+
+    def close(self):
+        # The shared metadata is closed with its last user
+        with SiftIOUtils._metadata_lock:
+            if self.closed:
+                return
+            self.closed = True
+            SiftIOUtils._metadata_users -= 1
+            last_user = SiftIOUtils._metadata_users == 0
+            if last_user:
+                SiftIOUtils._metadata_utils = None
+        if last_user:
+            self.metadata_utils.close()
+        self.directory_stats.save()
+        self.scan_cache.save()
 
     def list_directory(self, directory):
         contents = os.listdir(directory)
         logging.debug(f"Listed directory {directory}: {len(contents)} items found")
         return contents
 
-    def sort(self, path, is_public):
+    def sort(self, path, is_public, progress_callback=None, workers=None):
         if os.path.isdir(path):
             logging.debug(f"sort() called on a directory: {path}")
-            pdb.set_trace() 
-            self.batch_sort_directory(path, is_public)
+            self.batch_sort_directory(path, is_public, progress_callback, workers)
         else:
             logging.debug(f"sort() called on a file: {path}")
-            pdb.set_trace()
             current_root = PRIVATE_ROOT if path.startswith(PRIVATE_ROOT) else PUBLIC_ROOT
             target_root = PUBLIC_ROOT if is_public else PRIVATE_ROOT
             
             if current_root == target_root:
                 logging.debug(f"sort() current_root == target_root so just updating metadata")
-                pdb.set_trace()
                 # File is already in the correct root, just update metadata
                 self.update_file_metadata(path, is_public)
                 new_path = path
             else:
                 logging.debug(f"sort() current_root is not target_root so file must be moved.")
-                pdb.set_trace()
                 # File needs to be moved
                 new_path, _, _ = self.move_file(path, is_public)
             
@@ -46,71 +93,132 @@ class SiftIOUtils:
             
             return new_path
 
+    def plan_sort(self, path, is_public):
+        # (source, destination) pairs sort() would produce, destination is None when only the metadata
+        # changes. Nothing on disk or in the metadata is touched.
+        if os.path.isdir(path):
+            files = [os.path.join(root, file) for root, _, files in self.scan_cache.walk(path) for file in files]
+        else:
+            files = [path]
+
+        target_root = PUBLIC_ROOT if is_public else PRIVATE_ROOT
+        planned_paths = set()
+        plan = []
+        for file_path in files:
+            current_root = PRIVATE_ROOT if file_path.startswith(PRIVATE_ROOT) else PUBLIC_ROOT
+            if current_root == target_root:
+                plan.append((file_path, None))
+                continue
+            dest_path = self.next_free_path(os.path.join(target_root, os.path.relpath(file_path, current_root)), planned_paths)
+            planned_paths.add(dest_path)
+            plan.append((file_path, dest_path))
+        return plan
+
+    @timed('update_file_metadata')
     def update_file_metadata(self, path, is_public):
         new_status = 'public' if is_public else 'private'
+        old_file_status = self.metadata_utils.get_file_status(path)
         self.metadata_utils.update_manual_review_status(path, new_status)
-        logging.debug(f"Updated metadata for {path}: status={new_status}, reviewed=True")
+        self.directory_stats.update_file(path, old_file_status, self.metadata_utils.get_file_status(path))
+        logging.debug("Updated metadata for %s: status=%s, reviewed=True", path, new_status)
 
+    @timed('move_file')
     def move_file(self, file_path, is_public):
-        logging.debug(f"move_file() called file_path: {file_path}")
-        pdb.set_trace()
+        logging.debug("move_file() called file_path: %s", file_path)
         if os.path.isdir(file_path):
-            logging.debug(f"Skipping directory in move_file: {file_path}")
+            logging.debug("Skipping directory in move_file: %s", file_path)
             return file_path, False, []
 
+        dest_path, new_dir_created = self.transfer_file(file_path, is_public)
+        self.update_moved_file_metadata(file_path, dest_path)
+
+        original_dir = os.path.dirname(file_path)
+        dir_removed = self.check_and_remove_empty_directory(original_dir)
+
+        logging.debug("move_file() done: %s", file_path)
+
+        return dest_path, new_dir_created, dir_removed
+
+    @timed('update_moved_file_metadata')
+    def update_moved_file_metadata(self, file_path, dest_path):
+        old_file_status = self.metadata_utils.get_file_status(file_path)
+        self.metadata_utils.update_file_path(file_path, dest_path)
+        self.directory_stats.move_file(file_path, old_file_status, dest_path, self.metadata_utils.get_file_status(dest_path))
+
+    # Moves the file data (backup, copy or rename, verify, remove) without touching metadata.
+    # Safe to call from several threads at once, batch_sort_directory commits the metadata afterwards.
+    @timed('transfer_file')
+    def transfer_file(self, file_path, is_public, checkpoint=None):
         source_root = PUBLIC_ROOT if file_path.startswith(PUBLIC_ROOT) else PRIVATE_ROOT
         dest_root = PUBLIC_ROOT if is_public else PRIVATE_ROOT
         rel_path = os.path.relpath(file_path, source_root)
         dest_path = os.path.join(dest_root, rel_path)
 
-        logging.debug(f"Moving file from {file_path} to {dest_path}")
+        logging.debug("Moving file from %s to %s", file_path, dest_path)
         new_dir_created = self.create_directory_if_not_exists(os.path.dirname(dest_path))
 
-        if os.path.exists(dest_path):
+        dest_path = self.reserve_destination_path(dest_path)
+        try:
+            if checkpoint is not None:
+                checkpoint.begin_transfer(file_path, dest_path)
+            backup_path = self.get_backup_path(file_path)
+            os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+
+            if MOVE_MODE == 'auto' and self.is_same_device(file_path, os.path.dirname(dest_path), os.path.dirname(backup_path)):
+                # Same filesystem: keep the backup as a hardlink and rename, no file data is copied
+                self.link_backup(file_path, backup_path)
+                os.rename(file_path, dest_path)
+                logging.debug("File renamed on the same device: %s -> %s", file_path, dest_path)
+            else:
+                # Read the source once, writing the destination and the safe-delete backup while hashing it
+                source_checksum = self.copy_and_hash(file_path, [dest_path, backup_path])
+                logging.debug("Created backup: %s -> %s", file_path, backup_path)
+                if not self.verify_file_checksum(dest_path, source_checksum):
+                    logging.error(f"move_file() File integrity check failed for {file_path}")
+                    raise Exception("File integrity check failed")
+                os.remove(file_path)
+                logging.debug("File removed successfully: %s -> %s", file_path, dest_path)
+        finally:
+            self.release_destination_path(dest_path)
+
+        return dest_path, new_dir_created
+
+    def reserve_destination_path(self, dest_path):
+        # Concurrent transfers must not pick the same free name before either file exists on disk
+        with self.reserved_paths_lock:
+            dest_path = self.next_free_path(dest_path, self.reserved_paths)
+            self.reserved_paths.add(dest_path)
+        return dest_path
+
+    def next_free_path(self, dest_path, taken_paths):
+        # dest_path, or name_1.ext, name_2.ext... if it exists on disk or is in taken_paths
+        if os.path.exists(dest_path) or dest_path in taken_paths:
             base, ext = os.path.splitext(dest_path)
             counter = 1
-            while os.path.exists(f"{base}_{counter}{ext}"):
+            while os.path.exists(f"{base}_{counter}{ext}") or f"{base}_{counter}{ext}" in taken_paths:
                 counter += 1
             dest_path = f"{base}_{counter}{ext}"
             logging.debug(f"Destination file already exists. Renamed to {dest_path}")
+        return dest_path
 
-        self.create_backup(file_path)
-        shutil.copy2(file_path, dest_path)
-
-        logging.debug(f"File moved, will start cleanup: {dest_path}")
-        pdb.set_trace()
-
-        if self.verify_file_integrity(file_path, dest_path):
-            os.remove(file_path)
-            logging.debug(f"File removed successfully: {file_path} -> {dest_path}")
-            self.metadata_utils.update_file_path(file_path, dest_path)
-            
-            original_dir = os.path.dirname(file_path)
-            dir_removed = self.check_and_remove_empty_directory(original_dir)
-
-            logging.debug(f"move_file() done: {file_path}")
-            pdb.set_trace()
-            
-            return dest_path, new_dir_created, dir_removed
-        else:
-            logging.error(f"move_file() File integrity check failed for {file_path}")
-            pdb.set_trace()
-            raise Exception("File integrity check failed")
-        
-        
+    def release_destination_path(self, dest_path):
+        with self.reserved_paths_lock:
+            self.reserved_paths.discard(dest_path)
 
     def create_directory_if_not_exists(self, directory):
         if not os.path.exists(directory):
-            os.makedirs(directory)
-            logging.debug(f"Created new directory: {directory}")
-            pdb.set_trace()
+            try:
+                os.makedirs(directory)
+            except FileExistsError:
+                return False
+            logging.debug("Created new directory: %s", directory)
             return True
         return False
 
     def check_and_remove_empty_directory(self, directory):
-        logging.debug(f"Checking directory for removal: {directory}")
+        logging.debug("Checking directory for removal: %s", directory)
         if directory == PUBLIC_ROOT or directory == PRIVATE_ROOT:
-            logging.debug(f"Skipping root directory: {directory}")
+            logging.debug("Skipping root directory: %s", directory)
             return False  # Don't remove root directories
         
         try:
@@ -118,27 +226,29 @@ class SiftIOUtils:
             ds_store_path = os.path.join(directory, '.DS_Store')
             if os.path.exists(ds_store_path):
                 os.remove(ds_store_path)
-                logging.debug(f"Removed .DS_Store file from {directory}")
+                logging.debug("Removed .DS_Store file from %s", directory)
 
             # Get contents, ignoring .DS_Store
             contents = [item for item in os.listdir(directory) if item != '.DS_Store']
-            logging.debug(f"Directory contents (excluding .DS_Store): {contents}")
+            logging.debug("Directory contents (excluding .DS_Store): %s", contents)
             
             if not contents:
-                logging.debug(f"Directory appears empty, double-checking: {directory}")
+                logging.debug("Directory appears empty, double-checking: %s", directory)
                 # Double-check for any hidden files, ignoring .DS_Store
                 scanned_contents = [entry for entry in os.scandir(directory) if entry.name != '.DS_Store']
-                logging.debug(f"Scanned directory contents (excluding .DS_Store): {[entry.name for entry in scanned_contents]}")
+                logging.debug("Scanned directory contents (excluding .DS_Store): %s", scanned_contents)
                 
                 if not scanned_contents:
-                    logging.debug(f"Attempting to remove empty directory: {directory}")
+                    logging.debug("Attempting to remove empty directory: %s", directory)
                     os.rmdir(directory)
-                    logging.debug(f"Successfully removed empty directory: {directory}")
+                    self.directory_stats.remove_directory(directory)
+                    self.scan_cache.forget(directory)
+                    logging.debug("Successfully removed empty directory: %s", directory)
                     return True
                 else:
-                    logging.debug(f"Directory not empty after scan, skipping removal: {directory}")
+                    logging.debug("Directory not empty after scan, skipping removal: %s", directory)
             else:
-                logging.debug(f"Directory not empty, skipping removal: {directory}")
+                logging.debug("Directory not empty, skipping removal: %s", directory)
         except Exception as e:
             logging.error(f"Error checking/removing directory {directory}: {str(e)}")
         
@@ -146,40 +256,166 @@ class SiftIOUtils:
 
     # NOTE: This method should only be called from within sift_io_utils.py.
     # For external sorting operations, use the sort() method instead.
-    def batch_sort_directory(self, dir_path, is_public, progress_callback=None):
+    @timed('batch_sort_directory')
+    def batch_sort_directory(self, dir_path, is_public, progress_callback=None, workers=None):
         logging.debug(f"batch_sort_directory() called on: {dir_path}")
-        files_to_process = []
-        for root, _, files in os.walk(dir_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                files_to_process.append(file_path)
+        with SiftInstrumentation().profiled():
+            self.sort_directory_files(dir_path, is_public, progress_callback, workers)
 
-        total_files = len(files_to_process)
-        logging.debug(f"Found {total_files} files to process")
+    def sort_directory_files(self, dir_path, is_public, progress_callback, workers):
+        checkpoint = SiftSortCheckpoint(dir_path, is_public)
+        try:
+            if checkpoint.is_reversed:
+                # The folder is now sorted the other way, the newer decision wins over the interrupted sort
+                logging.info(f"Discarding interrupted sort of {dir_path}, it is now sorted as {'public' if is_public else 'private'}")
+                self.reconcile_checkpoint(checkpoint)
+                checkpoint.discard()
+            if checkpoint.is_resumed:
+                # An earlier run of this sort was interrupted, finish what it left half done and carry on from there
+                logging.info(f"Resuming interrupted sort of {dir_path}")
+                self.reconcile_checkpoint(checkpoint)
+                files_to_process = []
+                for file_path, planned_status in checkpoint.remaining_files():
+                    if not os.path.exists(file_path):
+                        continue
+                    # Sorted or marked on its own since the plan was made, that decision is newer
+                    if planned_status is not None and self.metadata_utils.get_file_status(file_path) != planned_status:
+                        logging.info(f"Skipping {file_path}, its metadata changed after the sort was interrupted")
+                        continue
+                    files_to_process.append(file_path)
+            else:
+                files_to_process = []
+                for root, _, files in self.scan_cache.walk(dir_path):
+                    for file in files:
+                        file_path = os.path.join(root, file)
+                        files_to_process.append(file_path)
+                checkpoint.start(files_to_process, [self.metadata_utils.get_file_status(file_path) for file_path in files_to_process])
 
-        for i, file_path in enumerate(files_to_process):
-            logging.debug(f"Processing file {i+1}/{total_files}: {file_path}")
-            self.sort(file_path, is_public)
-            if progress_callback:
-                progress_callback(int((i + 1) / total_files * 100))
+            total_files = len(files_to_process)
+            workers = workers or BATCH_SORT_WORKERS
+            logging.debug(f"Found {total_files} files to process with {workers} workers")
 
-        logging.debug("All files processed, starting cleanup")
-        self.batch_cleanup_empty_directories(dir_path)
+            target_root = PUBLIC_ROOT if is_public else PRIVATE_ROOT
+            processed = 0
+            first_error = None
+            in_flight = deque()
+            completed = []
+
+            # Workers copy, hash and verify. This thread is the only metadata writer: it takes results
+            # in submission order and commits them BATCH_COMMIT_SIZE at a time.
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sift-sort') as executor:
+                for file_path in files_to_process:
+                    # Bounded window of submitted files keeps the disks from being flooded
+                    while len(in_flight) >= workers * 2:
+                        first_error = self.collect_transfer(in_flight.popleft(), completed, first_error)
+                        if len(completed) >= BATCH_COMMIT_SIZE:
+                            processed = self.commit_transfers(completed, is_public, processed, total_files, progress_callback, checkpoint)
+                    if first_error is not None:
+                        break
+                    current_root = PRIVATE_ROOT if file_path.startswith(PRIVATE_ROOT) else PUBLIC_ROOT
+                    if current_root == target_root:
+                        in_flight.append((file_path, None))
+                    else:
+                        in_flight.append((file_path, executor.submit(self.transfer_file, file_path, is_public, checkpoint)))
+
+                while in_flight:
+                    first_error = self.collect_transfer(in_flight.popleft(), completed, first_error)
+                processed = self.commit_transfers(completed, is_public, processed, total_files, progress_callback, checkpoint)
+
+            logging.debug("All files processed, starting cleanup")
+            self.batch_cleanup_empty_directories(dir_path)
         
-        logging.debug("Saving all metadata")
-        self.metadata_utils.save_all_metadata()
+            logging.debug("Saving all metadata")
+            self.metadata_utils.save_all_metadata()
         
-        logging.debug("Saving index")
-        self.metadata_utils.save_index()
+            logging.debug("Saving index")
+            self.metadata_utils.save_index()
+            self.directory_stats.save()
+            self.scan_cache.save()
         
-        logging.debug("Refreshing directory stats")
-        self.refresh_directory_stats(dir_path)
+            logging.debug("Refreshing directory stats")
+            self.refresh_directory_stats(dir_path)
+            source_root = PRIVATE_ROOT if dir_path.startswith(PRIVATE_ROOT) else PUBLIC_ROOT
+            if source_root != target_root:
+                self.refresh_directory_stats(os.path.join(target_root, os.path.relpath(dir_path, source_root)))
+
+            if first_error is not None:
+                logging.error(f"Batch sorting of {dir_path} stopped after {processed} of {total_files} files: {str(first_error)}")
+                raise first_error
+            checkpoint.finish()
+        finally:
+            # Still on disk unless finish() removed it, so a failed sort can be resumed
+            checkpoint.close()
         
         logging.debug(f"Completed batch sorting of directory: {dir_path}. {total_files} files processed.")
 
+    def collect_transfer(self, transfer, completed, first_error):
+        file_path, future = transfer
+        if future is None:
+            completed.append((file_path, None))
+            return first_error
+        try:
+            dest_path, _ = future.result()
+            completed.append((file_path, dest_path))
+        except Exception as e:
+            logging.error(f"Error sorting {file_path}: {str(e)}")
+            if first_error is None:
+                first_error = e
+        return first_error
+
+    def commit_transfers(self, completed, is_public, processed, total_files, progress_callback, checkpoint=None):
+        if not completed:
+            return processed
+        with span('commit_transfers'), self.metadata_utils.batch():
+            for file_path, dest_path in completed:
+                if dest_path is None:
+                    self.update_file_metadata(file_path, is_public)
+                else:
+                    self.update_moved_file_metadata(file_path, dest_path)
+        # The batch is flushed to the metadata journal at this point
+        if checkpoint is not None:
+            checkpoint.commit([file_path for file_path, _ in completed])
+        processed += len(completed)
+        completed.clear()
+        if progress_callback and total_files:
+            progress_callback(int(processed / total_files * 100))
+        return processed
+
+    def reconcile_checkpoint(self, checkpoint):
+        # Transfers that started but whose metadata was never committed
+        reconciled = []
+        with self.metadata_utils.batch():
+            for source, dest in checkpoint.pending_transfers():
+                source_exists = os.path.exists(source)
+                dest_exists = os.path.exists(dest)
+                if not source_exists and dest_exists:
+                    # The move finished, only the metadata is missing (unless it was committed just before the crash)
+                    if self.metadata_utils.get_file_status(dest)[0] is None:
+                        self.update_moved_file_metadata(source, dest)
+                    reconciled.append(source)
+                    logging.info(f"Reconciled finished move {source} -> {dest}")
+                elif source_exists and dest_exists:
+                    if self.metadata_utils.get_file_status(dest)[0] is not None:
+                        # Sorted there since, the name is no longer ours
+                        logging.info(f"Keeping {dest}, it was sorted after the interrupted copy of {source}")
+                        continue
+                    # Copy interrupted before the source was removed. The name was reserved for this file, so the copy is ours.
+                    os.remove(dest)
+                    logging.info(f"Removed partial copy {dest}, {source} will be sorted again")
+                elif not source_exists:
+                    logging.error(f"Neither {source} nor {dest} exists, check {self.get_backup_path(source)}")
+                    reconciled.append(source)
+        if reconciled:
+            checkpoint.commit(reconciled)
+
+    def list_interrupted_sorts(self):
+        # (dir_path, is_public) of every batch sort that left a checkpoint behind,
+        # batch_sort_directory() with the same arguments resumes it
+        return SiftSortCheckpoint.list_interrupted()
+
     def cleanup_empty_directories(self, directory):
         logging.debug(f"Starting cleanup of empty directories in: {directory}")
-        for root, dirs, files in os.walk(directory, topdown=False):
+        for root, dirs, files in self.scan_cache.walk(directory, topdown=False):
             for dir_name in dirs:
                 dir_path = os.path.join(root, dir_name)
                 self.check_and_remove_empty_directory(dir_path)
@@ -219,37 +455,94 @@ class SiftIOUtils:
         logging.debug(f"Retrieved metadata for {file_path}: {metadata}")
         return metadata
 
+    @timed('generate_file_checksum')
     def generate_file_checksum(self, file_path):
-        hasher = hashlib.md5()
+        hasher = hashlib.new(HASH_ALGORITHM)
+        byte_count = 0
         with open(file_path, 'rb') as f:
-            buf = f.read()
-            hasher.update(buf)
+            while True:
+                buf = f.read(COPY_CHUNK_SIZE)
+                if not buf:
+                    break
+                hasher.update(buf)
+                byte_count += len(buf)
+        add_bytes('generate_file_checksum', byte_count)
         checksum = hasher.hexdigest()
-        logging.debug(f"Generated checksum for {file_path}: {checksum}")
+        logging.debug("Generated checksum for %s: %s", file_path, checksum)
         return checksum
 
-    def verify_file_integrity(self, source_path, destination_path):
-        result = self.generate_file_checksum(source_path) == self.generate_file_checksum(destination_path)
-        logging.debug(f"File integrity verification: {source_path} -> {destination_path}: {'Passed' if result else 'Failed'}")
+    @timed('copy_and_hash')
+    def copy_and_hash(self, source_path, destination_paths):
+        # Streams the source in fixed-size chunks into every destination, hashing as it goes,
+        # so memory stays flat and the source is only read once
+        hasher = hashlib.new(HASH_ALGORITHM)
+        byte_count = 0
+        destinations = []
+        try:
+            for destination_path in destination_paths:
+                destinations.append(open(destination_path, 'wb'))
+            with open(source_path, 'rb') as source:
+                while True:
+                    buf = source.read(COPY_CHUNK_SIZE)
+                    if not buf:
+                        break
+                    hasher.update(buf)
+                    byte_count += len(buf)
+                    for destination in destinations:
+                        destination.write(buf)
+        finally:
+            for destination in destinations:
+                destination.close()
+
+        for destination_path in destination_paths:
+            shutil.copystat(source_path, destination_path)
+        add_bytes('copy_and_hash', byte_count)
+        checksum = hasher.hexdigest()
+        logging.debug("Copied %s -> %s with checksum %s", source_path, destination_paths, checksum)
+        return checksum
+
+    def verify_file_checksum(self, destination_path, expected_checksum):
+        result = self.generate_file_checksum(destination_path) == expected_checksum
+        logging.debug("File checksum verification: %s: %s", destination_path, 'Passed' if result else 'Failed')
         return result
 
     def search_files(self, query, root_directory):
         results = []
-        for root, _, files in os.walk(root_directory):
+        for root, _, files in self.scan_cache.walk(root_directory):
             for file in files:
                 if query.lower() in file.lower():
                     results.append(os.path.join(root, file))
         logging.debug(f"Search for '{query}' in {root_directory}: {len(results)} results found")
         return results
 
-    def create_backup(self, file_path):
-        if os.path.isdir(file_path):
-            logging.debug(f"Skipping backup for directory: {file_path}")
-            return
+    def is_same_device(self, *paths):
+        try:
+            return len({os.stat(path).st_dev for path in paths}) == 1
+        except OSError as e:
+            logging.debug(f"Could not stat {paths} for device check: {str(e)}")
+            return False
+
+    @timed('link_backup')
+    def link_backup(self, file_path, backup_path):
+        # Link under a temporary name first so an existing backup with the same name is replaced,
+        # matching what copy2 did. Filesystems without hardlinks fall back to a byte copy.
+        temp_path = f"{backup_path}.sift-link"
+        try:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            os.link(file_path, temp_path)
+            os.replace(temp_path, backup_path)
+            logging.debug("Created hardlink backup: %s -> %s", file_path, backup_path)
+        except OSError as e:
+            logging.debug("Hardlink backup failed (%s), copying instead: %s -> %s", e, file_path, backup_path)
+            shutil.copy2(file_path, backup_path)
+
+    def get_backup_path(self, file_path):
+        # Mirrors the path under the root, so files with the same name in different folders of one
+        # batch never write the same backup file at the same time
+        source_root = PUBLIC_ROOT if file_path.startswith(PUBLIC_ROOT) else PRIVATE_ROOT
         backup_dir = os.path.join(SAFE_DELETE_ROOT, 'public' if self.metadata_utils.get_file_status(file_path)[0] == 'public' else 'private')
-        os.makedirs(backup_dir, exist_ok=True)
-        backup_path = shutil.copy2(file_path, backup_dir)
-        logging.debug(f"Created backup: {file_path} -> {backup_path}")
+        return os.path.join(backup_dir, os.path.relpath(file_path, source_root))
 
     def restore_from_backup(self, file_path):
         logging.debug(f"Restore from backup not implemented for: {file_path}")
@@ -267,9 +560,16 @@ class SiftIOUtils:
                     cleaned_files += 1
         logging.debug(f"Cleaned up {cleaned_files} files older than {days_old} days from safe delete folder")
 
+    @timed('get_directory_status')
     def get_directory_status(self, dir_path):
+        # Directories under the roots are answered from the incrementally maintained counters
+        status = self.directory_stats.get_directory_status(dir_path)
+        if status is not None:
+            logging.debug("Directory status for %s: %s", dir_path, status)
+            return status
+
         status = {'public': 0, 'private': 0, 'reviewed': 0, 'unreviewed': 0, 'total': 0}
-        for root, _, files in os.walk(dir_path):
+        for root, _, files in self.scan_cache.walk(dir_path):
             for file in files:
                 if file.startswith('.'):
                     continue
@@ -284,9 +584,10 @@ class SiftIOUtils:
                     status['reviewed'] += 1
                 else:
                     status['unreviewed'] += 1
-        logging.debug(f"Directory status for {dir_path}: {status}")
+        logging.debug("Directory status for %s: %s", dir_path, status)
         return status
 
+    @timed('refresh_directory_stats')
     def refresh_directory_stats(self, start_path):
         paths_to_refresh = []
         current_path = start_path
@@ -297,10 +598,17 @@ class SiftIOUtils:
 
         for path in reversed(paths_to_refresh):
             status = self.get_directory_status(path)
-            logging.debug(f"Refreshed stats for {path}: {status}")
+            logging.debug("Refreshed stats for %s: %s", path, status)
             if self.gui_refresh_callback:
                 self.gui_refresh_callback(path)
 
+    def rebuild_directory_stats(self, dir_path):
+        self.directory_stats.rebuild_directory(dir_path)
+        self.refresh_directory_stats(dir_path)
+
+    def get_file_status(self, file_path):
+        return self.metadata_utils.get_file_status(file_path)
+
     def get_file_review_status(self, file_path):
         status, is_reviewed = self.metadata_utils.get_file_status(file_path)
         return is_reviewed
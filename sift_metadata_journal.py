@@ -0,0 +1,157 @@
+# IMPORTANT: This module should only be used by sift_metadata_utils.py and sift_sort_checkpoint.py
+# The journal records metadata mutations as they happen so the year files and the index
+# only need to be rewritten during compaction instead of on every sort.
+#
+# A journal has a single writer. An exclusive lock on journal_path + '.lock' is held while it is open, so
+# a second process (the CLI next to the GUI) or a second instance in the same process fails instead of
+# compacting and truncating entries the first one has not written out yet.
+
+import os
+import json
+import threading
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class JournalLockedError(RuntimeError):
+    pass
+
+class SiftMetadataJournal:
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+
+        self.lock_file = self.acquire_lock()
+        self.recovered_entries = self.recover()
+
+        self.condition = threading.Condition()
+        self.file_lock = threading.Lock()
+        self.pending = []
+        self.next_sequence = 0
+        self.committed_sequence = 0
+        self.error = None
+        self.closed = False
+        self.size = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+
+        self.file = open(journal_path, 'ab')
+        self.writer_thread = threading.Thread(target=self.writer_loop, name='sift-journal-writer', daemon=True)
+        self.writer_thread.start()
+
+    def acquire_lock(self):
+        # flock locks belong to the open file, so this also catches a second instance in the same process
+        lock_file = open(f"{self.journal_path}.lock", 'a')
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise JournalLockedError(f"Metadata journal {self.journal_path} is in use by another process")
+        return lock_file
+
+    def recover(self):
+        entries = []
+        if not os.path.exists(self.journal_path):
+            return entries
+
+        valid_length = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    logging.warning(f"Discarding incomplete journal entry at offset {valid_length} in {self.journal_path}")
+                    break
+                try:
+                    if line.strip():
+                        entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logging.warning(f"Discarding corrupt journal entry at offset {valid_length} in {self.journal_path}")
+                    break
+                valid_length += len(line)
+
+        # Drop a torn tail so new entries are not appended to a partial line
+        if valid_length != os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_length)
+                f.flush()
+                os.fsync(f.fileno())
+
+        logging.debug(f"Recovered {len(entries)} journal entries from {self.journal_path}")
+        return entries
+
+    def append(self, entries):
+        # Queues entries for the writer thread and returns a sequence number to wait on.
+        # Entries queued by several callers before the writer wakes up share one write and fsync.
+        with self.condition:
+            if self.closed:
+                raise RuntimeError(f"Journal is closed: {self.journal_path}")
+            self.pending.extend(entries)
+            self.next_sequence += 1
+            self.condition.notify_all()
+            return self.next_sequence
+
+    def wait_for(self, sequence):
+        with self.condition:
+            while self.committed_sequence < sequence and self.error is None:
+                self.condition.wait()
+            if self.error is not None:
+                raise self.error
+
+    def flush(self):
+        with self.condition:
+            sequence = self.next_sequence
+        self.wait_for(sequence)
+
+    def writer_loop(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                batch = self.pending
+                self.pending = []
+                batch_sequence = self.next_sequence
+
+            try:
+                data = b''.join(json.dumps(entry, separators=(',', ':')).encode('utf-8') + b'\n' for entry in batch)
+                with self.file_lock:
+                    self.file.write(data)
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                    self.size += len(data)
+            except Exception as e:
+                logging.error(f"Error writing metadata journal {self.journal_path}: {str(e)}")
+                with self.condition:
+                    self.error = e
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.committed_sequence = batch_sequence
+                self.condition.notify_all()
+            logging.debug(f"Committed {len(batch)} journal entries ({len(data)} bytes)")
+
+    def truncate(self):
+        # Callers must make sure everything in the journal has been written to the year files
+        # and index, and that no new entries are appended while truncating.
+        self.flush()
+        with self.file_lock:
+            self.file.truncate(0)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.size = 0
+        logging.debug(f"Truncated metadata journal {self.journal_path}")
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.writer_thread.join()
+        self.file.close()
+        # Closing the file releases the lock
+        self.lock_file.close()
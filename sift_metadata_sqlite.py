@@ -0,0 +1,196 @@
+# IMPORTANT: This module should only be imported and used by sift_io_utils.py (via create_metadata_utils)
+# SQLite alternative to SiftMetadataUtils, selected with METADATA_BACKEND = "sqlite" in constants.py
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from constants import PUBLIC_ROOT, PRIVATE_ROOT, METADATA_FOLDER
+import constants
+from sift_instrumentation import timed
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+METADATA_DATABASE = getattr(constants, 'METADATA_DATABASE', os.path.join(METADATA_FOLDER, 'index', 'metadata.sqlite3'))
+
+class SiftMetadataSqlite:
+    def __init__(self, database_path=None):
+        self.database_path = database_path = database_path or METADATA_DATABASE
+        os.makedirs(os.path.dirname(database_path), exist_ok=True)
+        self.lock = threading.RLock()
+        self.batch_depth = 0
+        self.checkpoint_listeners = []
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema()
+
+    def create_schema(self):
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    root TEXT NOT NULL,
+                    relative_path TEXT NOT NULL,
+                    year TEXT NOT NULL,
+                    status TEXT,
+                    last_reviewed TEXT,
+                    reviewed INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (root, relative_path)
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS files_root_year ON files (root, year)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS files_status_reviewed ON files (status, reviewed)")
+
+    @contextmanager
+    def batch(self):
+        # Groups every update made inside the block into a single transaction. The updates made before
+        # an error are committed too, their files have already been moved, like the journal keeps them.
+        with self.lock:
+            self.batch_depth += 1
+            try:
+                yield
+            finally:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    self.connection.commit()
+
+    def commit(self):
+        if self.batch_depth == 0:
+            self.connection.commit()
+
+    def load_index(self):
+        # Records are read from the database on demand, there is nothing to preload
+        pass
+
+    @timed('save_index')
+    def save_index(self):
+        with self.lock:
+            self.connection.commit()
+        for listener in self.checkpoint_listeners:
+            listener()
+        logging.debug(f"Index committed to {self.database_path}")
+
+    def save_all_metadata(self):
+        self.save_index()
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+    def get_year_from_path(self, path):
+        parts = path.split(os.sep)
+        for part in parts:
+            if part.isdigit() and len(part) == 4:
+                return part
+        return None
+
+    def split_path(self, file_path):
+        root = PUBLIC_ROOT if PUBLIC_ROOT in file_path else PRIVATE_ROOT
+        relative_path = os.path.relpath(file_path, root)
+        root_name = 'public' if root == PUBLIC_ROOT else 'private'
+        return root_name, relative_path, self.get_year_from_path(relative_path)
+
+    def get_file_status(self, file_path):
+        root_name, relative_path, year = self.split_path(file_path)
+        if year:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT status, reviewed FROM files WHERE root = ? AND relative_path = ?",
+                    (root_name, relative_path)
+                ).fetchone()
+            if row:
+                return row[0], bool(row[1])
+        return None, False
+
+    @timed('update_manual_review_status')
+    def update_manual_review_status(self, file_path, new_status):
+        root_name, relative_path, year = self.split_path(file_path)
+        logging.debug("Updating manual review status for file: %s", file_path)
+        if year:
+            with self.lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO files (root, relative_path, year, status, last_reviewed, reviewed) VALUES (?, ?, ?, ?, ?, 1)",
+                    (root_name, relative_path, year, new_status, datetime.now().isoformat())
+                )
+                self.commit()
+            logging.debug("Updated manual review status for %s: %s", file_path, new_status)
+        else:
+            logging.error(f"Could not extract year from file path: {file_path}")
+
+    @timed('update_file_path')
+    def update_file_path(self, old_path, new_path):
+        old_root_name, old_relative_path, old_year = self.split_path(old_path)
+        new_root_name, new_relative_path, new_year = self.split_path(new_path)
+        logging.debug("Updating file path: %s -> %s", old_path, new_path)
+        if old_year and new_year:
+            with self.lock:
+                # The review state moves with the file, like the JSON backend carries over its year record
+                row = self.connection.execute(
+                    "SELECT last_reviewed, reviewed FROM files WHERE root = ? AND relative_path = ?",
+                    (old_root_name, old_relative_path)
+                ).fetchone()
+                if row:
+                    last_reviewed, reviewed = row
+                else:
+                    logging.warning(f"Old path {old_relative_path} not found in metadata. Creating new entry.")
+                    last_reviewed, reviewed = datetime.now().isoformat(), 0
+                # New row first, a failure in between never leaves the file without one
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO files (root, relative_path, year, status, last_reviewed, reviewed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (new_root_name, new_relative_path, new_year, new_root_name, last_reviewed, reviewed)
+                )
+                self.connection.execute(
+                    "DELETE FROM files WHERE root = ? AND relative_path = ?",
+                    (old_root_name, old_relative_path)
+                )
+                self.commit()
+            logging.debug("Updated file path in metadata: %s -> %s", old_path, new_path)
+        else:
+            logging.error(f"Could not extract year from file paths: {old_path} -> {new_path}")
+
+    def import_json_metadata(self):
+        # One-shot import of the JSON layout (index files plus per-year files).
+        # Opening SiftMetadataUtils replays any outstanding journal, closing it compacts it to disk.
+        from sift_metadata_utils import SiftMetadataUtils
+        json_metadata = SiftMetadataUtils()
+        json_metadata.close()
+
+        rows = {}
+        for root_name in ['public', 'private']:
+            for relative_path, file_data in json_metadata.metadata[root_name].items():
+                rows[(root_name, relative_path)] = (
+                    root_name, relative_path, file_data.get('year') or self.get_year_from_path(relative_path),
+                    file_data.get('status'), file_data.get('last_reviewed'), int(bool(file_data.get('reviewed')))
+                )
+
+            # The year files are what get_file_status reads, so they win over the index
+            year_folder = os.path.join(METADATA_FOLDER, root_name)
+            if not os.path.isdir(year_folder):
+                continue
+            for file_name in sorted(os.listdir(year_folder)):
+                match = re.fullmatch(rf"{root_name}_(\d{{4}})\.json", file_name)
+                if not match:
+                    continue
+                for relative_path, file_data in json_metadata.load_metadata_file(match.group(1), root_name).items():
+                    rows[(root_name, relative_path)] = (
+                        root_name, relative_path, match.group(1),
+                        file_data.get('status'), file_data.get('last_reviewed'), int(bool(file_data.get('reviewed')))
+                    )
+
+        with self.lock:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO files (root, relative_path, year, status, last_reviewed, reviewed) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows.values()
+                )
+        logging.info(f"Imported {len(rows)} metadata records into {self.database_path}")
+        return len(rows)
+
+if __name__ == "__main__":
+    metadata_sqlite = SiftMetadataSqlite()
+    metadata_sqlite.import_json_metadata()
+    metadata_sqlite.close()
@@ -3,63 +3,269 @@
 
 import os
 import json
-from datetime import datetime, timedelta
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
 from constants import PUBLIC_ROOT, PRIVATE_ROOT, METADATA_FOLDER
+import constants
+from sift_metadata_journal import SiftMetadataJournal
+from sift_review_index import ReviewIndex
+from sift_instrumentation import timed, add_bytes
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Compaction folds the journal back into the year files and the index.
+# It runs on a timer and early whenever the journal grows past the byte threshold.
+JOURNAL_COMPACT_INTERVAL = getattr(constants, 'JOURNAL_COMPACT_INTERVAL', 60)
+JOURNAL_COMPACT_BYTES = getattr(constants, 'JOURNAL_COMPACT_BYTES', 4 * 1024 * 1024)
+
+# Records kept in memory across the cached year files. Least recently used clean years are dropped
+# first, years with unsaved changes stay until compaction has written them.
+METADATA_CACHE_MAX_RECORDS = getattr(constants, 'METADATA_CACHE_MAX_RECORDS', 250000)
+
+# "json" keeps the per-year JSON files, "sqlite" uses SiftMetadataSqlite
+METADATA_BACKEND = getattr(constants, 'METADATA_BACKEND', 'json')
+
+def create_metadata_utils():
+    if METADATA_BACKEND == 'sqlite':
+        from sift_metadata_sqlite import SiftMetadataSqlite
+        return SiftMetadataSqlite()
+    return SiftMetadataUtils()
+
 class SiftMetadataUtils:
     def __init__(self):
-        self.metadata = {'public': {}, 'private': {}}
+        self.metadata = {'public': ReviewIndex(), 'private': ReviewIndex()}
         self.index_files = {
+            'public': os.path.join(METADATA_FOLDER, 'index', 'public_index.bin'),
+            'private': os.path.join(METADATA_FOLDER, 'index', 'private_index.bin')
+        }
+        # Index format used before the binary one, migrated the first time it is found
+        self.legacy_index_files = {
             'public': os.path.join(METADATA_FOLDER, 'index', 'public_index.json'),
             'private': os.path.join(METADATA_FOLDER, 'index', 'private_index.json')
         }
-        self.metadata_cache = {}
+        # (year, status) -> records of that year file, in least recently used order
+        self.metadata_cache = OrderedDict()
+        # Records held in metadata_cache, kept up to date so eviction doesn't have to count them
+        self.cached_records = 0
+        self.dirty_years = set()
+        self.lock = threading.RLock()
+        self.batch_depth = 0
+        self.checkpoint_listeners = []
+        self.compaction_requested = threading.Event()
+        # Opened first, its lock keeps a second process from loading and rewriting the same files
+        self.journal = SiftMetadataJournal(os.path.join(METADATA_FOLDER, 'journal', 'metadata_journal.jsonl'))
         self.load_index()
+        self.replay_journal()
+
+        self.closed = False
+        self.compaction_thread = threading.Thread(target=self.compaction_loop, name='sift-journal-compaction', daemon=True)
+        self.compaction_thread.start()
 
+    @timed('load_index')
     def load_index(self):
+        # Only the table of contents is read here, each year is decoded when it is first used
         for status, index_file in self.index_files.items():
             if os.path.exists(index_file):
                 try:
-                    with open(index_file, 'r') as f:
-                        self.metadata[status] = json.load(f)
-                except json.JSONDecodeError:
-                    logging.error(f"Error decoding index file for {status}. Starting with empty index.")
-                    self.metadata[status] = {}
+                    self.metadata[status] = ReviewIndex.open(index_file)
+                except (OSError, ValueError, struct.error) as e:
+                    logging.error(f"Error reading index file for {status}: {str(e)}. Starting with empty index.")
+                    self.metadata[status] = ReviewIndex()
+            elif os.path.exists(self.legacy_index_files[status]):
+                self.migrate_legacy_index(status)
             else:
                 logging.debug(f"No existing index file found for {status}. Starting with empty index.")
 
+    def migrate_legacy_index(self, status):
+        legacy_file = self.legacy_index_files[status]
+        try:
+            with open(legacy_file, 'r') as f:
+                self.metadata[status] = ReviewIndex(json.load(f))
+        except json.JSONDecodeError:
+            logging.error(f"Error decoding index file for {status}. Starting with empty index.")
+            self.metadata[status] = ReviewIndex()
+            return
+        self.write_index_file(self.index_files[status], self.metadata[status])
+        # Kept for going back to an older version, it is not read again
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+        logging.info(f"Migrated {len(self.metadata[status])} {status} index records from {legacy_file} to {self.index_files[status]}")
+
+    @timed('save_index')
     def save_index(self):
-        for status, index_file in self.index_files.items():
-            os.makedirs(os.path.dirname(index_file), exist_ok=True)
-            with open(index_file, 'w') as f:
-                json.dump(self.metadata[status], f, indent=2)
-            logging.debug(f"Index saved to {index_file}")
+        with self.lock:
+            for status, index_file in self.index_files.items():
+                if not self.metadata[status].changed_sections and os.path.exists(index_file):
+                    continue
+                self.write_index_file(index_file, self.metadata[status])
+                logging.debug(f"Index saved to {index_file}")
 
-    def load_metadata_file(self, year, status):
-        file_path = os.path.join(METADATA_FOLDER, status, f"{status}_{year}.json")
-        if file_path in self.metadata_cache:
-            return self.metadata_cache[file_path]
+    @timed('write_json_file')
+    def write_json_file(self, file_path, data):
+        self.replace_file(file_path, lambda f: json.dump(data, f, indent=2))
 
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                self.metadata_cache[file_path] = data
+    @timed('write_index_file')
+    def write_index_file(self, file_path, index):
+        # Years that haven't changed are copied from the current file without being decoded
+        self.replace_file(file_path, index.write, 'wb')
+        index.attach(file_path)
+
+    def replace_file(self, file_path, write, mode='w'):
+        # Write to a temporary file and swap it in, so a crash during compaction never leaves
+        # a truncated year file or index behind once the journal has been cleared
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, mode) as f:
+            write(f)
+            add_bytes('write_json_file', f.tell())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+
+    def get_metadata_file_path(self, year, status):
+        return os.path.join(METADATA_FOLDER, status, f"{status}_{year}.json")
+
+    def load_metadata_file(self, year, status):
+        key = (year, status)
+        with self.lock:
+            data = self.metadata_cache.get(key)
+            if data is not None:
+                self.metadata_cache.move_to_end(key)
                 return data
-            except json.JSONDecodeError:
-                logging.error(f"Error decoding metadata file: {file_path}. Starting with empty metadata.")
-        return {}
 
+            file_path = self.get_metadata_file_path(year, status)
+            data = {}
+            if os.path.exists(file_path):
+                try:
+                    with open(file_path, 'r') as f:
+                        data = json.load(f)
+                except json.JSONDecodeError:
+                    logging.error(f"Error decoding metadata file: {file_path}. Starting with empty metadata.")
+            # Cache empty years too, journaled changes to them live here until compaction
+            self.cache_metadata_file(year, status, data)
+            self.evict_metadata_cache()
+        return data
+
+    def cache_metadata_file(self, year, status, data):
+        # Must be called with self.lock held
+        self.uncache_metadata_file(year, status)
+        self.metadata_cache[(year, status)] = data
+        self.cached_records += len(data)
+
+    def uncache_metadata_file(self, year, status):
+        # Must be called with self.lock held
+        data = self.metadata_cache.pop((year, status), None)
+        if data is not None:
+            self.cached_records -= len(data)
+
+    def evict_metadata_cache(self):
+        # Must be called with self.lock held. The most recently used year is always kept.
+        if self.cached_records <= METADATA_CACHE_MAX_RECORDS:
+            return
+        for year, status in list(self.metadata_cache)[:-1]:
+            if (year, status) in self.dirty_years:
+                continue
+            self.uncache_metadata_file(year, status)
+            logging.debug("Evicted metadata for %s (%s) from the cache", year, status)
+            if self.cached_records <= METADATA_CACHE_MAX_RECORDS:
+                return
+        # Only years with unsaved changes are left, compaction writes them so they can be dropped next time
+        self.compaction_requested.set()
+
+    @timed('save_metadata_file')
     def save_metadata_file(self, year, status, metadata):
-        file_path = os.path.join(METADATA_FOLDER, status, f"{status}_{year}.json")
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-        self.metadata_cache[file_path] = metadata
-        logging.debug(f"Metadata for {year} ({status}) saved to {file_path}")
+        file_path = self.get_metadata_file_path(year, status)
+        self.write_json_file(file_path, metadata)
+        self.cache_metadata_file(year, status, metadata)
+        logging.debug("Metadata for %s (%s) saved to %s", year, status, file_path)
+
+    def apply_journal_entry(self, entry):
+        status = entry['status']
+        path = entry['path']
+        data = entry.get('data')
+        if entry['target'] == 'year':
+            metadata = self.load_metadata_file(entry['year'], status)
+            self.dirty_years.add((entry['year'], status))
+        else:
+            metadata = self.metadata[status]
+
+        records = len(metadata)
+        if data is None:
+            metadata.pop(path, None)
+        else:
+            metadata[path] = data
+        if entry['target'] == 'year':
+            self.cached_records += len(metadata) - records
+
+    def replay_journal(self):
+        entries = self.journal.recovered_entries
+        self.journal.recovered_entries = []
+        for entry in entries:
+            self.apply_journal_entry(entry)
+        self.recovered = bool(entries)
+        if entries:
+            logging.info(f"Replayed {len(entries)} metadata journal entries from {self.journal.journal_path}")
+
+    def commit_entries(self, entries):
+        # Must be called with self.lock held. Returns the journal sequence to wait on once the lock is released.
+        for entry in entries:
+            self.apply_journal_entry(entry)
+        sequence = self.journal.append(entries)
+        if self.journal.size >= JOURNAL_COMPACT_BYTES:
+            self.compaction_requested.set()
+        return sequence
+
+    @contextmanager
+    def batch(self):
+        # Updates made inside the block share one journal commit (one fsync) at the end
+        with self.lock:
+            self.batch_depth += 1
+            try:
+                yield
+            finally:
+                self.batch_depth -= 1
+                outermost = self.batch_depth == 0
+        if outermost:
+            self.journal.flush()
+
+    @timed('compact_journal')
+    def compact_journal(self):
+        with self.lock:
+            self.journal.flush()
+            if self.journal.size == 0 and not self.dirty_years:
+                return
+            for year, status in sorted(self.dirty_years):
+                self.save_metadata_file(year, status, self.load_metadata_file(year, status))
+            self.dirty_years.clear()
+            self.evict_metadata_cache()
+            self.save_index()
+            for listener in self.checkpoint_listeners:
+                listener()
+            self.journal.truncate()
+            logging.debug("Compacted metadata journal into year files and index")
+
+    def compaction_loop(self):
+        while not self.closed:
+            self.compaction_requested.wait(JOURNAL_COMPACT_INTERVAL)
+            self.compaction_requested.clear()
+            if self.closed:
+                return
+            try:
+                self.compact_journal()
+            except Exception as e:
+                logging.error(f"Error compacting metadata journal: {str(e)}")
+
+    def close(self):
+        if self.closed:
+            return
+        self.compact_journal()
+        self.closed = True
+        self.compaction_requested.set()
+        self.compaction_thread.join()
+        self.journal.close()
 
     def get_year_from_path(self, path):
         parts = path.split(os.sep)
@@ -79,42 +285,49 @@ class SiftMetadataUtils:
             return file_data.get('status'), file_data.get('reviewed', False)
         return None, False
 
+    @timed('update_manual_review_status')
     def update_manual_review_status(self, file_path, new_status):
         root = PUBLIC_ROOT if PUBLIC_ROOT in file_path else PRIVATE_ROOT
         relative_path = os.path.relpath(file_path, root)
         year = self.get_year_from_path(relative_path)
-        logging.debug(f"Updating manual review status for file: {file_path}")
-        logging.debug(f"Extracted year from path: {year}")
+        logging.debug("Updating manual review status for file: %s", file_path)
+        logging.debug("Extracted year from path: %s", year)
         if year:
             current_status = 'public' if root == PUBLIC_ROOT else 'private'
-            
-            # Remove metadata from the old status file
-            old_metadata = self.load_metadata_file(year, current_status)
-            if relative_path in old_metadata:
-                del old_metadata[relative_path]
-                self.save_metadata_file(year, current_status, old_metadata)
-            
-            # Add metadata to the new status file
-            new_metadata = self.load_metadata_file(year, new_status)
-            new_metadata[relative_path] = {
-                'status': new_status,
-                'last_reviewed': datetime.now().isoformat(),
-                'reviewed': True
-            }
-            self.save_metadata_file(year, new_status, new_metadata)
-            
-            # Update the index
-            self.metadata[new_status][relative_path] = {
-                'year': year,
-                'status': new_status,
-                'last_reviewed': datetime.now().isoformat(),
-                'reviewed': True
-            }
-            
-            logging.debug(f"Updated manual review status for {file_path}: {new_status}")
+            now = datetime.now().isoformat()
+            entries = []
+
+            with self.lock:
+                # Remove metadata from the old status file
+                old_metadata = self.load_metadata_file(year, current_status)
+                if relative_path in old_metadata:
+                    entries.append({'target': 'year', 'status': current_status, 'year': year, 'path': relative_path, 'data': None})
+
+                # Add metadata to the new status file
+                entries.append({'target': 'year', 'status': new_status, 'year': year, 'path': relative_path, 'data': {
+                    'status': new_status,
+                    'last_reviewed': now,
+                    'reviewed': True
+                }})
+
+                # Update the index
+                entries.append({'target': 'index', 'status': new_status, 'year': year, 'path': relative_path, 'data': {
+                    'year': year,
+                    'status': new_status,
+                    'last_reviewed': now,
+                    'reviewed': True
+                }})
+
+                sequence = self.commit_entries(entries)
+                wait = not self.batch_depth
+            if wait:
+                self.journal.wait_for(sequence)
+
+            logging.debug("Updated manual review status for %s: %s", file_path, new_status)
         else:
             logging.error(f"Could not extract year from file path: {file_path}")
 
+    @timed('update_file_path')
     def update_file_path(self, old_path, new_path):
         old_root = PUBLIC_ROOT if PUBLIC_ROOT in old_path else PRIVATE_ROOT
         new_root = PUBLIC_ROOT if PUBLIC_ROOT in new_path else PRIVATE_ROOT
@@ -123,71 +336,91 @@ class SiftMetadataUtils:
         old_year = self.get_year_from_path(old_relative_path)
         new_year = self.get_year_from_path(new_relative_path)
         
-        logging.debug(f"Updating file path: {old_path} -> {new_path}")
-        logging.debug(f"Old year: {old_year}, New year: {new_year}")
+        logging.debug("Updating file path: %s -> %s", old_path, new_path)
+        logging.debug("Old year: %s, New year: %s", old_year, new_year)
         
         if old_year and new_year:
             old_status = 'public' if old_root == PUBLIC_ROOT else 'private'
             new_status = 'public' if new_root == PUBLIC_ROOT else 'private'
+            now = datetime.now().isoformat()
+
+            with self.lock:
+                # Load old metadata
+                old_metadata = self.load_metadata_file(old_year, old_status)
+
+                # If old path not found, create a new entry
+                if old_relative_path in old_metadata:
+                    file_data = dict(old_metadata[old_relative_path])
+                else:
+                    logging.warning(f"Old path {old_relative_path} not found in metadata. Creating new entry.")
+                    file_data = {
+                        'status': old_status,
+                        'last_reviewed': now,
+                        'reviewed': False
+                    }
+                file_data['status'] = new_status
+
+                # Move metadata to new location
+                entries = [
+                    {'target': 'year', 'status': old_status, 'year': old_year, 'path': old_relative_path, 'data': None},
+                    {'target': 'year', 'status': new_status, 'year': new_year, 'path': new_relative_path, 'data': file_data}
+                ]
+
+                # Update the index
+                if old_relative_path in self.metadata[old_status]:
+                    entries.append({'target': 'index', 'status': old_status, 'year': old_year, 'path': old_relative_path, 'data': None})
+                entries.append({'target': 'index', 'status': new_status, 'year': new_year, 'path': new_relative_path, 'data': {
+                    'year': new_year,
+                    'status': new_status,
+                    'last_reviewed': now,
+                    'reviewed': True
+                }})
+
+                sequence = self.commit_entries(entries)
+                wait = not self.batch_depth
+            if wait:
+                self.journal.wait_for(sequence)
             
-            # Load old metadata
-            old_metadata = self.load_metadata_file(old_year, old_status)
-            
-            # If old path not found, create a new entry
-            if old_relative_path not in old_metadata:
-                logging.warning(f"Old path {old_relative_path} not found in metadata. Creating new entry.")
-                old_metadata[old_relative_path] = {
-                    'status': old_status,
-                    'last_reviewed': datetime.now().isoformat(),
-                    'reviewed': False
-                }
-            
-            # Move metadata to new location
-            file_data = old_metadata.pop(old_relative_path)
-            self.save_metadata_file(old_year, old_status, old_metadata)
-            
-            new_metadata = self.load_metadata_file(new_year, new_status)
-            new_metadata[new_relative_path] = file_data
-            new_metadata[new_relative_path]['status'] = new_status
-            self.save_metadata_file(new_year, new_status, new_metadata)
-            
-            # Update the index
-            if old_relative_path in self.metadata[old_status]:
-                del self.metadata[old_status][old_relative_path]
-            self.metadata[new_status][new_relative_path] = {
-                'year': new_year,
-                'status': new_status,
-                'last_reviewed': datetime.now().isoformat(),
-                'reviewed': True
-            }
-            
-            logging.debug(f"Updated file path in metadata: {old_path} -> {new_path}")
+            logging.debug("Updated file path in metadata: %s -> %s", old_path, new_path)
         else:
             logging.error(f"Could not extract year from file paths: {old_path} -> {new_path}")
 
+    @timed('save_all_metadata')
     def save_all_metadata(self):
-        logging.debug(f"Saving all metadata. Cache size: {len(self.metadata_cache)}")
-        for status in ['public', 'private']:
-            metadata_by_year = {}
-            for relative_path, file_data in self.metadata[status].items():
-                year = file_data['year']
-                if year not in metadata_by_year:
-                    metadata_by_year[year] = {}
-                metadata_by_year[year][relative_path] = file_data
-
-            for year, metadata in metadata_by_year.items():
-                file_path = os.path.join(METADATA_FOLDER, status, f"{status}_{year}.json")
-                logging.debug(f"Attempting to save metadata file: {file_path}")
-                try:
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    with open(file_path, 'w') as f:
-                        json.dump(metadata, f, indent=2)
-                    logging.debug(f"Successfully saved metadata to {file_path}")
-                except Exception as e:
-                    logging.error(f"Error saving metadata file {file_path}: {str(e)}")
-
-        self.metadata_cache.clear()
-        logging.debug("All metadata files saved and cache cleared")
+        # Rewrites the year files changed since the last save from the index, clean years are left alone
+        logging.debug("Saving all metadata. Cache size: %s, dirty years: %s", len(self.metadata_cache), len(self.dirty_years))
+        with self.lock:
+            if not self.dirty_years:
+                return
+            saved_years = set()
+            for status in ['public', 'private']:
+                dirty = {year for year, dirty_status in self.dirty_years if dirty_status == status}
+                if not dirty:
+                    continue
+                metadata_by_year = {}
+                for relative_path, file_data in self.metadata[status].items(dirty):
+                    year = file_data['year']
+                    if year not in metadata_by_year:
+                        metadata_by_year[year] = {}
+                    metadata_by_year[year][relative_path] = file_data
+
+                for year, metadata in metadata_by_year.items():
+                    file_path = self.get_metadata_file_path(year, status)
+                    logging.debug("Attempting to save metadata file: %s", file_path)
+                    try:
+                        self.save_metadata_file(year, status, metadata)
+                        saved_years.add((year, status))
+                        logging.debug("Successfully saved metadata to %s", file_path)
+                    except Exception as e:
+                        logging.error(f"Error saving metadata file {file_path}: {str(e)}")
+
+            # Years with journaled removals may no longer appear in the index at all
+            for year, status in sorted(self.dirty_years - saved_years):
+                self.save_metadata_file(year, status, self.load_metadata_file(year, status))
+
+            self.dirty_years.clear()
+            self.evict_metadata_cache()
+        logging.debug("Changed metadata files saved")
 
 # Initialize metadata (run this only once if needed)
 # SiftMetadataUtils(PUBLIC_ROOT, PRIVATE_ROOT).update_existing_metadata()
\ No newline at end of file
@@ -0,0 +1,406 @@
+# IMPORTANT: This module should only be used by sift_metadata_utils.py
+# Compact in-memory form of one review index (public or private). Records are grouped by directory,
+# so each directory path is stored once. Within a directory the file names are kept sorted and
+# concatenated into a single string with an offsets array, and the records are packed into array
+# columns: year as an integer, status and reviewed as flag bits, last_reviewed as microseconds.
+# That is roughly 30 bytes per file instead of several hundred for a dict per record.
+#
+# It behaves like the dict of {relative_path: {'year', 'status', 'last_reviewed', 'reviewed'}} it
+# replaces. Records are rebuilt on access, so changing a returned dict does not change the index.
+# Records that don't fit the packed columns (extra keys, odd values) are kept as plain dicts.
+#
+# On disk the index is a binary file: a header, one section per year holding that year's directory
+# blocks in the same packed layout, and a table of contents locating each section. The file is
+# memory-mapped and a year's section is only decoded when a path in it is first used. Saving copies
+# the sections that haven't changed straight from the old file.
+#
+#   header   magic, section count, table of contents offset
+#   section  block count, then per directory block: directory, record count, names, name offsets,
+#            years, flags, last_reviewed, unpacked records as JSON
+#   toc      per section: year ('' for paths without one), offset, length, record count
+# Integers are little-endian.
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+
+RECORD_KEYS = ('year', 'status', 'last_reviewed', 'reviewed')
+FLAG_PUBLIC = 1
+FLAG_REVIEWED = 2
+FLAG_UNPACKED = 4
+INDEX_MAGIC = b'SIFTIDX1'
+INDEX_HEADER = struct.Struct('<8sIQ')
+TOC_ENTRY = struct.Struct('<QQI')
+COUNT = struct.Struct('<I')
+TIMESTAMP_EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+def encode_timestamp(value):
+    # Microseconds since 1970 for a naive ISO timestamp that formats back to the same string, else None
+    if not isinstance(value, str):
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value)
+        if timestamp.tzinfo is not None or timestamp.isoformat() != value:
+            return None
+    except ValueError:
+        return None
+    return (timestamp - TIMESTAMP_EPOCH) // ONE_MICROSECOND
+
+def decode_timestamp(value):
+    return (TIMESTAMP_EPOCH + value * ONE_MICROSECOND).isoformat()
+
+def split_path(path):
+    directory, _, name = path.rpartition(os.sep)
+    return directory, name
+
+def join_path(directory, name):
+    return f"{directory}{os.sep}{name}" if directory else name
+
+def section_key(directory):
+    # Year a directory's records are filed under on disk, the same rule as get_year_from_path()
+    for part in directory.split(os.sep):
+        if len(part) == 4 and part.isdigit():
+            return part
+    return ''
+
+def array_bytes(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def read_array(typecode, data, offset, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    values.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+def write_counted(f, data):
+    f.write(COUNT.pack(len(data)))
+    f.write(data)
+
+def read_counted(data, offset):
+    length = COUNT.unpack_from(data, offset)[0]
+    offset += COUNT.size
+    return data[offset:offset + length], offset + length
+
+class DirectoryBlock:
+    # Records of the files in one directory, sorted by name
+    __slots__ = ('names', 'offsets', 'years', 'flags', 'reviewed_at', 'unpacked')
+
+    def __init__(self, names=()):
+        self.names = ''.join(names)
+        self.offsets = array('I', [0])
+        for name in names:
+            self.offsets.append(self.offsets[-1] + len(name))
+        self.years = array('H', bytes(2 * len(names)))
+        self.flags = array('B', bytes(len(names)))
+        self.reviewed_at = array('q', bytes(8 * len(names)))
+        self.unpacked = None
+
+    def __len__(self):
+        return len(self.flags)
+
+    def name(self, position):
+        return self.names[self.offsets[position]:self.offsets[position + 1]]
+
+    def search(self, name):
+        # (found, position), position is where name is or would be inserted
+        low = 0
+        high = len(self.flags)
+        names = self.names
+        offsets = self.offsets
+        while low < high:
+            middle = (low + high) // 2
+            candidate = names[offsets[middle]:offsets[middle + 1]]
+            if candidate < name:
+                low = middle + 1
+            elif candidate > name:
+                high = middle
+            else:
+                return True, middle
+        return False, low
+
+    def insert(self, position, name):
+        start = self.offsets[position]
+        length = len(name)
+        self.names = self.names[:start] + name + self.names[start:]
+        self.offsets[position + 1:] = array('I', [offset + length for offset in self.offsets[position:]])
+        self.years.insert(position, 0)
+        self.flags.insert(position, 0)
+        self.reviewed_at.insert(position, 0)
+
+    def delete(self, position):
+        start = self.offsets[position]
+        end = self.offsets[position + 1]
+        length = end - start
+        if self.unpacked is not None:
+            self.unpacked.pop(self.names[start:end], None)
+        self.names = self.names[:start] + self.names[end:]
+        self.offsets[position + 1:] = array('I', [offset - length for offset in self.offsets[position + 2:]])
+        del self.years[position]
+        del self.flags[position]
+        del self.reviewed_at[position]
+
+    def pack(self, position, name, record):
+        year = record.get('year')
+        status = record.get('status')
+        reviewed = record.get('reviewed')
+        timestamp = encode_timestamp(record.get('last_reviewed'))
+        if (len(record) != len(RECORD_KEYS) or not all(key in record for key in RECORD_KEYS)
+                or not isinstance(year, str) or len(year) != 4 or not year.isdigit()
+                or status not in ('public', 'private') or not isinstance(reviewed, bool) or timestamp is None):
+            if self.unpacked is None:
+                self.unpacked = {}
+            self.unpacked[name] = dict(record)
+            self.flags[position] = FLAG_UNPACKED
+            return
+        if self.unpacked is not None:
+            self.unpacked.pop(name, None)
+        self.years[position] = int(year)
+        self.flags[position] = (FLAG_PUBLIC if status == 'public' else 0) | (FLAG_REVIEWED if reviewed else 0)
+        self.reviewed_at[position] = timestamp
+
+    def unpack(self, position, name):
+        flags = self.flags[position]
+        if flags & FLAG_UNPACKED:
+            return dict(self.unpacked[name])
+        return {
+            'year': f"{self.years[position]:04d}",
+            'status': 'public' if flags & FLAG_PUBLIC else 'private',
+            'last_reviewed': decode_timestamp(self.reviewed_at[position]),
+            'reviewed': bool(flags & FLAG_REVIEWED),
+        }
+
+    def year(self, position, name):
+        if self.flags[position] & FLAG_UNPACKED:
+            return self.unpacked[name].get('year')
+        return f"{self.years[position]:04d}"
+
+    def write(self, f, directory):
+        write_counted(f, directory.encode('utf-8', 'surrogateescape'))
+        f.write(COUNT.pack(len(self.flags)))
+        write_counted(f, self.names.encode('utf-8', 'surrogateescape'))
+        for values in (self.offsets, self.years, self.flags, self.reviewed_at):
+            f.write(array_bytes(values))
+        write_counted(f, json.dumps(self.unpacked).encode('utf-8') if self.unpacked else b'')
+
+    @classmethod
+    def read(cls, data, offset):
+        # (directory, block, offset after the block)
+        directory, offset = read_counted(data, offset)
+        count = COUNT.unpack_from(data, offset)[0]
+        offset += COUNT.size
+        block = cls()
+        names, offset = read_counted(data, offset)
+        block.names = str(names, 'utf-8', 'surrogateescape')
+        block.offsets, offset = read_array('I', data, offset, count + 1)
+        block.years, offset = read_array('H', data, offset, count)
+        block.flags, offset = read_array('B', data, offset, count)
+        block.reviewed_at, offset = read_array('q', data, offset, count)
+        unpacked, offset = read_counted(data, offset)
+        if unpacked:
+            block.unpacked = json.loads(str(unpacked, 'utf-8'))
+        return str(directory, 'utf-8', 'surrogateescape'), block, offset
+
+class ReviewIndex(MutableMapping):
+    def __init__(self, records=None):
+        # Directory (relative to the root, '' for files directly under it) -> DirectoryBlock
+        self.blocks = {}
+        self.count = 0
+        # Index file backing this index: year -> (offset, length, record count) of its section
+        self.source = None
+        self.sections = {}
+        self.loaded_sections = set()
+        self.changed_sections = set()
+        if records:
+            self.update(records)
+
+    @classmethod
+    def open(cls, file_path):
+        # Maps an index file, no records are decoded until they are used
+        index = cls()
+        index.attach(file_path)
+        return index
+
+    def attach(self, file_path):
+        # Switches to reading unloaded years from file_path, which must hold this index's records
+        with open(file_path, 'rb') as f:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, section_count, toc_offset = INDEX_HEADER.unpack_from(source, 0)
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"{file_path} is not a review index file")
+            sections = {}
+            offset = toc_offset
+            for _ in range(section_count):
+                key, offset = read_counted(source, offset)
+                sections[str(key, 'utf-8')] = TOC_ENTRY.unpack_from(source, offset)
+                offset += TOC_ENTRY.size
+            # Checked here, a damaged section would otherwise only fail on its first lookup
+            if any(section_offset + length > toc_offset for section_offset, length, _ in sections.values()):
+                raise ValueError(f"{file_path} has sections past its table of contents")
+        except Exception:
+            source.close()
+            raise
+        if self.source is not None:
+            self.source.close()
+        if not self.sections and not self.blocks:
+            self.count = sum(count for _, _, count in sections.values())
+        self.source = source
+        self.sections = sections
+        self.changed_sections = set()
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def load_section(self, key):
+        if key in self.loaded_sections:
+            return
+        self.loaded_sections.add(key)
+        if key not in self.sections:
+            return
+        offset, length, _ = self.sections[key]
+        data = memoryview(self.source)[offset:offset + length]
+        try:
+            block_count = COUNT.unpack_from(data, 0)[0]
+            position = COUNT.size
+            for _ in range(block_count):
+                directory, block, position = DirectoryBlock.read(data, position)
+                self.blocks[directory] = block
+        finally:
+            data.release()
+
+    def load_directory(self, directory):
+        key = section_key(directory)
+        if key not in self.loaded_sections:
+            self.load_section(key)
+        return key
+
+    def load_years(self, years):
+        # Paths without a year folder can still carry a year in the file name, so '' is always loaded
+        keys = self.sections if years is None else (set(years) | {''})
+        for key in list(keys):
+            self.load_section(key)
+
+    def write(self, f):
+        # Writes the whole index to the binary file f, unchanged years are copied from the mapped file
+        keys = sorted(set(self.sections) | self.changed_sections)
+        changed_blocks = {}
+        for directory, block in self.blocks.items():
+            key = section_key(directory)
+            if key in self.changed_sections or key not in self.sections:
+                changed_blocks.setdefault(key, []).append((directory, block))
+
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, 0, 0))
+        toc = []
+        for key in keys:
+            offset = f.tell()
+            if key in changed_blocks or key in self.changed_sections:
+                blocks = [(directory, block) for directory, block in changed_blocks.get(key, []) if len(block)]
+                if not blocks:
+                    continue
+                f.write(COUNT.pack(len(blocks)))
+                for directory, block in blocks:
+                    block.write(f, directory)
+                count = sum(len(block) for _, block in blocks)
+            else:
+                section_offset, length, count = self.sections[key]
+                f.write(self.source[section_offset:section_offset + length])
+            toc.append((key, offset, f.tell() - offset, count))
+
+        toc_offset = f.tell()
+        for key, offset, length, count in toc:
+            write_counted(f, key.encode('utf-8'))
+            f.write(TOC_ENTRY.pack(offset, length, count))
+        f.seek(0)
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(toc), toc_offset))
+        f.seek(0, os.SEEK_END)
+
+    def update(self, records=(), **kwargs):
+        if self.count or self.sections or kwargs or not hasattr(records, 'items'):
+            super().update(records, **kwargs)
+            return
+        # Bulk load into an empty index: build every directory sorted in one go instead of inserting
+        grouped = {}
+        for path, record in records.items():
+            directory, name = split_path(path)
+            grouped.setdefault(directory, []).append((name, record))
+        for directory, entries in grouped.items():
+            self.changed_sections.add(section_key(directory))
+            entries.sort(key=lambda entry: entry[0])
+            block = DirectoryBlock([name for name, _ in entries])
+            for position, (name, record) in enumerate(entries):
+                block.pack(position, name, record)
+            self.blocks[directory] = block
+            self.count += len(entries)
+
+    def __getitem__(self, path):
+        directory, name = split_path(path)
+        self.load_directory(directory)
+        block = self.blocks.get(directory)
+        if block is not None:
+            found, position = block.search(name)
+            if found:
+                return block.unpack(position, name)
+        raise KeyError(path)
+
+    def __contains__(self, path):
+        directory, name = split_path(path)
+        self.load_directory(directory)
+        block = self.blocks.get(directory)
+        return block is not None and block.search(name)[0]
+
+    def __setitem__(self, path, record):
+        directory, name = split_path(path)
+        self.changed_sections.add(self.load_directory(directory))
+        block = self.blocks.get(directory)
+        if block is None:
+            block = self.blocks[directory] = DirectoryBlock()
+        found, position = block.search(name)
+        if not found:
+            block.insert(position, name)
+            self.count += 1
+        block.pack(position, name, record)
+
+    def __delitem__(self, path):
+        directory, name = split_path(path)
+        key = self.load_directory(directory)
+        block = self.blocks.get(directory)
+        found, position = block.search(name) if block is not None else (False, 0)
+        if not found:
+            raise KeyError(path)
+        block.delete(position)
+        self.changed_sections.add(key)
+        self.count -= 1
+        if not len(block):
+            del self.blocks[directory]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        self.load_years(None)
+        for directory, block in self.blocks.items():
+            for position in range(len(block)):
+                yield join_path(directory, block.name(position))
+
+    def items(self, years=None):
+        # (path, record) pairs without a second lookup per path, only the given years if years is set
+        self.load_years(years)
+        for directory, block in self.blocks.items():
+            for position in range(len(block)):
+                name = block.name(position)
+                if years is not None and block.year(position, name) not in years:
+                    continue
+                yield join_path(directory, name), block.unpack(position, name)
@@ -0,0 +1,101 @@
+# Cache of directory listings (name, is_dir, size, mtime) that is only re-read when the directory's
+# own mtime changes. Adding, removing or renaming an entry updates the directory mtime, so an
+# unchanged mtime means the cached listing is still valid.
+
+import os
+import time
+import pickle
+import threading
+from constants import METADATA_FOLDER
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Listings of directories modified this recently are not cached, a second change within the
+# filesystem's timestamp granularity would otherwise go unnoticed
+RACY_MTIME_SECONDS = 2
+
+class SiftScanCache:
+    def __init__(self, cache_file=None):
+        # Internal cache only, pickled because it can hold millions of entries and must load fast
+        self.cache_file = cache_file or os.path.join(METADATA_FOLDER, 'index', 'scan_cache.pickle')
+        self.listings = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'rb') as f:
+                self.listings = pickle.load(f)
+            logging.debug(f"Loaded scan cache with {len(self.listings)} directories from {self.cache_file}")
+        except Exception as e:
+            logging.error(f"Error reading scan cache {self.cache_file}: {str(e)}. Starting with an empty cache.")
+            self.listings = {}
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            listings = dict(self.listings)
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        temp_path = f"{self.cache_file}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(listings, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.cache_file)
+        logging.debug(f"Saved scan cache with {len(listings)} directories to {self.cache_file}")
+
+    def scan(self, directory):
+        # Returns a list of (name, is_dir, size, mtime) tuples, raises like os.scandir if the directory is gone
+        directory_mtime = os.stat(directory).st_mtime_ns
+        with self.lock:
+            cached = self.listings.get(directory)
+        if cached is not None and cached[0] == directory_mtime:
+            return cached[1]
+
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.name, entry.is_dir(follow_symlinks=False), stat.st_size, stat.st_mtime))
+
+        with self.lock:
+            if time.time() - directory_mtime / 1e9 > RACY_MTIME_SECONDS:
+                self.listings[directory] = (directory_mtime, entries)
+                self.dirty = True
+            else:
+                self.listings.pop(directory, None)
+        logging.debug(f"Scanned {directory}: {len(entries)} entries")
+        return entries
+
+    def listdir(self, directory):
+        return [name for name, _, _, _ in self.scan(directory)]
+
+    def walk(self, top, topdown=True):
+        # Same shape as os.walk (without following symlinks), served from the cache
+        try:
+            entries = self.scan(top)
+        except OSError:
+            return
+        dirs = [name for name, is_dir, _, _ in entries if is_dir]
+        files = [name for name, is_dir, _, _ in entries if not is_dir]
+
+        if topdown:
+            yield top, dirs, files
+        for dir_name in dirs:
+            yield from self.walk(os.path.join(top, dir_name), topdown)
+        if not topdown:
+            yield top, dirs, files
+
+    def forget(self, directory):
+        with self.lock:
+            prefix = directory + os.sep
+            for path in [path for path in self.listings if path == directory or path.startswith(prefix)]:
+                del self.listings[path]
+            self.dirty = True
@@ -0,0 +1,126 @@
+# IMPORTANT: This module should only be used by sift_io_utils.py
+# Durable manifest of one batch sort: the files it planned to sort, the destination reserved for
+# each file before its data was moved, and the files whose metadata has been committed. A sort that
+# is killed part way can be reconciled and resumed from it instead of starting over.
+#
+# There is one checkpoint per directory. Sorting the directory the other way replaces it, so an old
+# interrupted sort can never be resumed over a newer decision.
+
+import os
+import json
+import hashlib
+from sift_metadata_journal import SiftMetadataJournal
+from constants import METADATA_FOLDER
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CHECKPOINT_FOLDER = os.path.join(METADATA_FOLDER, 'checkpoints')
+
+class SiftSortCheckpoint:
+    def __init__(self, dir_path, is_public):
+        # is_public is the direction of the sort about to run, planned_is_public the one found on disk
+        self.dir_path = dir_path
+        self.is_public = is_public
+        key = hashlib.sha1(os.path.abspath(dir_path).encode('utf-8')).hexdigest()
+        self.checkpoint_path = os.path.join(CHECKPOINT_FOLDER, f"{key}.jsonl")
+
+        self.planned_files = None
+        self.planned_statuses = None
+        self.planned_is_public = None
+        self.transfers = {}
+        self.committed_files = set()
+        self.journal = SiftMetadataJournal(self.checkpoint_path)
+        for entry in self.journal.recovered_entries:
+            self.apply_entry(entry)
+
+    @classmethod
+    def list_interrupted(cls):
+        # (dir_path, is_public) of every batch sort that left a checkpoint behind
+        interrupted = []
+        if not os.path.isdir(CHECKPOINT_FOLDER):
+            return interrupted
+        for file_name in sorted(os.listdir(CHECKPOINT_FOLDER)):
+            if not file_name.endswith('.jsonl'):
+                continue
+            try:
+                with open(os.path.join(CHECKPOINT_FOLDER, file_name), 'r') as f:
+                    first_entry = json.loads(f.readline())
+            except (OSError, json.JSONDecodeError):
+                continue
+            if first_entry.get('op') == 'plan':
+                interrupted.append((first_entry['dir'], first_entry['is_public']))
+        return interrupted
+
+    def apply_entry(self, entry):
+        op = entry.get('op')
+        if op == 'plan':
+            self.planned_files = entry['files']
+            self.planned_statuses = entry.get('statuses')
+            self.planned_is_public = entry['is_public']
+        elif op == 'begin':
+            self.transfers[entry['source']] = entry['dest']
+        elif op == 'committed':
+            self.committed_files.update(entry['sources'])
+
+    @property
+    def is_resumed(self):
+        return self.planned_files is not None
+
+    @property
+    def is_reversed(self):
+        # The interrupted sort went the other way than the one about to run
+        return self.is_resumed and self.planned_is_public != self.is_public
+
+    def start(self, files, statuses=None):
+        # statuses holds each file's (status, reviewed) when the sort was planned, files whose metadata
+        # changed since then are left alone when the sort is resumed
+        entry = {'op': 'plan', 'dir': self.dir_path, 'is_public': self.is_public, 'files': files}
+        if statuses is not None:
+            entry['statuses'] = [list(status) for status in statuses]
+        self.journal.wait_for(self.journal.append([entry]))
+        self.apply_entry(entry)
+
+    def begin_transfer(self, source, dest):
+        # Durable before any file data moves, so a half-finished move can always be found again
+        entry = {'op': 'begin', 'source': source, 'dest': dest}
+        self.journal.wait_for(self.journal.append([entry]))
+        self.apply_entry(entry)
+
+    def commit(self, sources):
+        # Only called after the metadata for these files is durable
+        entry = {'op': 'committed', 'sources': sources}
+        self.journal.append([entry])
+        self.apply_entry(entry)
+
+    def pending_transfers(self):
+        return [(source, dest) for source, dest in self.transfers.items() if source not in self.committed_files]
+
+    def remaining_files(self):
+        # (file_path, planned (status, reviewed) or None) of every file not committed yet
+        statuses = self.planned_statuses or [None] * len(self.planned_files)
+        return [(file_path, tuple(status) if status is not None else None)
+                for file_path, status in zip(self.planned_files, statuses) if file_path not in self.committed_files]
+
+    def discard(self):
+        # Forgets the interrupted sort, the caller has reconciled its pending transfers
+        self.journal.truncate()
+        self.planned_files = None
+        self.planned_statuses = None
+        self.planned_is_public = None
+        self.transfers = {}
+        self.committed_files = set()
+        logging.debug(f"Discarded checkpoint for {self.dir_path}")
+
+    def close(self):
+        # Keeps the checkpoint on disk so the sort can be resumed
+        self.journal.close()
+
+    def finish(self):
+        self.journal.close()
+        os.remove(self.checkpoint_path)
+        try:
+            os.remove(f"{self.checkpoint_path}.lock")
+        except OSError:
+            pass
+        logging.debug(f"Removed checkpoint for {self.dir_path}")
@@ -0,0 +1,48 @@
+# Points the sift modules at scratch folders for one test, so tests never read or delete anything
+# under the configured PUBLIC_ROOT, PRIVATE_ROOT, SAFE_DELETE_ROOT or METADATA_FOLDER.
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+import sift
+import sift_io_utils
+import sift_metadata_utils
+import sift_metadata_sqlite
+import sift_directory_stats
+import sift_scan_cache
+import sift_sort_checkpoint
+import sift_video_thumbnails
+
+# Modules that import the folder constants by name, each keeps its own reference
+FOLDER_MODULES = [
+    sift, sift_io_utils, sift_metadata_utils, sift_metadata_sqlite, sift_directory_stats,
+    sift_scan_cache, sift_sort_checkpoint, sift_video_thumbnails,
+]
+
+def use_temp_folders(test_case):
+    # Patched until the test ends, the folders are removed after its tearDown(). Returns them by constant name.
+    temp_dir = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+    metadata_folder = os.path.join(temp_dir, 'metadata')
+    folders = {
+        'PUBLIC_ROOT': os.path.join(temp_dir, 'public'),
+        'PRIVATE_ROOT': os.path.join(temp_dir, 'private'),
+        'SAFE_DELETE_ROOT': os.path.join(temp_dir, 'safe_delete'),
+        'METADATA_FOLDER': metadata_folder,
+    }
+    for folder in folders.values():
+        os.makedirs(folder)
+
+    # Paths the modules derive from METADATA_FOLDER when they are imported
+    derived = {
+        'CHECKPOINT_FOLDER': os.path.join(metadata_folder, 'checkpoints'),
+        'METADATA_DATABASE': os.path.join(metadata_folder, 'index', 'metadata.sqlite3'),
+    }
+    for module in FOLDER_MODULES:
+        for name, path in {**folders, **derived}.items():
+            if hasattr(module, name):
+                patcher = mock.patch.object(module, name, path)
+                patcher.start()
+                test_case.addCleanup(patcher.stop)
+    return folders
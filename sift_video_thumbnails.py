@@ -0,0 +1,175 @@
+# Extracts a representative thumbnail frame from videos in a separate process pool, so slow codecs
+# never hold up the GUI or the thumbnail threads. Duration and resolution are recorded alongside and
+# persisted, keyed by path, size and mtime, so each video is decoded at most once.
+
+import os
+import json
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from constants import METADATA_FOLDER
+import constants
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VIDEO_THUMBNAIL_WORKERS = getattr(constants, 'VIDEO_THUMBNAIL_WORKERS', 2)
+# Seconds to wait for one video before giving up on it
+VIDEO_THUMBNAIL_TIMEOUT = 60
+# Fractions of the duration tried in order until a frame is bright enough
+FRAME_POSITIONS = (0.1, 0.2, 0.35, 0.5)
+# Mean luma (0-255) below which a frame counts as dark (fades, lens caps, black intros)
+DARK_FRAME_THRESHOLD = 24
+JPEG_QUALITY = 85
+# Info is written out after this many new videos, and at exit
+SAVE_INTERVAL = 50
+
+def extract_video_thumbnail(file_path, max_size):
+    # Runs in a worker process. Returns (jpeg bytes or None, info dict)
+    # cv2 is only imported in the worker processes, it takes a while to load and the GUI never needs it
+    import cv2
+    cap = cv2.VideoCapture(file_path)
+    try:
+        if not cap.isOpened():
+            return None, {'error': 'unreadable'}
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        info = {
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
+            'duration': frame_count / fps if fps > 0 and frame_count > 0 else None
+        }
+
+        best_frame = None
+        best_brightness = -1
+        positions = FRAME_POSITIONS if frame_count > 0 else (0,)
+        for position in positions:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count * position))
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            frame = downsample(frame, max_size)
+            brightness = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).mean()
+            if brightness > best_brightness:
+                best_frame, best_brightness = frame, brightness
+            if brightness >= DARK_FRAME_THRESHOLD:
+                break
+
+        if best_frame is None:
+            # Some containers don't support seeking, fall back to the first frame
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read()
+            if not ret:
+                info['error'] = 'no frames'
+                return None, info
+            best_frame = downsample(frame, max_size)
+
+        ok, encoded = cv2.imencode('.jpg', best_frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ok:
+            info['error'] = 'encode failed'
+            return None, info
+        return encoded.tobytes(), info
+    finally:
+        cap.release()
+
+def downsample(frame, max_size):
+    import cv2
+    h, w = frame.shape[:2]
+    scale = max_size / max(h, w)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+class SiftVideoThumbnails:
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(SiftVideoThumbnails, cls).__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.info_file = os.path.join(METADATA_FOLDER, 'index', 'video_info.json')
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.executor = None
+        self.unsaved = 0
+        self.video_info = {}
+        if os.path.exists(self.info_file):
+            try:
+                with open(self.info_file, 'r') as f:
+                    self.video_info = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logging.error(f"Error reading video info {self.info_file}: {str(e)}")
+        atexit.register(self.close)
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn, not fork: the GUI process has Qt and other threads running
+                self.executor = ProcessPoolExecutor(max_workers=VIDEO_THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            return self.executor
+
+    def get_info(self, file_path):
+        # Recorded info if it is still current for the file on disk, otherwise None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        with self.lock:
+            info = self.video_info.get(os.path.abspath(file_path))
+        if info is None or info['size'] != stat.st_size or info['mtime_ns'] != stat.st_mtime_ns:
+            return None
+        return info
+
+    def extract(self, file_path, max_size):
+        # Blocks the calling (non-GUI) thread until the worker process is done, returns jpeg bytes or None
+        info = self.get_info(file_path)
+        if info is not None and info.get('error'):
+            return None
+        try:
+            stat = os.stat(file_path)
+            future = self.get_executor().submit(extract_video_thumbnail, os.path.abspath(file_path), max_size)
+            jpeg_data, info = future.result(timeout=VIDEO_THUMBNAIL_TIMEOUT)
+        except TimeoutError:
+            logging.error(f"Timed out extracting a thumbnail from {file_path}")
+            jpeg_data, info = None, {'error': 'timeout'}
+        except Exception as e:
+            logging.error(f"Error extracting a thumbnail from {file_path}: {str(e)}")
+            return None
+
+        info['size'] = stat.st_size
+        info['mtime_ns'] = stat.st_mtime_ns
+        with self.lock:
+            self.video_info[os.path.abspath(file_path)] = info
+            self.unsaved += 1
+            save_now = self.unsaved >= SAVE_INTERVAL
+        if save_now:
+            self.save()
+        return jpeg_data
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                if not self.unsaved:
+                    return
+                video_info = dict(self.video_info)
+                self.unsaved = 0
+            os.makedirs(os.path.dirname(self.info_file), exist_ok=True)
+            temp_path = f"{self.info_file}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(video_info, f)
+            os.replace(temp_path, self.info_file)
+        logging.debug(f"Saved info for {len(video_info)} videos to {self.info_file}")
+
+    def close(self):
+        self.save()
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
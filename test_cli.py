@@ -0,0 +1,98 @@
+import unittest
+import os
+import io
+import json
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+import sift
+from sift_sort_checkpoint import SiftSortCheckpoint
+from sift_metadata_utils import SiftMetadataUtils
+from sift_test_folders import use_temp_folders
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        folders = use_temp_folders(self)
+        self.public_root = folders['PUBLIC_ROOT']
+        self.private_root = folders['PRIVATE_ROOT']
+        self.test_dir = os.path.join(self.public_root, '1981', 'cli')
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.test_files = [os.path.join(self.test_dir, f"test{i}.jpg") for i in range(1, 3)]
+        for file_path in self.test_files:
+            with open(file_path, 'w') as f:
+                f.write('Test content')
+        self.private_dir = os.path.join(self.private_root, '1981', 'cli')
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = sift.main(list(argv))
+        return status, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_dry_run_changes_nothing(self):
+        status, events = self.run_cli('sort', self.test_dir, '--private', '--dry-run')
+
+        self.assertEqual(status, 0)
+        plans = [event for event in events if event['event'] == 'plan']
+        self.assertEqual(sorted(event['path'] for event in plans), self.test_files)
+        self.assertTrue(all(event['action'] == 'move' and event['destination'].startswith(self.private_dir) for event in plans))
+        self.assertEqual(events[-1], {'event': 'summary', 'dry_run': True, 'moved': 2, 'marked': 0})
+        self.assertTrue(all(os.path.exists(file_path) for file_path in self.test_files))
+        self.assertFalse(os.path.exists(self.private_dir))
+
+    def test_sort_moves_folder(self):
+        status, events = self.run_cli('sort', self.test_dir, '--private', '--workers', '2')
+
+        self.assertEqual(status, 0)
+        self.assertEqual(events[-1]['sorted'], 1)
+        self.assertFalse(os.path.exists(self.test_dir))
+        self.assertEqual(sorted(os.listdir(self.private_dir)), ['test1.jpg', 'test2.jpg'])
+
+    def test_paths_outside_the_roots_are_rejected(self):
+        outside_dir = tempfile.mkdtemp()
+        try:
+            status, events = self.run_cli('sort', outside_dir, self.test_files[0], '--public')
+        finally:
+            shutil.rmtree(outside_dir, ignore_errors=True)
+
+        self.assertEqual(status, 1)
+        self.assertEqual(events[0]['event'], 'error')
+        self.assertEqual(events[0]['path'], outside_dir)
+        # The path under the root is still sorted
+        self.assertEqual(events[-1]['sorted'], 1)
+        metadata_utils = SiftMetadataUtils()
+        try:
+            self.assertEqual(metadata_utils.get_file_status(self.test_files[0]), ('public', True))
+        finally:
+            metadata_utils.close()
+
+    def test_resume_finishes_interrupted_sort(self):
+        # A sort that was killed right after it wrote its plan
+        checkpoint = SiftSortCheckpoint(self.test_dir, False)
+        checkpoint.start(self.test_files)
+        checkpoint.close()
+
+        status, events = self.run_cli('resume')
+
+        self.assertEqual(status, 0)
+        self.assertEqual(events[0], {'event': 'start', 'path': self.test_dir, 'resumed': True, 'public': False})
+        self.assertEqual(events[-1], {'event': 'summary', 'dry_run': False, 'resumed': 1, 'failed': 0})
+        self.assertEqual(sorted(os.listdir(self.private_dir)), ['test1.jpg', 'test2.jpg'])
+        self.assertEqual(SiftSortCheckpoint.list_interrupted(), [])
+
+        status, events = self.run_cli('resume')
+        self.assertEqual(events, [{'event': 'summary', 'dry_run': False, 'resumed': 0, 'failed': 0}])
+
+    def test_locked_metadata_is_reported(self):
+        metadata_utils = SiftMetadataUtils()
+        try:
+            status, events = self.run_cli('sort', self.test_dir, '--private')
+        finally:
+            metadata_utils.close()
+
+        self.assertEqual(status, 1)
+        self.assertEqual(events[-1]['event'], 'error')
+        self.assertTrue(all(os.path.exists(file_path) for file_path in self.test_files))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import os
+import threading
+from sift_io_utils import SiftIOUtils
+from sift_directory_stats import SiftDirectoryStats
+from sift_test_folders import use_temp_folders
+
+class TestDirectoryStats(unittest.TestCase):
+    def setUp(self):
+        folders = use_temp_folders(self)
+        self.public_root = folders['PUBLIC_ROOT']
+        self.private_root = folders['PRIVATE_ROOT']
+        self.year_dir = os.path.join(self.public_root, '1979')
+        self.test_dir = os.path.join(self.year_dir, 'stats')
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.test_files = [os.path.join(self.test_dir, f"test{i}.jpg") for i in range(1, 4)]
+        for file_path in self.test_files:
+            with open(file_path, 'w') as f:
+                f.write('Test content')
+        self.sift_io = SiftIOUtils()
+        self.stats = self.sift_io.directory_stats
+
+    def tearDown(self):
+        if self.sift_io is not None:
+            self.sift_io.close()
+
+    def status(self, dir_path):
+        status = self.sift_io.get_directory_status(dir_path)
+        return status['total'], status['reviewed'], status['public'], status['private']
+
+    def test_sort_updates_directory_and_ancestors(self):
+        self.assertEqual(self.status(self.test_dir), (3, 0, 0, 0))
+        year_status = self.status(self.year_dir)
+        root_status = self.status(self.public_root)
+
+        self.sift_io.sort(self.test_files[0], True)
+        self.assertEqual(self.status(self.test_dir), (3, 1, 1, 0))
+        self.assertEqual(self.status(self.year_dir), (year_status[0], year_status[1] + 1, year_status[2] + 1, year_status[3]))
+        self.assertEqual(self.status(self.public_root), (root_status[0], root_status[1] + 1, root_status[2] + 1, root_status[3]))
+
+    def test_move_updates_both_roots(self):
+        private_dir = os.path.join(self.private_root, '1979', 'stats')
+        public_year = self.status(self.year_dir)
+        self.sift_io.sort(self.test_files[0], True)
+        self.sift_io.sort(self.test_files[0], False)
+
+        self.assertEqual(self.status(self.test_dir), (2, 0, 0, 0))
+        self.assertEqual(self.status(private_dir), (1, 1, 0, 1))
+        self.assertEqual(self.status(self.year_dir)[0], public_year[0] - 1)
+        self.assertEqual(self.status(os.path.join(self.private_root, '1979')), (1, 1, 0, 1))
+
+    def test_removed_directory_is_dropped(self):
+        self.sift_io.sort(self.test_files[0], True)
+        public_total = self.status(self.public_root)[0]
+        self.sift_io.sort(self.test_dir, False)
+
+        self.assertFalse(os.path.exists(self.test_dir))
+        self.assertEqual(self.status(self.test_dir), (0, 0, 0, 0))
+        self.assertEqual(self.status(self.public_root)[0], public_total - 3)
+        self.assertEqual(self.status(os.path.join(self.private_root, '1979', 'stats')), (3, 3, 0, 3))
+
+    def test_rebuild_picks_up_changes_made_outside_the_app(self):
+        self.assertEqual(self.status(self.test_dir)[0], 3)
+        public_total = self.status(self.public_root)[0]
+        with open(os.path.join(self.test_dir, 'added.jpg'), 'w') as f:
+            f.write('Test content')
+
+        self.sift_io.rebuild_directory_stats(self.test_dir)
+        self.assertEqual(self.status(self.test_dir), (4, 0, 0, 0))
+        self.assertEqual(self.status(self.public_root)[0], public_total + 1)
+
+    def test_unsaved_counts_are_rebuilt(self):
+        self.sift_io.sort(self.test_files[0], True)
+        self.assertEqual(self.status(self.test_dir), (3, 1, 1, 0))
+        self.assertTrue(os.path.exists(self.stats.dirty_marker))
+
+        # Like a restart after a crash: the marker is still there, so nothing saved is trusted
+        metadata_utils = self.sift_io.metadata_utils
+        restarted = SiftDirectoryStats(metadata_utils.get_file_status, self.sift_io.scan_cache.walk)
+        self.assertFalse(restarted.built_roots)
+        status = restarted.get_directory_status(self.test_dir)
+        self.assertEqual((status['total'], status['reviewed'], status['public']), (3, 1, 1))
+
+        self.stats.save()
+        self.assertFalse(os.path.exists(self.stats.dirty_marker))
+        restarted = SiftDirectoryStats(metadata_utils.get_file_status, self.sift_io.scan_cache.walk)
+        self.assertIn(self.stats.get_root(self.test_dir), restarted.built_roots)
+        self.assertEqual(restarted.get_directory_status(self.test_dir)['reviewed'], 1)
+
+    def test_building_counts_during_compaction(self):
+        # Compaction holds the metadata lock while it saves the stats, building the counts looks up
+        # file statuses, which takes the metadata lock
+        metadata_utils = self.sift_io.metadata_utils
+        self.sift_io.sort(self.test_files[0], True)
+        metadata_utils.compact_journal()
+        with metadata_utils.lock:
+            metadata_utils.uncache_metadata_file('1979', 'public')
+        # Gives the compaction below something to write without loading the public year again
+        private_file = os.path.join(self.private_root, '1979', 'stats', 'test1.jpg')
+        os.makedirs(os.path.dirname(private_file), exist_ok=True)
+        with open(private_file, 'w') as f:
+            f.write('Test content')
+        self.sift_io.sort(private_file, False)
+        root = self.stats.get_root(self.test_dir)
+        self.stats.built_roots.discard(root)
+
+        compacting = threading.Event()
+        counting = threading.Event()
+
+        def wait_for_counting():
+            compacting.set()
+            counting.wait(5)
+        metadata_utils.checkpoint_listeners.insert(0, wait_for_counting)
+
+        file_status = self.stats.file_status_callback
+        def count_file_status(file_path):
+            counting.set()
+            return file_status(file_path)
+        self.stats.file_status_callback = count_file_status
+
+        compaction = threading.Thread(target=metadata_utils.compact_journal, daemon=True)
+        compaction.start()
+        compacting.wait(5)
+        build = threading.Thread(target=self.stats.ensure_root, args=(root,), daemon=True)
+        build.start()
+
+        compaction.join(10)
+        build.join(10)
+        if compaction.is_alive() or build.is_alive():
+            # Closing would wait on the stuck compaction
+            self.sift_io = None
+            self.fail("stats build and compaction deadlocked")
+        metadata_utils.checkpoint_listeners.remove(wait_for_counting)
+        self.assertEqual(self.sift_io.get_directory_status(self.test_dir)['reviewed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
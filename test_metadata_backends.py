@@ -0,0 +1,94 @@
+import unittest
+import os
+from sift_metadata_utils import SiftMetadataUtils
+from sift_metadata_sqlite import SiftMetadataSqlite
+from sift_test_folders import use_temp_folders
+
+class TestMetadataBackends(unittest.TestCase):
+    def setUp(self):
+        folders = use_temp_folders(self)
+        self.public_root = folders['PUBLIC_ROOT']
+        self.private_root = folders['PRIVATE_ROOT']
+        self.metadata_folder = folders['METADATA_FOLDER']
+        self.database_path = os.path.join(self.metadata_folder, 'index', 'metadata.sqlite3')
+        self.public_reviewed = os.path.join(self.public_root, '1977', 'backends', 'reviewed.jpg')
+        self.public_moved = os.path.join(self.public_root, '1977', 'backends', 'moved.jpg')
+        self.public_unreviewed = os.path.join(self.public_root, '1977', 'backends', 'unreviewed.jpg')
+        self.private_reviewed = os.path.join(self.private_root, '1977', 'backends', 'reviewed.jpg')
+        self.all_paths = [
+            self.public_reviewed, self.public_moved, self.public_unreviewed, self.private_reviewed,
+            os.path.join(self.private_root, '1977', 'backends', 'moved.jpg'),
+            os.path.join(self.private_root, '1977', 'backends', 'unreviewed.jpg'),
+        ]
+
+    def apply_operations(self, metadata_utils):
+        metadata_utils.update_manual_review_status(self.public_reviewed, 'public')
+        metadata_utils.update_manual_review_status(self.public_moved, 'public')
+        metadata_utils.update_manual_review_status(self.private_reviewed, 'private')
+        metadata_utils.update_file_path(self.public_moved, self.public_moved.replace(self.public_root, self.private_root, 1))
+        # Never reviewed, so it has to arrive unreviewed
+        metadata_utils.update_file_path(self.public_unreviewed, self.public_unreviewed.replace(self.public_root, self.private_root, 1))
+
+    def file_statuses(self, metadata_utils):
+        return {file_path: metadata_utils.get_file_status(file_path) for file_path in self.all_paths}
+
+    def test_backends_agree(self):
+        json_metadata = SiftMetadataUtils()
+        self.apply_operations(json_metadata)
+        json_statuses = self.file_statuses(json_metadata)
+        json_metadata.close()
+
+        sqlite_metadata = SiftMetadataSqlite(self.database_path)
+        self.apply_operations(sqlite_metadata)
+        self.assertEqual(self.file_statuses(sqlite_metadata), json_statuses)
+        sqlite_metadata.close()
+
+        self.assertEqual(json_statuses[self.all_paths[4]], ('private', True))
+        self.assertEqual(json_statuses[self.all_paths[5]], ('private', False))
+        self.assertEqual(json_statuses[self.public_moved], (None, False))
+
+        # Both read back the same after a restart
+        json_metadata = SiftMetadataUtils()
+        json_metadata.load_index()
+        self.assertEqual(self.file_statuses(json_metadata), json_statuses)
+        json_metadata.close()
+        sqlite_metadata = SiftMetadataSqlite(self.database_path)
+        sqlite_metadata.load_index()
+        self.assertEqual(self.file_statuses(sqlite_metadata), json_statuses)
+        sqlite_metadata.close()
+
+    def test_failed_batch_keeps_earlier_updates(self):
+        # A batch sort fails after some files were moved and their metadata was updated
+        moved_path = self.all_paths[4]
+        for metadata_utils in [SiftMetadataUtils(), SiftMetadataSqlite(self.database_path)]:
+            try:
+                with self.assertRaises(RuntimeError):
+                    with metadata_utils.batch():
+                        metadata_utils.update_manual_review_status(self.public_moved, 'public')
+                        metadata_utils.update_file_path(self.public_moved, moved_path)
+                        raise RuntimeError("transfer failed")
+            finally:
+                metadata_utils.close()
+
+        for metadata_utils in [SiftMetadataUtils(), SiftMetadataSqlite(self.database_path)]:
+            try:
+                self.assertEqual(metadata_utils.get_file_status(moved_path), ('private', True))
+                self.assertEqual(metadata_utils.get_file_status(self.public_moved), (None, False))
+            finally:
+                metadata_utils.close()
+
+    def test_import_json_metadata(self):
+        json_metadata = SiftMetadataUtils()
+        self.apply_operations(json_metadata)
+        json_statuses = self.file_statuses(json_metadata)
+        json_metadata.close()
+
+        sqlite_metadata = SiftMetadataSqlite(self.database_path)
+        try:
+            sqlite_metadata.import_json_metadata()
+            self.assertEqual(self.file_statuses(sqlite_metadata), json_statuses)
+        finally:
+            sqlite_metadata.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import os
+import json
+import threading
+from unittest import mock
+from sift_metadata_utils import SiftMetadataUtils
+from sift_metadata_journal import JournalLockedError
+from sift_test_folders import use_temp_folders
+
+class TestMetadataJournal(unittest.TestCase):
+    def setUp(self):
+        folders = use_temp_folders(self)
+        self.public_root = folders['PUBLIC_ROOT']
+        self.private_root = folders['PRIVATE_ROOT']
+        self.metadata_folder = folders['METADATA_FOLDER']
+        self.public_file = os.path.join(self.public_root, '1976', 'journal', 'test1.jpg')
+        self.private_file = os.path.join(self.private_root, '1976', 'journal', 'test1.jpg')
+
+    def abandon(self, metadata_utils):
+        # Stops the instance like a killed process would: journaled entries stay, nothing is compacted
+        metadata_utils.closed = True
+        metadata_utils.compaction_requested.set()
+        metadata_utils.compaction_thread.join()
+        metadata_utils.journal.close()
+
+    def test_sort_is_recovered_from_journal(self):
+        metadata_utils = SiftMetadataUtils()
+        metadata_utils.update_manual_review_status(self.public_file, 'public')
+        metadata_utils.update_file_path(self.public_file, self.private_file)
+        self.abandon(metadata_utils)
+
+        # The next instance sees the changes before any compaction has happened
+        recovered = SiftMetadataUtils()
+        self.assertTrue(recovered.recovered)
+        self.assertEqual(recovered.get_file_status(self.private_file), ('private', True))
+        self.assertEqual(recovered.get_file_status(self.public_file), (None, False))
+        recovered.close()
+
+    def test_close_compacts_journal_into_year_files(self):
+        metadata_utils = SiftMetadataUtils()
+        metadata_utils.update_manual_review_status(self.public_file, 'public')
+        metadata_utils.close()
+
+        self.assertEqual(os.path.getsize(metadata_utils.journal.journal_path), 0)
+        with open(os.path.join(self.metadata_folder, 'public', 'public_1976.json'), 'r') as f:
+            metadata = json.load(f)
+        self.assertTrue(metadata[os.path.relpath(self.public_file, self.public_root)]['reviewed'])
+
+    def test_second_writer_is_rejected(self):
+        metadata_utils = SiftMetadataUtils()
+        try:
+            with self.assertRaises(JournalLockedError):
+                SiftMetadataUtils()
+        finally:
+            metadata_utils.close()
+
+        # Released on close
+        SiftMetadataUtils().close()
+
+    def test_cached_record_count_under_concurrent_lookups(self):
+        metadata_utils = SiftMetadataUtils()
+        lookups = [self.public_file, self.private_file, os.path.join(self.public_root, '1977', 'journal', 'test1.jpg')]
+        errors = []
+        done = threading.Event()
+
+        def look_up():
+            try:
+                while not done.is_set():
+                    for file_path in lookups:
+                        metadata_utils.get_file_status(file_path)
+            except Exception as e:
+                errors.append(e)
+
+        # Every load evicts, lookups keep reordering the cache while it is being trimmed
+        with mock.patch('sift_metadata_utils.METADATA_CACHE_MAX_RECORDS', 0):
+            readers = [threading.Thread(target=look_up, daemon=True) for _ in range(4)]
+            for reader in readers:
+                reader.start()
+            try:
+                for _ in range(20):
+                    metadata_utils.update_manual_review_status(self.public_file, 'public')
+                    metadata_utils.update_manual_review_status(self.private_file, 'private')
+                    metadata_utils.save_all_metadata()
+            finally:
+                done.set()
+                for reader in readers:
+                    reader.join(5)
+            self.assertEqual(errors, [])
+            self.assertEqual(metadata_utils.cached_records, sum(len(data) for data in metadata_utils.metadata_cache.values()))
+        metadata_utils.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import unittest
+import os
+import json
+import struct
+import shutil
+import tempfile
+from sift_review_index import ReviewIndex, DirectoryBlock
+from sift_metadata_utils import SiftMetadataUtils
+from sift_test_folders import use_temp_folders
+
+def record(year, status='public', reviewed=True, last_reviewed='2024-05-01T10:00:00.123456'):
+    return {'year': year, 'status': status, 'last_reviewed': last_reviewed, 'reviewed': reviewed}
+
+class TestReviewIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, 'public_index.bin')
+        self.records = {
+            os.path.join('1983', 'b', 'test2.jpg'): record('1983'),
+            os.path.join('1983', 'b', 'test1.jpg'): record('1983', 'private', False),
+            os.path.join('1983', 'a', 'test3.jpg'): record('1983'),
+            os.path.join('1984', 'test4.jpg'): record('1984'),
+            'loose.jpg': record('1985'),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, index):
+        with open(self.index_file, 'wb') as f:
+            index.write(f)
+
+    def test_behaves_like_a_dict(self):
+        index = ReviewIndex(self.records)
+        self.assertEqual(len(index), 5)
+        self.assertEqual(dict(index.items()), self.records)
+        self.assertEqual(sorted(index), sorted(self.records))
+
+        path = os.path.join('1983', 'b', 'test0.jpg')
+        index[path] = record('1983', 'private')
+        self.assertIn(path, index)
+        self.assertEqual(index[path], record('1983', 'private'))
+        self.assertEqual(index.blocks[os.path.join('1983', 'b')].name(0), 'test0.jpg')
+
+        # Returned records are copies
+        index[path]['status'] = 'public'
+        self.assertEqual(index[path]['status'], 'private')
+
+        del index[path]
+        self.assertNotIn(path, index)
+        self.assertEqual(len(index), 5)
+        with self.assertRaises(KeyError):
+            index[path]
+
+        del index[os.path.join('1983', 'a', 'test3.jpg')]
+        self.assertNotIn(os.path.join('1983', 'a'), index.blocks)
+
+    def test_records_that_do_not_fit_are_kept_as_is(self):
+        odd_records = {
+            'extra.jpg': dict(record('1983'), note='kept'),
+            'text.jpg': record('1983', reviewed='yes'),
+            'zone.jpg': record('1983', last_reviewed='2024-05-01T10:00:00+02:00'),
+            'none.jpg': record('1983', status=None, reviewed=False, last_reviewed=None),
+        }
+        index = ReviewIndex()
+        for path, odd_record in odd_records.items():
+            index[os.path.join('1983', path)] = odd_record
+        self.write(index)
+
+        reopened = ReviewIndex.open(self.index_file)
+        for path, odd_record in odd_records.items():
+            self.assertEqual(reopened[os.path.join('1983', path)], odd_record)
+        reopened.close()
+
+    def test_delete_from_packed_block(self):
+        block = DirectoryBlock(['a.jpg', 'bb.jpg', 'ccc.jpg'])
+        for position, name in enumerate(['a.jpg', 'bb.jpg', 'ccc.jpg']):
+            block.pack(position, name, record('1983'))
+        block.delete(1)
+        self.assertEqual([block.name(position) for position in range(len(block))], ['a.jpg', 'ccc.jpg'])
+        self.assertEqual(block.search('ccc.jpg'), (True, 1))
+        self.assertEqual(block.search('bb.jpg'), (False, 1))
+
+    def test_binary_round_trip(self):
+        self.write(ReviewIndex(self.records))
+
+        index = ReviewIndex.open(self.index_file)
+        self.assertEqual(len(index), 5)
+        # Nothing is decoded until it is used
+        self.assertFalse(index.blocks)
+        self.assertEqual(index[os.path.join('1984', 'test4.jpg')], record('1984'))
+        self.assertEqual(index.loaded_sections, {'1984'})
+        unchanged_section = bytes(index.source[slice(*self.section_range(index, '1983'))])
+
+        # Only 1984 changes, 1983 is copied without being decoded
+        index[os.path.join('1984', 'test5.jpg')] = record('1984', 'private')
+        self.assertEqual(index.changed_sections, {'1984'})
+        temp_file = f"{self.index_file}.tmp"
+        with open(temp_file, 'wb') as f:
+            index.write(f)
+        os.replace(temp_file, self.index_file)
+        index.attach(self.index_file)
+        self.assertNotIn('1983', index.loaded_sections)
+
+        reopened = ReviewIndex.open(self.index_file)
+        self.assertEqual(bytes(reopened.source[slice(*self.section_range(reopened, '1983'))]), unchanged_section)
+        expected = dict(self.records, **{os.path.join('1984', 'test5.jpg'): record('1984', 'private')})
+        self.assertEqual(len(reopened), 6)
+        self.assertEqual(dict(reopened.items()), expected)
+        self.assertEqual(dict(reopened.items({'1983'})), {path: data for path, data in expected.items() if data['year'] == '1983'})
+        index.close()
+        reopened.close()
+
+    def test_emptied_year_is_dropped(self):
+        self.write(ReviewIndex(self.records))
+        index = ReviewIndex.open(self.index_file)
+        del index[os.path.join('1984', 'test4.jpg')]
+        temp_file = f"{self.index_file}.tmp"
+        with open(temp_file, 'wb') as f:
+            index.write(f)
+        index.close()
+
+        reopened = ReviewIndex.open(temp_file)
+        self.assertNotIn('1984', reopened.sections)
+        self.assertEqual(len(reopened), 4)
+        reopened.close()
+
+    def section_range(self, index, key):
+        offset, length, _ = index.sections[key]
+        return offset, offset + length
+
+class TestIndexFiles(unittest.TestCase):
+    def setUp(self):
+        use_temp_folders(self)
+        self.metadata_utils = SiftMetadataUtils()
+        self.records = {os.path.join('1983', 'test1.jpg'): record('1983'), os.path.join('1984', 'test2.jpg'): record('1984', reviewed=False)}
+
+    def tearDown(self):
+        self.metadata_utils.close()
+        for index in self.metadata_utils.metadata.values():
+            index.close()
+
+    def test_json_index_is_migrated(self):
+        legacy_file = self.metadata_utils.legacy_index_files['public']
+        os.makedirs(os.path.dirname(legacy_file), exist_ok=True)
+        with open(legacy_file, 'w') as f:
+            json.dump(self.records, f)
+
+        self.metadata_utils.load_index()
+        self.assertEqual(dict(self.metadata_utils.metadata['public'].items()), self.records)
+        self.assertTrue(os.path.exists(self.metadata_utils.index_files['public']))
+        self.assertFalse(os.path.exists(legacy_file))
+        self.assertTrue(os.path.exists(f"{legacy_file}.migrated"))
+
+        # The next start reads the binary file
+        self.metadata_utils.load_index()
+        self.assertIsNotNone(self.metadata_utils.metadata['public'].source)
+        self.assertEqual(dict(self.metadata_utils.metadata['public'].items()), self.records)
+
+    def test_save_and_reload(self):
+        self.metadata_utils.metadata['public'] = ReviewIndex(self.records)
+        self.metadata_utils.save_index()
+        self.metadata_utils.load_index()
+        self.assertEqual(dict(self.metadata_utils.metadata['public'].items()), self.records)
+
+    def test_damaged_index_starts_empty(self):
+        self.metadata_utils.metadata['public'] = ReviewIndex(self.records)
+        self.metadata_utils.save_index()
+        index_file = self.metadata_utils.index_files['public']
+        with open(index_file, 'rb') as f:
+            data = f.read()
+
+        # The last table of contents entry ends with the section's offset, length and record count
+        bad_length = data[:-12] + struct.pack('<QI', len(data), 1)
+        for damaged in [b'', data[:10], data[:len(data) // 2], b'NOTANIDX' + data[8:], bad_length]:
+            with open(index_file, 'wb') as f:
+                f.write(damaged)
+            with self.assertLogs(level='ERROR'):
+                self.metadata_utils.load_index()
+            self.assertEqual(len(self.metadata_utils.metadata['public']), 0)
+            self.assertNotIn(os.path.join('1983', 'test1.jpg'), self.metadata_utils.metadata['public'])
+
+if __name__ == '__main__':
+    unittest.main()
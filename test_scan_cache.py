@@ -0,0 +1,69 @@
+import unittest
+import os
+import time
+import shutil
+import tempfile
+from sift_scan_cache import SiftScanCache, RACY_MTIME_SECONDS
+
+class TestScanCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, 'scan_cache.pickle')
+        self.directory = os.path.join(self.temp_dir, '1980')
+        os.makedirs(os.path.join(self.directory, 'sub'))
+        for name in ['test1.jpg', 'test2.jpg']:
+            self.write(os.path.join(self.directory, name))
+        self.write(os.path.join(self.directory, 'sub', 'test3.jpg'))
+        self.age(self.directory)
+        self.age(os.path.join(self.directory, 'sub'))
+        self.scan_cache = SiftScanCache(self.cache_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, file_path):
+        with open(file_path, 'w') as f:
+            f.write('Test content')
+
+    def age(self, directory, mtime=None):
+        # Older than RACY_MTIME_SECONDS, so the listing may be cached
+        mtime = mtime or time.time() - RACY_MTIME_SECONDS - 60
+        os.utime(directory, (mtime, mtime))
+        return mtime
+
+    def test_listing_is_cached_until_the_directory_changes(self):
+        self.assertEqual(sorted(self.scan_cache.listdir(self.directory)), ['sub', 'test1.jpg', 'test2.jpg'])
+        self.assertIn(self.directory, self.scan_cache.listings)
+
+        self.write(os.path.join(self.directory, 'test4.jpg'))
+        self.assertIn('test4.jpg', self.scan_cache.listdir(self.directory))
+
+    def test_unchanged_mtime_serves_the_cached_listing(self):
+        mtime = os.stat(self.directory).st_mtime
+        self.scan_cache.listdir(self.directory)
+        self.write(os.path.join(self.directory, 'test4.jpg'))
+        self.age(self.directory, mtime)
+        self.assertNotIn('test4.jpg', self.scan_cache.listdir(self.directory))
+
+    def test_recently_modified_directory_is_not_cached(self):
+        self.write(os.path.join(self.directory, 'test4.jpg'))
+        self.assertIn('test4.jpg', self.scan_cache.listdir(self.directory))
+        self.assertNotIn(self.directory, self.scan_cache.listings)
+
+    def test_walk_matches_os_walk(self):
+        expected = [(root, sorted(dirs), sorted(files)) for root, dirs, files in os.walk(self.directory, topdown=False)]
+        walked = [(root, sorted(dirs), sorted(files)) for root, dirs, files in self.scan_cache.walk(self.directory, topdown=False)]
+        self.assertEqual(walked, expected)
+
+    def test_saved_cache_is_loaded_and_forget_drops_subtree(self):
+        list(self.scan_cache.walk(self.directory))
+        self.scan_cache.save()
+        loaded = SiftScanCache(self.cache_file)
+        self.assertEqual(loaded.listings, self.scan_cache.listings)
+
+        loaded.forget(self.directory)
+        self.assertNotIn(self.directory, loaded.listings)
+        self.assertNotIn(os.path.join(self.directory, 'sub'), loaded.listings)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -49,7 +49,11 @@ class TestSort(unittest.TestCase):
     ])
     def test_sort(self, path_to_sort, is_public):
         sift_io = SiftIOUtils()
-        sift_io.sort(path_to_sort, is_public)
+        try:
+            sift_io.sort(path_to_sort, is_public)
+        finally:
+            # Releases the journal lock for the next test's instance
+            sift_io.close()
 
         if os.path.isdir(path_to_sort):
             self._assert_folder_sort(path_to_sort, is_public)
@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+import os
+from sift_io_utils import SiftIOUtils
+from sift_sort_checkpoint import SiftSortCheckpoint
+from sift_test_folders import use_temp_folders
+
+class TestSortCheckpoint(unittest.TestCase):
+    def setUp(self):
+        folders = use_temp_folders(self)
+        self.public_root = folders['PUBLIC_ROOT']
+        self.private_root = folders['PRIVATE_ROOT']
+        self.test_dir = os.path.join(self.public_root, '1982', 'checkpoint')
+        self.private_dir = os.path.join(self.private_root, '1982', 'checkpoint')
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.test_files = [os.path.join(self.test_dir, f"test{i}.jpg") for i in range(1, 4)]
+        for file_path in self.test_files:
+            with open(file_path, 'w') as f:
+                f.write(f"Test content {file_path}")
+        self.sift_io = SiftIOUtils()
+        self.metadata_utils = self.sift_io.metadata_utils
+
+    def tearDown(self):
+        self.sift_io.close()
+
+    def interrupted_sort(self, is_public=False):
+        # Plan written the way sort_directory_files() writes it, then killed
+        checkpoint = SiftSortCheckpoint(self.test_dir, is_public)
+        checkpoint.start(self.test_files, [self.metadata_utils.get_file_status(file_path) for file_path in self.test_files])
+        return checkpoint
+
+    def private_path(self, file_path):
+        return os.path.join(self.private_dir, os.path.basename(file_path))
+
+    def assert_sorted_private(self):
+        self.assertFalse(os.path.exists(self.test_dir))
+        self.assertEqual(sorted(os.listdir(self.private_dir)), ['test1.jpg', 'test2.jpg', 'test3.jpg'])
+        for file_path in self.test_files:
+            self.assertEqual(self.metadata_utils.get_file_status(self.private_path(file_path)), ('private', True))
+        self.assertEqual(SiftSortCheckpoint.list_interrupted(), [])
+
+    def test_crash_after_move_before_commit(self):
+        checkpoint = self.interrupted_sort()
+        # Data moved, metadata never committed
+        dest_path, _ = self.sift_io.transfer_file(self.test_files[0], False, checkpoint)
+        checkpoint.close()
+        self.assertEqual(self.metadata_utils.get_file_status(dest_path), (None, False))
+
+        self.sift_io.batch_sort_directory(self.test_dir, False)
+        self.assert_sorted_private()
+
+    def test_crash_during_copy(self):
+        checkpoint = self.interrupted_sort()
+        dest_path = self.private_path(self.test_files[0])
+        os.makedirs(self.private_dir, exist_ok=True)
+        checkpoint.begin_transfer(self.test_files[0], dest_path)
+        with open(dest_path, 'w') as f:
+            f.write('Test')
+        checkpoint.close()
+
+        self.sift_io.batch_sort_directory(self.test_dir, False)
+        # The partial copy is replaced, not kept next to a renamed second copy
+        self.assert_sorted_private()
+        with open(dest_path, 'r') as f:
+            self.assertEqual(f.read(), f"Test content {self.test_files[0]}")
+
+    def test_opposite_sort_discards_checkpoint(self):
+        checkpoint = self.interrupted_sort(is_public=False)
+        dest_path, _ = self.sift_io.transfer_file(self.test_files[0], False, checkpoint)
+        checkpoint.close()
+
+        self.sift_io.batch_sort_directory(self.test_dir, True)
+        # The finished move keeps its metadata, the rest is sorted the new way
+        self.assertEqual(self.metadata_utils.get_file_status(dest_path), ('private', True))
+        for file_path in self.test_files[1:]:
+            self.assertTrue(os.path.exists(file_path))
+            self.assertEqual(self.metadata_utils.get_file_status(file_path), ('public', True))
+        self.assertEqual(SiftSortCheckpoint.list_interrupted(), [])
+
+    def test_resume_skips_files_sorted_since(self):
+        checkpoint = self.interrupted_sort()
+        checkpoint.close()
+        # Marked public on its own after the crash
+        self.sift_io.sort(self.test_files[1], True)
+
+        self.sift_io.batch_sort_directory(self.test_dir, False)
+        self.assertEqual(self.metadata_utils.get_file_status(self.test_files[1]), ('public', True))
+        self.assertFalse(os.path.exists(self.private_path(self.test_files[1])))
+        for file_path in [self.test_files[0], self.test_files[2]]:
+            self.assertEqual(self.metadata_utils.get_file_status(self.private_path(file_path)), ('private', True))
+        self.assertEqual(SiftSortCheckpoint.list_interrupted(), [])
+
+    def test_failed_save_keeps_checkpoint_closed(self):
+        with mock.patch.object(self.metadata_utils, 'save_all_metadata', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.sift_io.batch_sort_directory(self.test_dir, False)
+
+        # Its lock was released, so the checkpoint can be opened again and the sort resumed
+        checkpoint = SiftSortCheckpoint(self.test_dir, False)
+        self.assertTrue(checkpoint.is_resumed)
+        checkpoint.close()
+        self.sift_io.batch_sort_directory(self.test_dir, False)
+        self.assert_sorted_private()
+
+    def test_finish_removes_lock_file(self):
+        checkpoint = self.interrupted_sort()
+        checkpoint.finish()
+        self.assertFalse(os.path.exists(checkpoint.checkpoint_path))
+        self.assertFalse(os.path.exists(f"{checkpoint.checkpoint_path}.lock"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+import os
+import hashlib
+import sift_io_utils
+from sift_io_utils import SiftIOUtils
+from sift_test_folders import use_temp_folders
+
+class TestTransfer(unittest.TestCase):
+    def setUp(self):
+        folders = use_temp_folders(self)
+        self.public_root = folders['PUBLIC_ROOT']
+        self.private_root = folders['PRIVATE_ROOT']
+        self.safe_delete_root = folders['SAFE_DELETE_ROOT']
+        self.source_dir = os.path.join(self.public_root, '1978', 'transfer')
+        os.makedirs(self.source_dir, exist_ok=True)
+        self.source_file = os.path.join(self.source_dir, 'test1.jpg')
+        # Several chunks with the small chunk size used below
+        self.content = os.urandom(100) + b'Test content' * 50
+        with open(self.source_file, 'wb') as f:
+            f.write(self.content)
+        self.sift_io = SiftIOUtils()
+        self.backup_path = self.sift_io.get_backup_path(self.source_file)
+        self.dest_path = os.path.join(self.private_root, '1978', 'transfer', 'test1.jpg')
+
+    def tearDown(self):
+        self.sift_io.close()
+
+    def read(self, file_path):
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    def test_copy_and_hash_streams_into_every_destination(self):
+        first = os.path.join(self.source_dir, 'copy1.jpg')
+        second = os.path.join(self.source_dir, 'copy2.jpg')
+        with mock.patch.object(sift_io_utils, 'COPY_CHUNK_SIZE', 64):
+            checksum = self.sift_io.copy_and_hash(self.source_file, [first, second])
+
+        self.assertEqual(checksum, hashlib.new(sift_io_utils.HASH_ALGORITHM, self.content).hexdigest())
+        self.assertEqual(self.read(first), self.content)
+        self.assertEqual(self.read(second), self.content)
+        self.assertEqual(checksum, self.sift_io.generate_file_checksum(first))
+
+    def test_failed_verification_keeps_source(self):
+        with mock.patch.object(sift_io_utils, 'MOVE_MODE', 'copy'), \
+                mock.patch.object(self.sift_io, 'verify_file_checksum', return_value=False):
+            with self.assertRaises(Exception):
+                self.sift_io.transfer_file(self.source_file, False)
+        self.assertEqual(self.read(self.source_file), self.content)
+
+    def test_same_device_renames_and_links_backup(self):
+        if not self.sift_io.is_same_device(self.source_dir, self.private_root, self.safe_delete_root):
+            self.skipTest("test roots are on different devices")
+        source_inode = os.stat(self.source_file).st_ino
+
+        dest_path, _ = self.sift_io.transfer_file(self.source_file, False)
+
+        self.assertEqual(dest_path, self.dest_path)
+        self.assertFalse(os.path.exists(self.source_file))
+        # Renamed and hardlinked, so no file data was copied
+        self.assertEqual(os.stat(dest_path).st_ino, source_inode)
+        self.assertEqual(os.stat(self.backup_path).st_ino, source_inode)
+
+    def test_different_devices_copy_and_verify(self):
+        with mock.patch.object(self.sift_io, 'is_same_device', return_value=False):
+            dest_path, _ = self.sift_io.transfer_file(self.source_file, False)
+        self.assert_copied(dest_path)
+
+    def test_copy_mode_copies_on_same_device(self):
+        with mock.patch.object(sift_io_utils, 'MOVE_MODE', 'copy'):
+            dest_path, _ = self.sift_io.transfer_file(self.source_file, False)
+        self.assert_copied(dest_path)
+
+    def test_batch_backups_of_files_with_the_same_name(self):
+        second_dir = os.path.join(self.source_dir, 'other')
+        os.makedirs(second_dir)
+        second_file = os.path.join(second_dir, 'test1.jpg')
+        with open(second_file, 'wb') as f:
+            f.write(b'Other content')
+        second_backup = self.sift_io.get_backup_path(second_file)
+        self.assertNotEqual(second_backup, self.backup_path)
+
+        with mock.patch.object(sift_io_utils, 'MOVE_MODE', 'copy'):
+            self.sift_io.sort(self.source_dir, False, workers=2)
+        self.assertEqual(self.read(self.backup_path), self.content)
+        self.assertEqual(self.read(second_backup), b'Other content')
+
+    def assert_copied(self, dest_path):
+        self.assertEqual(dest_path, self.dest_path)
+        self.assertFalse(os.path.exists(self.source_file))
+        self.assertEqual(self.read(dest_path), self.content)
+        self.assertEqual(self.read(self.backup_path), self.content)
+        self.assertNotEqual(os.stat(dest_path).st_ino, os.stat(self.backup_path).st_ino)
+
+if __name__ == '__main__':
+    unittest.main()